@@ -1,11 +1,16 @@
 #!/usr/bin/env python
 
+import itertools
 import math
 import os
+import threading
+import time
 import yaml
 import re
 import requests
 
+from multiprocessing.pool import ThreadPool
+
 from ansible.module_utils.basic import *
 
 DOCUMENTATION = '''
@@ -22,6 +27,21 @@ Options:
     - option-name: ptf_ip
       description: PTF container management IP address
       required: True
+
+    - option-name: batch_size
+      description: number of routes sent to exabgp in one http post. 0 sends all routes of a VM in a single post
+      required: False
+      default: 1000
+
+    - option-name: max_workers
+      description: number of exabgp processes that routes are announced to concurrently
+      required: False
+      default: 8
+
+    - option-name: retries
+      description: number of times a failed http post of a chunk of routes is retried
+      required: False
+      default: 3
 '''
 
 EXAMPLES = '''
@@ -30,6 +50,14 @@ EXAMPLES = '''
       topo_name: "t1-lag"
       ptf_ip: "192.168.1.10"
     delegate_to: localhost
+
+  - name: Announce routes in chunks of 500 routes, 16 exabgp processes at a time
+    announce_routes:
+      topo_name: "t1-lag"
+      ptf_ip: "192.168.1.10"
+      batch_size: 500
+      max_workers: 16
+    delegate_to: localhost
 '''
 
 TOPO_FILE_FOLDER = 'vars/'
@@ -47,6 +75,15 @@ LEAF_ASN_START = 64600
 TOR_ASN_START = 65500
 IPV4_BASE_PORT = 5000
 IPV6_BASE_PORT = 6000
+ANNOUNCE_BATCH_SIZE = 1000
+ANNOUNCE_MAX_WORKERS = 8
+ANNOUNCE_RETRIES = 3
+ANNOUNCE_RETRY_INTERVAL = 1
+ANNOUNCE_TIMEOUT = 60
+
+# generated routes, keyed by the generate_routes parameters
+_routes_cache = {}
+_sessions = threading.local()
 
 
 def get_topo_type(topo_name):
@@ -70,18 +107,82 @@ def read_topo(topo_name):
         return {}
 
 
-def announce_routes(ptf_ip, port, routes):
-    messages = []
+def get_session():
+    """Return the keep-alive http session of the calling thread"""
+    session = getattr(_sessions, 'session', None)
+    if session is None:
+        session = _sessions.session = requests.Session()
+    return session
+
+
+def route_messages(routes):
     for prefix, nexthop, aspath in routes:
         if aspath:
-            messages.append("announce route {} next-hop {} as-path [ {} ]".format(prefix, nexthop, aspath))
+            yield "announce route {} next-hop {} as-path [ {} ]".format(prefix, nexthop, aspath)
         else:
-            messages.append("announce route {} next-hop {}".format(prefix, nexthop))
+            yield "announce route {} next-hop {}".format(prefix, nexthop)
 
-    url = "http://%s:%d" % (ptf_ip, port)
+
+def post_commands(session, url, messages, retries=ANNOUNCE_RETRIES):
     data = { "commands": ";".join(messages) }
-    r = requests.post(url, data=data)
-    assert r.status_code == 200
+    for attempt in range(retries + 1):
+        try:
+            r = session.post(url, data=data, timeout=ANNOUNCE_TIMEOUT)
+            if r.status_code == 200:
+                return
+            error = "status code {}".format(r.status_code)
+        except requests.exceptions.RequestException as e:
+            error = repr(e)
+        if attempt < retries:
+            time.sleep(ANNOUNCE_RETRY_INTERVAL)
+    raise Exception("Failed to announce {} routes to {}: {}".format(len(messages), url, error))
+
+
+def announce_routes(ptf_ip, port, routes, batch_size=ANNOUNCE_BATCH_SIZE, retries=ANNOUNCE_RETRIES):
+    url = "http://%s:%d" % (ptf_ip, port)
+    session = get_session()
+    messages = route_messages(routes)
+    while True:
+        chunk = list(itertools.islice(messages, batch_size or None))
+        if not chunk:
+            break
+        post_commands(session, url, chunk, retries)
+        if not batch_size:
+            break
+
+
+class RouteAnnouncer(object):
+    """
+    Collect the routes of every exabgp process and announce them concurrently.
+    Routes added for the same port are announced in the order they were added.
+    """
+    def __init__(self, ptf_ip, batch_size=ANNOUNCE_BATCH_SIZE, max_workers=ANNOUNCE_MAX_WORKERS,
+                 retries=ANNOUNCE_RETRIES):
+        self.ptf_ip = ptf_ip
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.retries = retries
+        self.routes = {}
+
+    def add(self, port, routes):
+        self.routes.setdefault(port, []).append(routes)
+
+    def announce_port(self, port):
+        announce_routes(self.ptf_ip, port, itertools.chain(*self.routes[port]),
+                        self.batch_size, self.retries)
+
+    def run(self):
+        ports = sorted(self.routes)
+        if self.max_workers <= 1 or len(ports) <= 1:
+            for port in ports:
+                self.announce_port(port)
+            return
+        pool = ThreadPool(min(self.max_workers, len(ports)))
+        try:
+            pool.map(self.announce_port, ports)
+        finally:
+            pool.close()
+            pool.join()
 
 # AS path from Leaf router for T0 topology
 def get_leaf_uplink_as_path(spine_asn):
@@ -116,15 +217,33 @@ def generate_routes(family, podset_number, tor_number, tor_subnet_number,
                     nexthop, nexthop_v6,
                     tor_subnet_size, max_tor_subnet_number, topo,
                     router_type = "leaf", tor_index=None, set_num=None):
-    routes = []
+    """
+    Return the routes generated by iter_routes. Routes are generated once per set of parameters
+    and shared by all the VMs advertising them, so the returned list must not be modified.
+    """
+    key = (family, podset_number, tor_number, tor_subnet_number,
+           spine_asn, leaf_asn_start, tor_asn_start,
+           nexthop, nexthop_v6,
+           tor_subnet_size, max_tor_subnet_number, topo,
+           router_type, tor_index, set_num)
+    if key not in _routes_cache:
+        _routes_cache[key] = list(iter_routes(*key))
+    return _routes_cache[key]
+
+
+def iter_routes(family, podset_number, tor_number, tor_subnet_number,
+                spine_asn, leaf_asn_start, tor_asn_start,
+                nexthop, nexthop_v6,
+                tor_subnet_size, max_tor_subnet_number, topo,
+                router_type = "leaf", tor_index=None, set_num=None):
     if router_type != "tor":
         default_route_as_path = get_uplink_router_as_path(router_type, spine_asn)
 
         if topo != "t2" or (topo == "t2" and router_type == "core"):
             if family in ["v4", "both"]:
-                routes.append(("0.0.0.0/0", nexthop, default_route_as_path))
+                yield ("0.0.0.0/0", nexthop, default_route_as_path)
             if family in ["v6", "both"]:
-                routes.append(("::/0", nexthop_v6, default_route_as_path))
+                yield ("::/0", nexthop_v6, default_route_as_path)
 
     # NOTE: Using large enough values (e.g., podset_number = 200,
     # us to overflow the 192.168.0.0/16 private address space here.
@@ -205,14 +324,12 @@ def generate_routes(family, podset_number, tor_number, tor_subnet_number,
                             aspath = "{} {} {}".format(spine_asn, leaf_asn, tor_asn)
 
                 if family in ["v4", "both"]:
-                    routes.append((prefix, nexthop, aspath))
+                    yield (prefix, nexthop, aspath)
                 if family in ["v6", "both"]:
-                    routes.append((prefix_v6, nexthop_v6, aspath))
-
-    return routes
+                    yield (prefix_v6, nexthop_v6, aspath)
 
 
-def fib_t0(topo, ptf_ip):
+def fib_t0(topo, announcer):
 
     common_config = topo['configuration_properties'].get('common', {})
     podset_number = common_config.get("podset_number", PODSET_NUMBER)
@@ -239,11 +356,11 @@ def fib_t0(topo, ptf_ip):
                                     spine_asn, leaf_asn_start, tor_asn_start,
                                     nhipv6, nhipv6, tor_subnet_size, max_tor_subnet_number, "t0")
 
-        announce_routes(ptf_ip, port, routes_v4)
-        announce_routes(ptf_ip, port6, routes_v6)
+        announcer.add(port, routes_v4)
+        announcer.add(port6, routes_v6)
 
 
-def fib_t1_lag(topo, ptf_ip):
+def fib_t1_lag(topo, announcer):
 
     common_config = topo['configuration_properties'].get('common', {})
     podset_number = common_config.get("podset_number", PODSET_NUMBER)
@@ -280,14 +397,14 @@ def fib_t1_lag(topo, ptf_ip):
                                         None, leaf_asn_start, tor_asn_start,
                                         nhipv4, nhipv6, tor_subnet_size, max_tor_subnet_number, "t1",
                                         router_type=router_type, tor_index=tor_index)
-            announce_routes(ptf_ip, port, routes_v4)
-            announce_routes(ptf_ip, port6, routes_v6)
+            announcer.add(port, routes_v4)
+            announcer.add(port6, routes_v6)
 
         if 'vips' in v:
             routes_vips = []
             for prefix in v["vips"]["ipv4"]["prefixes"]:
                 routes_vips.append((prefix, nhipv4, v["vips"]["ipv4"]["asn"]))
-            announce_routes(ptf_ip, port, routes_vips)
+            announcer.add(port, routes_vips)
 
 
 """
@@ -319,7 +436,7 @@ We would have the following distribution:
    - 193.177.xx.xx - 194.55.xx.xx (4K routes) from all 24 T3 VM's on linecard1 (VM1-VM24)
    - default route from all 24 T3 VM's on linecard1 (VM1-VM24)
 """
-def fib_t2_lag(topo, ptf_ip):
+def fib_t2_lag(topo, announcer):
 
     vms = topo['topology']['VMs']
     # T1 VMs per linecard(asic) - key is the dut index, and value is a list of T1 VMs
@@ -339,10 +456,10 @@ def fib_t2_lag(topo, ptf_ip):
             if dut_index not in t3_vms:
                 t3_vms[dut_index] = list()
             t3_vms[dut_index].append(key)
-    generate_t2_routes(t1_vms, topo, ptf_ip)
-    generate_t2_routes(t3_vms, topo, ptf_ip)
+    generate_t2_routes(t1_vms, topo, announcer)
+    generate_t2_routes(t3_vms, topo, announcer)
 
-def generate_t2_routes(dut_vm_dict, topo, ptf_ip):
+def generate_t2_routes(dut_vm_dict, topo, announcer):
     common_config = topo['configuration_properties'].get('common', {})
     vms = topo['topology']['VMs']
     vms_config = topo['configuration']
@@ -393,14 +510,14 @@ def generate_t2_routes(dut_vm_dict, topo, ptf_ip):
                                             common_config['dut_asn'], leaf_asn_start, tor_asn_start,
                                             nhipv4, nhipv6, tor_subnet_size, max_tor_subnet_number, "t2",
                                             router_type=router_type, tor_index=tor_index, set_num=set_num)
-                announce_routes(ptf_ip, port, routes_v4)
-                announce_routes(ptf_ip, port6, routes_v6)
+                announcer.add(port, routes_v4)
+                announcer.add(port6, routes_v6)
 
                 if 'vips' in vms_config[a_vm]:
                     routes_vips = []
                     for prefix in vms_config[a_vm]["vips"]["ipv4"]["prefixes"]:
                         routes_vips.append((prefix, nhipv4, vms_config[a_vm]["vips"]["ipv4"]["asn"]))
-                    announce_routes(ptf_ip, port, routes_vips)
+                    announcer.add(port, routes_vips)
 
 
 def main():
@@ -408,7 +525,10 @@ def main():
     module = AnsibleModule(
         argument_spec=dict(
             topo_name=dict(required=True, type='str'),
-            ptf_ip=dict(required=True, type='str')
+            ptf_ip=dict(required=True, type='str'),
+            batch_size=dict(required=False, type='int', default=ANNOUNCE_BATCH_SIZE),
+            max_workers=dict(required=False, type='int', default=ANNOUNCE_MAX_WORKERS),
+            retries=dict(required=False, type='int', default=ANNOUNCE_RETRIES)
         ),
         supports_check_mode=False)
 
@@ -420,19 +540,24 @@ def main():
         module.fail_json(msg='Unable to load topology "{}"'.format(topo_name))
 
     topo_type = get_topo_type(topo_name)
+    announcer = RouteAnnouncer(ptf_ip, module.params['batch_size'],
+                               module.params['max_workers'], module.params['retries'])
 
     if topo_type == "t0":
-        fib_t0(topo, ptf_ip)
-        module.exit_json(changed=True)
+        fib_t0(topo, announcer)
     elif topo_type == "t1":
-        fib_t1_lag(topo, ptf_ip)
-        module.exit_json(changed=True)
+        fib_t1_lag(topo, announcer)
     elif topo_type == "t2":
-        fib_t2_lag(topo, ptf_ip)
-        module.exit_json(changed=True)
+        fib_t2_lag(topo, announcer)
     else:
         module.exit_json(msg='Unsupported topology "{}" - skipping announcing routes'.format(topo_name))
 
+    try:
+        announcer.run()
+    except Exception as e:
+        module.fail_json(msg='Failed to announce routes: {}'.format(str(e)))
+    module.exit_json(changed=True)
+
 
 if __name__ == '__main__':
     main()
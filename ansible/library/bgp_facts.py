@@ -45,6 +45,16 @@ Next connect timer due in 31 seconds
 Read thread: off  Write thread: off
 '''
 
+from multiprocessing.pool import ThreadPool
+
+try:
+    from ansible.module_utils.vtysh_utils import vtysh_command
+except ImportError:
+    # Add parent dir for using outside Ansible
+    import sys
+    sys.path.append('..')
+    from module_utils.vtysh_utils import vtysh_command
+
 
 class BgpModule(object):
     def __init__(self):
@@ -76,29 +86,35 @@ class BgpModule(object):
         """
             Main method of the class
         """
-        for instance in self.instances:
-            self.collect_data('summary', instance)
+        # The instances are queried in parallel, with one vtysh run per instance
+        pool = ThreadPool(len(self.instances))
+        try:
+            results = pool.map(self.collect_data, self.instances)
+        finally:
+            pool.close()
+
+        for command, (rc, out, err) in results:
+            if rc != 0:
+                self.module.fail_json(msg="Command %s failed rc=%d, out=%s, err=%s" %
+                                          (command, rc, out, err))
+            self.out = out
             self.parse_summary()
-            self.collect_data('neighbor',instance)
             self.parse_neighbors()
-            self.get_statistics()
+        self.get_statistics()
         self.module.exit_json(ansible_facts=self.facts)
 
-    def collect_data(self, command_str, instance):
+    def collect_data(self, instance):
         """
-            Collect bgp information by reading output of 'vtysh' command line tool
+            Collect bgp information by reading output of 'vtysh' command line tool.
+            The summary is output first, it contains no 'BGP neighbor is' line and is ignored by parse_neighbors.
         """
-        docker_cmd = 'docker exec -i {} vtysh -c "show ip bgp {}" '.format(instance,command_str)
+        docker_cmd = vtysh_command(['show ip bgp summary', 'show ip bgp neighbor'], instance)
         try:
-            rc, self.out, err = self.module.run_command(docker_cmd, executable='/bin/bash', use_unsafe_shell=True)
+            rc, out, err = self.module.run_command(docker_cmd, executable='/bin/bash', use_unsafe_shell=True)
         except Exception as e:
-            self.module.fail_json(msg=str(e))
-
-        if rc != 0:
-            self.module.fail_json(msg="Command failed rc=%d, out=%s, err=%s" %
-                                      (rc, self.out, err))
+            rc, out, err = -1, '', str(e)
 
-        return
+        return docker_cmd, (rc, out, err)
 
     def parse_summary(self):
         regex_asn = re.compile(r'.*local AS number (\d+).*')
@@ -29,6 +29,23 @@ Options:
       required: False (if neighbor is presented, then direction is required)
       description: to restict retrieving bgp neighbor advertise or received routes
       Choice:  [adv | rec]
+
+    - option-name: prefixes
+      description: list of bgp prefixes to be retrieved, in addition to prefix
+      required: False
+      Default: None
+
+    - option-name: index_table
+      description: with FRR, retrieve the whole bgp table once ("show ip bgp json") and look up the prefixes in it,
+                   instead of running "show ip bgp <prefix> json" for every prefix. Decoding the table is slow with
+                   large tables, this is faster only when a large part of the table is checked.
+      required: False
+      Default: False
+
+    - option-name: batch_size
+      description: number of vtysh commands run per "docker exec"
+      required: False
+      Default: 100
 '''
 
 EXAMPLES = '''
@@ -37,6 +54,11 @@ EXAMPLES = '''
 
 - name: Get neighbor BGP advertise route information
   bgp_route: neighbor='10.0.0.1' direction='adv'
+
+- name: Get BGP route information of many prefixes from one bgp table dump
+  bgp_route:
+    prefixes: "{{ vips_prefixes }}"
+    index_table: True
 '''
 
 RETURN = '''
@@ -144,6 +166,14 @@ SAMPLE_COMMAND_DATA = '''
 ### TODO: Not fully tested ipv6 route entries parsing option, need continue working on ipv6 specific commands###
 import json
 
+try:
+    from ansible.module_utils.vtysh_utils import BgpRouteIndex, VTYSH_BATCH_SIZE, is_frr, run_vtysh, run_vtysh_json
+except ImportError:
+    # Add parent dir for using outside Ansible
+    import sys
+    sys.path.append('..')
+    from module_utils.vtysh_utils import BgpRouteIndex, VTYSH_BATCH_SIZE, is_frr, run_vtysh, run_vtysh_json
+
 class BgpRoutes(object):
     '''
         parsing bgp routing information
@@ -218,17 +248,20 @@ class BgpRoutes(object):
                 self.facts['bgp_route_neiadv'][prefix] = entry
 
 
-    def parse_bgp_route_prefix_json(self, cmd_result):
+    def parse_bgp_route_prefix_json(self, cmd_result, prefix=None):
         """
         parse BGP facts for specific prefix in json format
         """
+        self.add_prefix_route(prefix or self.prefix, json.loads(cmd_result))
 
-        prefix = self.prefix
-        self.facts['bgp_route'] = defaultdict(dict)
-
-        p = json.loads(cmd_result)
+    def add_prefix_route(self, prefix, p):
+        """
+        add BGP facts for specific prefix from the decoded output of "show ip bgp <prefix> json"
+        """
+        if 'bgp_route' not in self.facts:
+            self.facts['bgp_route'] = defaultdict(dict)
 
-        if not p.has_key('prefix'):
+        if 'prefix' not in p:
             self.facts['bgp_route'][prefix]['found'] = False
             return
 
@@ -238,7 +271,31 @@ class BgpRoutes(object):
         for path in p['paths']:
             self.facts['bgp_route'][prefix]['aspath'].append(path['aspath']['string'])
 
-    def parse_bgp_route_prefix(self, cmd_result):
+    def collect_prefix_routes(self, module, prefixes, is_frr, index_table=False, batch_size=VTYSH_BATCH_SIZE):
+        """
+        retrieve BGP facts of the prefixes
+            - Quagga: "show ip bgp <prefix>" per prefix
+            - FRR: "show ip bgp <prefix> json" per prefix, batch_size commands per docker exec
+            - FRR with index_table: "show ip bgp json" once per address family, prefixes looked up in the table
+        """
+        afs = ['ip' if netaddr.valid_ipv4(prefix.split('/')[0]) else 'ipv6' for prefix in prefixes]
+        if not is_frr:
+            for prefix, af in zip(prefixes, afs):
+                out = run_vtysh(module, ['show {} bgp {}'.format(af, prefix)])[0]
+                self.parse_bgp_route_prefix(out, prefix)
+        elif index_table:
+            table_afs = sorted(set(afs))
+            tables = run_vtysh_json(module, ['show {} bgp json'.format(af) for af in table_afs], batch_size=batch_size)
+            indexes = dict(zip(table_afs, [BgpRouteIndex(table) for table in tables]))
+            self.facts['bgp_route'] = defaultdict(dict)
+            for prefix, af in zip(prefixes, afs):
+                self.facts['bgp_route'][prefix] = indexes[af].lookup(prefix)
+        else:
+            commands = ['show {} bgp {} json'.format(af, prefix) for prefix, af in zip(prefixes, afs)]
+            for prefix, p in zip(prefixes, run_vtysh_json(module, commands, batch_size=batch_size)):
+                self.add_prefix_route(prefix, p)
+
+    def parse_bgp_route_prefix(self, cmd_result, prefix=None):
         '''
         parse BGP facts for specific prefix
         '''
@@ -254,7 +311,7 @@ class BgpRoutes(object):
         PREFIX_PATH_TIMESTAMP = 8
         ERR = 9
         # line content pattern
-        prefix = self.prefix
+        prefix = prefix or self.prefix
         regex_prefix_header = re.compile('BGP routing table entry for ')
         regex_prefix_avail_paths = re.compile('Paths:\s+\((\d+)\s+available')
         prefix_peer_group_header = 'Advertised to non peer-group peers:'
@@ -267,7 +324,8 @@ class BgpRoutes(object):
         cmd_err1 = 'Unknown command'
         cmd_err2 = 'Network not in table'
 
-        self.facts['bgp_route'] = defaultdict(dict)
+        if 'bgp_route' not in self.facts:
+            self.facts['bgp_route'] = defaultdict(dict)
         if cmd_err1 in cmd_result or cmd_err2 in cmd_result:
             self.facts['bgp_route'][prefix]['found'] = False
             return
@@ -336,21 +394,21 @@ def main():
             argument_spec=dict(
                 neighbor=dict(required=False, default=None),
                 direction=dict(required=False, choices=['adv', 'rec']),
-                prefix=dict(required=False, default=None)
+                prefix=dict(required=False, default=None),
+                prefixes=dict(required=False, type='list', default=None),
+                index_table=dict(required=False, type='bool', default=False),
+                batch_size=dict(required=False, type='int', default=VTYSH_BATCH_SIZE)
                 ),
             supports_check_mode=False
             )
-    is_frr = False
     use_json = ""
 
     m_args = module.params
     neighbor = m_args['neighbor']
     direction = m_args['direction']
     prefix = m_args['prefix']
-    regex_ip = re.compile('[0-9a-fA-F.:]+')
-    regex_iprange = re.compile('[0-9a-fA-F.:]+\/\d+')
-    regex_ipv4 = re.compile('[12][0-9]{0,2}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\/?\d+?')
-    if neighbor == None and direction == None and prefix == None:
+    prefixes = ([prefix] if prefix else []) + (m_args['prefixes'] or [])
+    if neighbor == None and direction == None and not prefixes:
         module.fail_json(msg="No support of parsing 'show ip bgp' full prefix table yet")
         return
     if neighbor and ((not netaddr.valid_ipv4(neighbor)) and (not netaddr.valid_ipv6(neighbor))):
@@ -364,42 +422,20 @@ def main():
     try:
         bgproute = BgpRoutes(neighbor, direction, prefix)
 
-        command = "docker exec -i bgp vtysh -c 'show version'"
-        rc, out, err = module.run_command(command)
-        if rc != 0:
-            err_message = "command %s failed rc=%d, out=%s, err=%s" %(command, rc, out, err)
-            module.fail_json(msg=err_message)
-            return
-        if "FRRouting" in out:
-            is_frr = True
+        frr = is_frr(module)
+        if frr:
             use_json = "json"
 
-        if prefix:
-            if regex_ipv4.match(prefix):
-                command = "docker exec -i bgp vtysh -c 'show ip bgp {} {}'".format(str(prefix), use_json)
-            else:
-                command = "docker exec -i bgp vtysh -c 'show ipv6 bgp {} {}'".format(str(prefix), use_json)
-            rc, out, err = module.run_command(command)
-            if rc != 0:
-                err_message = "command %s failed rc=%d, out=%s, err=%s" %(command, rc, out, err)
-                module.fail_json(msg=err_message)
-                return
-            if is_frr:
-                bgproute.parse_bgp_route_prefix_json(out)
-            else:
-                bgproute.parse_bgp_route_prefix(out)
+        if prefixes:
+            bgproute.collect_prefix_routes(module, prefixes, frr, m_args['index_table'], m_args['batch_size'])
 
         elif neighbor:
             if netaddr.valid_ipv4(neighbor):
-                command = "docker exec -i bgp vtysh -c 'show ip bgp neighbor {} {} {}'".format(str(neighbor), str(direction), use_json)
+                command = 'show ip bgp neighbor {} {} {}'.format(str(neighbor), str(direction), use_json)
             else:
-                command = "docker exec -i bgp vtysh -c 'show ipv6 bgp neighbor {] {} {}'".format(str(neighbor), str(direction), use_json)
-            rc, out, err = module.run_command(command)
-            if rc !=  0:
-                err_message = "command %s failed rc=%d, out=%s, err=%s" %(command, rc, out, err)
-                module.fail_json(msg=err_message)
-                return
-            if is_frr:
+                command = 'show ipv6 bgp neighbor {} {} {}'.format(str(neighbor), str(direction), use_json)
+            out = run_vtysh(module, [command])[0]
+            if frr:
                 bgproute.parse_bgp_route_adv_json(out)
             else:
                 bgproute.parse_bgp_route_adv(out)
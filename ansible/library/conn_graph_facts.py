@@ -3,7 +3,12 @@
 import lxml.etree as ET
 import yaml
 import os
+import hashlib
 import traceback
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
 import ipaddr as ipaddress
 from operator import itemgetter
 from itertools import groupby
@@ -44,6 +49,12 @@ options:
     filepath:
         Path of the connection graph xml file. Override the default path for looking up connection graph xml file.
         required: False
+    use_index:
+        Look up the connection graph xml file through the lab graph index cached under ~/.ansible/conn_graph.
+        The index keeps the hostnames and parsed tables of each graph file and is refreshed when a graph
+        file changes (mtime or size).
+        required: False
+        default: True
     filename:
         Name of the connection graph xml file. Override the behavior of looking up connection graph xml file. When
         this option is specified, always use the specified connection graph xml file.
@@ -120,8 +131,9 @@ class Parse_Lab_Graph():
     This module conn_graph_file also parse the server links to have a full root fanout switches template for deployment.
     """
 
-    def __init__(self, xmlfile):
-        self.root = ET.parse(xmlfile)
+    def __init__(self, xmlfile=None):
+        # xmlfile is None when the tables are restored from the graph index cache
+        self.root = ET.parse(xmlfile) if xmlfile else None
         self.devices = {}
         self.vlanport = {}
         self.vlanrange = {}
@@ -272,6 +284,25 @@ class Parse_Lab_Graph():
         self.devices = deviceinfo
         self.vlanport = devicel2info
 
+    def get_tables(self):
+        """
+        return the parsed graph tables, used for caching the parsed graph
+        """
+        return {
+            'devices': self.devices,
+            'vlanport': self.vlanport,
+            'links': self.links,
+            'consolelinks': self.consolelinks,
+            'pdulinks': self.pdulinks,
+        }
+
+    def set_tables(self, tables):
+        """
+        restore the graph tables saved by get_tables instead of parsing the graph
+        """
+        for name, table in tables.items():
+            setattr(self, name, table)
+
     def convert_list2range(self, l):
         """
         common module to convert a  list to range for easier vlan configuration generation
@@ -333,15 +364,7 @@ class Parse_Lab_Graph():
         return self.links.get(hostname)
 
     def contains_hosts(self, hostnames, part):
-        if not part:
-            return set(hostnames) <= set(self.devices)
-        # It's possible that not all devices are found in connect_graph when using in devutil
-        THRESHOLD = 0.8
-        count = 0
-        for hostname in hostnames:
-            if hostname in self.devices.keys():
-                count += 1
-        return hostnames and (count * 1.0 / len(hostnames) >= THRESHOLD)
+        return graph_contains_hosts(self.devices, hostnames, part)
 
 
     def get_host_console_info(self, hostname):
@@ -399,12 +422,151 @@ class Parse_Lab_Graph():
             return {}
 
 
+def graph_contains_hosts(devices, hostnames, part):
+    if not part:
+        return set(hostnames) <= set(devices)
+    # It's possible that not all devices are found in connect_graph when using in devutil
+    THRESHOLD = 0.8
+    count = 0
+    for hostname in hostnames:
+        if hostname in devices:
+            count += 1
+    return hostnames and (count * 1.0 / len(hostnames) >= THRESHOLD)
+
+
 LAB_CONNECTION_GRAPH_FILE = 'graph_files.yml'
 EMPTY_GRAPH_FILE = 'empty_graph.xml'
 LAB_GRAPHFILE_PATH = 'files/'
+LAB_GRAPH_CACHE_PATH = os.path.expanduser('~/.ansible/conn_graph')
+LAB_GRAPH_INDEX_FILE = 'index.pickle'
+# Bump the version when the layout of the index or the graph tables changes
+LAB_GRAPH_CACHE_VERSION = 1
+
 
+class Lab_Graph_Index():
+    """
+    Index of the lab graph files: hostname set of each graph file, plus the
+    parsed tables of the graph files that were looked up before.
 
-def find_graph(hostnames, part=False):
+    The hostnames are collected by streaming the graph with iterparse, so a
+    lookup miss does not need a full parse of every graph file. Entries are
+    invalidated when the mtime or size of the graph file changes.
+    """
+
+    HOST_TAGS = ('Device', 'DeviceConsoleInfo', 'DevicePowerControlInfo')
+
+    def __init__(self, cache_path=LAB_GRAPH_CACHE_PATH):
+        self.cache_path = cache_path
+        self.index_file = os.path.join(cache_path, LAB_GRAPH_INDEX_FILE)
+        self.entries = {}
+        self.changed = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_file, 'rb') as fd:
+                version, entries = pickle.load(fd)
+            if version == LAB_GRAPH_CACHE_VERSION:
+                self.entries = entries
+        except Exception:
+            self.entries = {}
+
+    def _dump(self, filename, data):
+        if not os.path.isdir(self.cache_path):
+            os.makedirs(self.cache_path)
+        # write to a temporary file first so that readers never see a partial file
+        tmp_file = '{}.{}'.format(filename, os.getpid())
+        with open(tmp_file, 'wb') as fd:
+            pickle.dump(data, fd, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_file, filename)
+
+    def save(self):
+        if not self.changed:
+            return
+        try:
+            self._dump(self.index_file, (LAB_GRAPH_CACHE_VERSION, self.entries))
+            self.changed = False
+        except (IOError, OSError) as e:
+            print_debug_msg(debug_fname, "Failed to save lab graph index: %s" % str(e))
+
+    @staticmethod
+    def _stamp(filename):
+        st = os.stat(filename)
+        return (st.st_mtime, st.st_size)
+
+    def _tables_file(self, filename):
+        name = os.path.basename(filename)
+        digest = hashlib.md5(filename.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_path, '{}.{}.pickle'.format(name, digest))
+
+    def _entry(self, filename):
+        filename = os.path.abspath(filename)
+        stamp = self._stamp(filename)
+        entry = self.entries.get(filename)
+        if entry is None or entry['stamp'] != stamp:
+            hosts = set()
+            for _, elem in ET.iterparse(filename, events=('end',), tag=self.HOST_TAGS):
+                hostname = elem.attrib.get('Hostname')
+                if hostname is not None:
+                    hosts.add(hostname)
+                elem.clear()
+            entry = {'stamp': stamp, 'hosts': hosts}
+            self.entries[filename] = entry
+            self.changed = True
+        return entry
+
+    def find(self, file_list, hostnames, part=False):
+        """
+        return the first graph file in file_list containing the hostnames or None
+        """
+        for filename in file_list:
+            entry = self._entry(filename)
+            print_debug_msg(debug_fname, "For file %s, got hostnames %s" % (filename, entry['hosts']))
+            if graph_contains_hosts(entry['hosts'], hostnames, part):
+                return filename
+        return None
+
+    def get_lab_graph(self, filename):
+        """
+        return the parsed lab graph, restored from the cached tables when valid
+        """
+        entry = self._entry(filename)
+        tables_file = self._tables_file(os.path.abspath(filename))
+        try:
+            with open(tables_file, 'rb') as fd:
+                version, stamp, tables = pickle.load(fd)
+            if version == LAB_GRAPH_CACHE_VERSION and stamp == entry['stamp']:
+                lab_graph = Parse_Lab_Graph()
+                lab_graph.set_tables(tables)
+                return lab_graph
+        except Exception:
+            pass
+
+        lab_graph = Parse_Lab_Graph(filename)
+        lab_graph.parse_graph()
+        try:
+            self._dump(tables_file, (LAB_GRAPH_CACHE_VERSION, entry['stamp'], lab_graph.get_tables()))
+        except (IOError, OSError) as e:
+            print_debug_msg(debug_fname, "Failed to save lab graph tables: %s" % str(e))
+        return lab_graph
+
+
+def find_graph_indexed(file_list, hostnames, part=False):
+    """
+    Find the graph file through the lab graph index, see find_graph
+    """
+    index = Lab_Graph_Index()
+    filenames = [os.path.join(LAB_GRAPHFILE_PATH, fn) for fn in file_list]
+    filename = index.find(filenames, hostnames, part)
+    if filename is None:
+        filename = os.path.join(LAB_GRAPHFILE_PATH, EMPTY_GRAPH_FILE)
+    print_debug_msg(debug_fname, ("Returning lab graph from conn graph file: %s for hosts %s" % (filename, hostnames)))
+    lab_graph = index.get_lab_graph(filename)
+    index.save()
+    return lab_graph
+
+
+def find_graph(hostnames, part=False, use_index=True):
     """
     Find a graph file contains all devices in testbed.
     duts are spcified by hostnames
@@ -412,12 +574,16 @@ def find_graph(hostnames, part=False):
     Parameters:
         hostnames: list of duts in the target testbed.
         part: select the graph file if over 80% of hosts are found in conn_graph when part is True
+        use_index: look up the graph file through the cached lab graph index
     """
     global debug_fname
     filename = os.path.join(LAB_GRAPHFILE_PATH, LAB_CONNECTION_GRAPH_FILE)
     with open(filename) as fd:
         file_list = yaml.safe_load(fd)
 
+    if use_index:
+        return find_graph_indexed(file_list, hostnames, part)
+
     # Finding the graph file contains all duts from hostnames,
     for fn in file_list:
         print_debug_msg(debug_fname, "Looking at conn graph file: %s for hosts %s" % (fn, hostnames))
@@ -519,6 +685,7 @@ def main():
             filename=dict(required=False),
             filepath=dict(required=False),
             anchor=dict(required=False, type='list'),
+            use_index=dict(required=False, default=True, type='bool'),
         ),
         mutually_exclusive=[['host', 'hosts', 'anchor']],
         supports_check_mode=True
@@ -552,7 +719,7 @@ def main():
             # the caller is asking to return the whole graph. This
             # is needed when configuring the root fanout switch.
             target = anchor if anchor else hostnames
-            lab_graph = find_graph(target)
+            lab_graph = find_graph(target, use_index=m_args['use_index'])
 
         # early return for the whole graph or empty graph file(vtestbed)
         if (
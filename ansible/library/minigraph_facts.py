@@ -7,6 +7,12 @@ import struct
 import traceback
 import json
 import copy
+import time
+import hashlib
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
 import ipaddr as ipaddress
 from collections import defaultdict
 from natsort import natsorted
@@ -29,6 +35,14 @@ options:
         description:
             - Set to target snmp server (normally {{inventory_hostname}})
         required: true
+    use_cache:
+        description:
+            - Reuse the facts parsed earlier from a minigraph with the same content.
+              The parsed facts are cached under ~/.ansible/minigraph keyed by the
+              sha256 of the minigraph file, of this module and of port_utils, and
+              the namespace. Entries expire 24 hours after they are created.
+        required: false
+        default: true
 '''
 
 EXAMPLES = '''
@@ -45,6 +59,13 @@ ns3 = "http://www.w3.org/2001/XMLSchema-instance"
 ANSIBLE_USER_MINIGRAPH_PATH = os.path.expanduser('~/.ansible/minigraph')
 ANSIBLE_LOCAL_MINIGRAPH_PATH = '{}.xml'
 ANSIBLE_USER_MINIGRAPH_MAX_AGE = 86400  # 24-hours (in seconds)
+ANSIBLE_DEFAULT_MINIGRAPH_PATH = '/etc/sonic/minigraph.xml'
+
+# Bump the version when the layout of the parsed facts changes
+MINIGRAPH_FACTS_CACHE_VERSION = 1
+MINIGRAPH_FACTS_CACHE_PREFIX = 'facts_'
+# sha256 of the code the facts are parsed with, see get_code_digest()
+minigraph_code_digest = None
 
 class minigraph_encoder(json.JSONEncoder):
     def default(self, obj):
@@ -539,7 +560,7 @@ def reconcile_mini_graph_locations(filename, hostname):
         mini_graph_path = filename
     else:
         # only the hostname was specified, determine the output path
-        mini_graph_path = '/etc/sonic/minigraph.xml'
+        mini_graph_path = ANSIBLE_DEFAULT_MINIGRAPH_PATH
 
     root = ET.parse(mini_graph_path).getroot()
     return mini_graph_path, root
@@ -705,6 +726,133 @@ def parse_xml(filename, hostname, asic_name=None):
     results['deployment_id'] = deployment_id
     return results
 
+def read_module_source(module_globals):
+    """
+    :param module_globals: the globals of a python module
+    :return: the source code of the module
+
+    Under ansible the modules are imported from a zip payload, so the source is read with their loader.
+    """
+    module_file = module_globals['__file__']
+    loader = module_globals.get('__loader__')
+    if loader is not None and hasattr(loader, 'get_source'):
+        source = loader.get_source(os.path.splitext(os.path.basename(module_file))[0])
+        if source is not None:
+            return source
+    if module_file.endswith(('.pyc', '.pyo')):
+        module_file = module_file[:-1]
+    with open(module_file, 'rb') as f:
+        return f.read()
+
+
+def get_code_digest():
+    """
+    :return: the sha256 of the sources of this module and of port_utils (the hwsku port maps),
+             the parsed facts depend on both. None if a source cannot be read.
+    """
+    global minigraph_code_digest
+    if minigraph_code_digest is None:
+        sha = hashlib.sha256()
+        try:
+            for module_globals in (globals(), vars(sys.modules[get_port_alias_to_name_map.__module__])):
+                source = read_module_source(module_globals)
+                sha.update(source if isinstance(source, bytes) else source.encode('utf-8'))
+        except Exception as e:
+            print >> sys.stderr, "Warning: failed to read the minigraph_facts sources: " + str(e)
+            return None
+        minigraph_code_digest = sha.hexdigest()
+    return minigraph_code_digest
+
+
+def get_facts_cache_file(mini_graph_path, asic_name=None):
+    """
+    :param mini_graph_path: the minigraph file the facts are parsed from
+    :param asic_name: the asic (namespace) the facts are parsed for
+    :return: the path of the cached facts for the content of the minigraph and the parsing code,
+             None if the parsing code is unknown
+    """
+    code_digest = get_code_digest()
+    if code_digest is None:
+        return None
+    sha = hashlib.sha256(code_digest.encode('ascii'))
+    with open(mini_graph_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            sha.update(chunk)
+    name = '{}{}_{}.pickle'.format(MINIGRAPH_FACTS_CACHE_PREFIX, sha.hexdigest(), asic_name or 'host')
+    return os.path.join(ANSIBLE_USER_MINIGRAPH_PATH, name)
+
+
+def is_expired(cache_file, now=None):
+    """
+    :return: True if the cache entry was created more than ANSIBLE_USER_MINIGRAPH_MAX_AGE ago
+
+    Entries are written once and never touched on a hit, so the mtime is the creation time.
+    """
+    return (now or time.time()) - os.path.getmtime(cache_file) > ANSIBLE_USER_MINIGRAPH_MAX_AGE
+
+
+def load_cached_facts(cache_file):
+    """
+    :return: the cached facts or None if there is no valid cache entry
+    """
+    try:
+        if is_expired(cache_file):
+            return None
+        with open(cache_file, 'rb') as f:
+            version, facts = pickle.load(f)
+    except Exception:
+        return None
+    if version != MINIGRAPH_FACTS_CACHE_VERSION:
+        return None
+    return facts
+
+
+def save_cached_facts(cache_file, facts):
+    # write to a temporary file first so that readers never see a partial entry
+    tmp_file = '{}.{}'.format(cache_file, os.getpid())
+    try:
+        with open(tmp_file, 'wb') as f:
+            pickle.dump((MINIGRAPH_FACTS_CACHE_VERSION, facts), f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_file, cache_file)
+    except Exception as e:
+        print >> sys.stderr, "Warning: failed to cache minigraph facts: " + str(e)
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def prune_cached_facts():
+    """
+    Remove the cached facts created more than ANSIBLE_USER_MINIGRAPH_MAX_AGE ago
+    """
+    now = time.time()
+    for name in os.listdir(ANSIBLE_USER_MINIGRAPH_PATH):
+        if not name.startswith(MINIGRAPH_FACTS_CACHE_PREFIX):
+            continue
+        path = os.path.join(ANSIBLE_USER_MINIGRAPH_PATH, name)
+        try:
+            if is_expired(path, now):
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def parse_xml_cached(filename, hostname, asic_name=None):
+    """
+    Same as parse_xml, but the facts are returned in their JSON form
+    and reused from the cache when the minigraph content and the parsing code are unchanged.
+    """
+    mini_graph_path = filename if filename is not None else ANSIBLE_DEFAULT_MINIGRAPH_PATH
+    cache_file = get_facts_cache_file(mini_graph_path, asic_name)
+    results = load_cached_facts(cache_file) if cache_file is not None else None
+    if results is None:
+        results = parse_xml(filename, hostname, asic_name)
+        results = json.loads(json.dumps(results, cls=minigraph_encoder))
+        if cache_file is not None:
+            save_cached_facts(cache_file, results)
+    results['minigraph_as_xml'] = mini_graph_path
+    return results
+
+
 ports = {}
 port_alias_to_name_map = {}
 port_name_to_alias_map = {}
@@ -716,6 +864,7 @@ def main():
             host=dict(required=True),
             filename=dict(),
             namespace=dict(required=False, default=None),
+            use_cache=dict(required=False, default=True, type='bool'),
         ),
         supports_check_mode=True
     )
@@ -743,8 +892,12 @@ def main():
     namespace = m_args['namespace']
 
     try:
-        results = parse_xml(filename, m_args['host'], namespace)
-        results_clean = json.loads(json.dumps(results, cls=minigraph_encoder))
+        if m_args['use_cache']:
+            results_clean = parse_xml_cached(filename, m_args['host'], namespace)
+            prune_cached_facts()
+        else:
+            results = parse_xml(filename, m_args['host'], namespace)
+            results_clean = json.loads(json.dumps(results, cls=minigraph_encoder))
         module.exit_json(ansible_facts=results_clean)
     except Exception as e:
         tb = traceback.format_exc()
@@ -21,7 +21,10 @@
 #         "admin"
 #       ],
 #       "cmd": "ls /home",
-#       "rc": 0
+#       "rc": 0,
+#       "start": "2020-09-23 09:18:58.243901",
+#       "end": "2020-09-23 09:18:58.248012",
+#       "delta": "0:00:00.004111"
 #     },
 #     {
 #       "stderr_lines": [],
@@ -31,7 +34,10 @@
 #         "/home/admin"
 #       ],
 #       "cmd": "pwd",
-#       "rc": 0
+#       "rc": 0,
+#       "start": "2020-09-23 09:18:58.248020",
+#       "end": "2020-09-23 09:18:58.252201",
+#       "delta": "0:00:00.004181"
 #     }
 #   ],
 #   "cmds": [
@@ -46,14 +52,21 @@
 #         "ls /home",
 #         "pwd"
 #       ],
-#       "continue_on_fail": false
+#       "continue_on_fail": false,
+#       "executor": "fork"
 #     }
 #   }
 # }
 
 import datetime
+import os
+import select
+import subprocess
+import uuid
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_bytes, to_text
+from ansible.module_utils.six.moves import shlex_quote
 
 DOCUMENTATION = r'''
 ---
@@ -66,6 +79,11 @@ description:
 options:
     cmds: List of commands. Each command should be a string.
     continue_on_fail: Bool. Specify whether to continue running rest of the commands if any of the command failed.
+    executor: How to run the commands.
+        - fork (default): run every command by a new /bin/sh process.
+        - session: stream all the commands to one /bin/sh process. Every command still runs in its own subshell,
+          so changes of directory or environment variables don't affect the next commands. Use it to run many
+          short commands.
 '''
 
 EXAMPLES = r'''
@@ -76,27 +94,121 @@ EXAMPLES = r'''
         - ls /home
         - pwd
     continue_on_fail: False
-'''
 
-def run_cmd(module, cmd):
+# Run many short commands in one shell
+- name: Run multiple commands in one shell on remote host
+  shell_cmds:
+    cmds: "{{ config_cmds }}"
+    executor: session
+'''
 
-    rc, out, err = module.run_command(cmd, use_unsafe_shell=True)
-    result = dict(
+def build_result(cmd, rc, out, err, start, end):
+    return dict(
         cmd=cmd,
         rc=rc,
         stdout=out,
         stderr=err,
         stdout_lines=out.splitlines(),
-        stderr_lines=err.splitlines()
+        stderr_lines=err.splitlines(),
+        start=str(start),
+        end=str(end),
+        delta=str(end - start)
     )
-    return result
+
+def run_cmd(module, cmd):
+
+    start = datetime.datetime.now()
+    rc, out, err = module.run_command(cmd, use_unsafe_shell=True)
+    return build_result(cmd, rc, out, err, start, datetime.datetime.now())
+
+def run_cmds_in_session(module, cmds, continue_on_fail):
+    """
+    Run the commands in one /bin/sh process. The commands are written to the stdin of the shell while their output
+    is read. After every command, the shell prints a sentinel to stdout, followed by the return code of the command,
+    and to stderr, so that the output of every command can be split from the streams.
+    """
+    sentinel = 'SHELL_CMDS_%s' % uuid.uuid4().hex
+    script = []
+    for cmd in cmds:
+        # eval in a subshell: syntax errors fail the command only, and the commands don't affect each other
+        script.append('( eval %s ) </dev/null\n__rc=$?\n' % shlex_quote(cmd))
+        script.append("printf '%%s %%d\\n' %s $__rc\nprintf '%%s\\n' %s >&2\n" % (sentinel, sentinel))
+        if not continue_on_fail:
+            script.append('[ $__rc -eq 0 ] || exit $__rc\n')
+    script.append('exit 0\n')
+    script = to_bytes(''.join(script))
+    sentinel = to_bytes(sentinel)
+
+    env = os.environ.copy()
+    env.update(getattr(module, 'run_command_environ_update', {}))
+    proc = subprocess.Popen(['/bin/sh'], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            env=env, close_fds=True)
+    stdin, stdout, stderr = proc.stdin.fileno(), proc.stdout.fileno(), proc.stderr.fileno()
+    buffers = {stdout: b'', stderr: b''}
+    readers = [stdout, stderr]
+    written = 0
+
+    results = []
+    start = datetime.datetime.now()
+    while len(results) < len(cmds):
+        writers = [stdin] if written < len(script) else []
+        if not readers:
+            break
+        rlist, wlist, _ = select.select(readers, writers, [])
+        if wlist:
+            try:
+                written += os.write(stdin, script[written:written + select.PIPE_BUF])
+            except OSError:
+                # The shell exited
+                written = len(script)
+            if written == len(script):
+                proc.stdin.close()
+        for fd in rlist:
+            data = os.read(fd, 65536)
+            if data:
+                buffers[fd] += data
+            else:
+                readers.remove(fd)
+
+        # Collect the commands which completed
+        while len(results) < len(cmds):
+            out_end = buffers[stdout].find(sentinel)
+            rc_end = buffers[stdout].find(b'\n', out_end) if out_end >= 0 else -1
+            err_end = buffers[stderr].find(sentinel)
+            if rc_end < 0 or err_end < 0:
+                break
+            end = datetime.datetime.now()
+            rc = int(buffers[stdout][out_end + len(sentinel):rc_end])
+            results.append(build_result(cmds[len(results)], rc,
+                                        to_text(buffers[stdout][:out_end], errors='surrogate_or_strict'),
+                                        to_text(buffers[stderr][:err_end], errors='surrogate_or_strict'),
+                                        start, end))
+            buffers[stdout] = buffers[stdout][rc_end + 1:]
+            buffers[stderr] = buffers[stderr][err_end + len(sentinel) + 1:]
+            start = end
+            if rc != 0 and not continue_on_fail:
+                break
+        if results and results[-1]['rc'] != 0 and not continue_on_fail:
+            break
+
+    if not proc.stdin.closed:
+        proc.stdin.close()
+    rc = proc.wait()
+    if len(results) < len(cmds) and (not results or results[-1]['rc'] == 0 or continue_on_fail):
+        # The shell was killed while running a command
+        results.append(build_result(cmds[len(results)], rc or -1,
+                                    to_text(buffers[stdout], errors='surrogate_or_strict'),
+                                    to_text(buffers[stderr], errors='surrogate_or_strict'),
+                                    start, datetime.datetime.now()))
+    return results
 
 def main():
 
     module = AnsibleModule(
         argument_spec=dict(
             cmds=dict(type='list', required=True),
-            continue_on_fail=dict(type='bool', default=True)
+            continue_on_fail=dict(type='bool', default=True),
+            executor=dict(type='str', default='fork', choices=['fork', 'session'])
         )
     )
 
@@ -105,12 +217,15 @@ def main():
 
     startd = datetime.datetime.now()
 
-    results = []
-    for cmd in cmds:
-        result = run_cmd(module, cmd)
-        results.append(result)
-        if result['rc'] != 0 and not continue_on_fail:
-            break
+    if module.params['executor'] == 'session':
+        results = run_cmds_in_session(module, cmds, continue_on_fail)
+    else:
+        results = []
+        for cmd in cmds:
+            result = run_cmd(module, cmd)
+            results.append(result)
+            if result['rc'] != 0 and not continue_on_fail:
+                break
 
     endd = datetime.datetime.now()
     delta = endd - startd
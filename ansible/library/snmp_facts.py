@@ -77,6 +77,16 @@ options:
         description:
             - Encryption key, required if version is authPriv
         required: false
+    max_repetitions:
+        description:
+            - Number of rows of every column requested in a GETBULK request when walking tables
+        required: false
+        default: 25
+    concurrency:
+        description:
+            - Number of tables walked concurrently
+        required: false
+        default: 4
 '''
 
 EXAMPLES = '''
@@ -97,9 +107,11 @@ EXAMPLES = '''
 
 from ansible.module_utils.basic import *
 from collections import defaultdict
+from multiprocessing.pool import ThreadPool
 
 try:
     from pysnmp.proto import rfc1902
+    from pysnmp.proto import rfc1905
     from pysnmp.entity.rfc3413.oneliner import cmdgen
     from pyasn1.type import univ
     has_pysnmp = True
@@ -293,6 +305,207 @@ def decode_type(module, current_oid, val):
 
     return pyVal
 
+# Tables walked by snmp_facts: description used in errors, columns (attributes of DefineOid)
+WALKS = [
+    ('interface details', ['ifIndex', 'ifDescr', 'ifType', 'ifMtu', 'ifSpeed', 'ifPhysAddress', 'ifAdminStatus',
+                           'ifOperStatus']),
+    ('interface extensions', ['ifHighSpeed', 'ifAlias']),
+    ('interface addresses', ['ipAdEntAddr', 'ipAdEntIfIndex', 'ipAdEntNetMask']),
+    ('interface counters', ['ifInDiscards', 'ifOutDiscards', 'ifInErrors', 'ifOutErrors', 'ifInUcastPkts',
+                            'ifOutUcastPkts']),
+    ('interface HC counters', ['ifHCInOctets', 'ifHCOutOctets']),
+    ('physical table', ['entPhysDescr', 'entPhysContainedIn', 'entPhysClass', 'entPhyParentRelPos', 'entPhysName',
+                        'entPhysHwVer', 'entPhysFwVer', 'entPhysSwVer', 'entPhysSerialNum', 'entPhysMfgName',
+                        'entPhysModelName', 'entPhysIsFRU']),
+    ('sensor table', ['entPhySensorType', 'entPhySensorScale', 'entPhySensorPrecision', 'entPhySensorValue',
+                      'entPhySensorOperStatus']),
+    ('lldpLocPortTable', ['lldpLocPortIdSubtype', 'lldpLocPortId', 'lldpLocPortDesc']),
+    ('lldpLocManAddrTable', ['lldpLocManAddrLen', 'lldpLocManAddrIfSubtype', 'lldpLocManAddrIfId',
+                             'lldpLocManAddrOID']),
+    ('lldpRemTable', ['lldpRemChassisIdSubtype', 'lldpRemChassisId', 'lldpRemPortIdSubtype', 'lldpRemPortId',
+                      'lldpRemPortDesc', 'lldpRemSysName', 'lldpRemSysDesc', 'lldpRemSysCapSupported',
+                      'lldpRemSysCapEnabled']),
+    ('lldpRemManAddrTable', ['lldpRemManAddrIfSubtype', 'lldpRemManAddrIfId', 'lldpRemManAddrOID']),
+    ('PFC counters', ['cpfcIfRequests', 'cpfcIfIndications']),
+    ('PFC counters per priority', ['requestsPerPriority', 'indicationsPerPriority']),
+    ('QoS stats', ['csqIfQosGroupStats']),
+    ('FRU', ['cefcFRUPowerOperStatus']),
+    ('CidrRouteTable', ['ipCidrRouteEntry', 'ipCidrRouteStatus']),
+]
+
+
+class OidTrie(object):
+    """
+    Map OID prefixes to handlers. An OID is dispatched to the handler of its longest registered prefix,
+    with the remaining components, i.e. the index of the row in the table.
+    """
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, oid, handler):
+        node = self.root
+        for component in oid.split('.'):
+            node = node.setdefault(int(component), {})
+        node[None] = handler
+
+    def lookup(self, oid):
+        """Return (handler, index) of an OID given as a tuple of integers, None if no prefix matches."""
+        node = self.root
+        match = None
+        for position, component in enumerate(oid):
+            node = node.get(component)
+            if node is None:
+                break
+            if None in node:
+                match = (node[None], oid[position + 1:])
+        return match
+
+
+def build_column_trie(v, results, ipv4_networks):
+    """
+    Return an OidTrie dispatching the values of the walked columns to handlers storing them in the results.
+    Handlers are called with the index of the row as a tuple of integers and the value as a string.
+    """
+    trie = OidTrie()
+
+    def set_row(table, key, row=lambda index: index[-1], convert=None):
+        def handler(index, val):
+            results[table][row(index)][key] = convert(val) if convert else val
+        return handler
+
+    for column, key, convert in [
+            ('ifIndex', 'ifindex', None),
+            ('ifDescr', 'name', None),
+            ('ifType', 'type', None),
+            ('ifMtu', 'mtu', None),
+            ('ifSpeed', 'speed', None),
+            ('ifPhysAddress', 'mac', decode_mac),
+            ('ifAdminStatus', 'adminstatus', lambda val: lookup_adminstatus(int(val))),
+            ('ifOperStatus', 'operstatus', lambda val: lookup_operstatus(int(val))),
+            ('ifHighSpeed', 'ifHighSpeed', None),
+            ('ifAlias', 'description', None),
+            ('ifInDiscards', 'ifInDiscards', None),
+            ('ifOutDiscards', 'ifOutDiscards', None),
+            ('ifInErrors', 'ifInErrors', None),
+            ('ifOutErrors', 'ifOutErrors', None),
+            ('ifHCInOctets', 'ifHCInOctets', None),
+            ('ifHCOutOctets', 'ifHCOutOctets', None),
+            ('ifInUcastPkts', 'ifInUcastPkts', None),
+            ('ifOutUcastPkts', 'ifOutUcastPkts', None),
+            ('lldpLocPortIdSubtype', 'lldpLocPortIdSubtype', None),
+            ('lldpLocPortId', 'lldpLocPortId', None),
+            ('lldpLocPortDesc', 'lldpLocPortDesc', None),
+            ('cpfcIfRequests', 'cpfcIfRequests', None),
+            ('cpfcIfIndications', 'cpfcIfIndications', None)]:
+        trie.add(getattr(v, column), set_row('snmp_interfaces', key, convert=convert))
+
+    # + .time mark + .ifindex + .rem index
+    for column in ['lldpRemChassisIdSubtype', 'lldpRemChassisId', 'lldpRemPortIdSubtype', 'lldpRemPortId',
+                   'lldpRemPortDesc', 'lldpRemSysName', 'lldpRemSysDesc', 'lldpRemSysCapSupported',
+                   'lldpRemSysCapEnabled', 'lldpRemManAddrIfSubtype', 'lldpRemManAddrIfId', 'lldpRemManAddrOID']:
+        trie.add(getattr(v, column), set_row('snmp_interfaces', column, row=lambda index: index[1]))
+
+    for column, convert in [
+            ('entPhysDescr', None),
+            ('entPhysContainedIn', int),
+            ('entPhysClass', int),
+            ('entPhyParentRelPos', int),
+            ('entPhysName', None),
+            ('entPhysHwVer', None),
+            ('entPhysFwVer', None),
+            ('entPhysSwVer', None),
+            ('entPhysSerialNum', None),
+            ('entPhysMfgName', None),
+            ('entPhysModelName', None),
+            ('entPhysIsFRU', int)]:
+        trie.add(getattr(v, column), set_row('snmp_physical_entities', column, convert=convert))
+
+    for column, convert in [
+            ('entPhySensorType', None),
+            ('entPhySensorScale', int),
+            ('entPhySensorPrecision', None),
+            ('entPhySensorValue', None),
+            ('entPhySensorOperStatus', None)]:
+        trie.add(getattr(v, column), set_row('snmp_sensors', column, convert=convert))
+
+    def set_lldp(key):
+        def handler(index, val):
+            results['snmp_lldp'][key] = val
+        return handler
+
+    # + .subtype + .man addr
+    for column in ['lldpLocManAddrLen', 'lldpLocManAddrIfSubtype', 'lldpLocManAddrIfId', 'lldpLocManAddrOID']:
+        trie.add(getattr(v, column), set_lldp(column))
+
+    def ipv4_address(key):
+        def handler(index, val):
+            ipv4_networks['.'.join(str(component) for component in index[-4:])][key] = val
+            if key == 'address':
+                results['ansible_all_ipv4_addresses'].append(val)
+        return handler
+
+    trie.add(v.ipAdEntAddr, ipv4_address('address'))
+    trie.add(v.ipAdEntIfIndex, ipv4_address('interface'))
+    trie.add(v.ipAdEntNetMask, ipv4_address('netmask'))
+
+    def per_priority(key):
+        def handler(index, val):
+            results['snmp_interfaces'][index[-2]][key][index[-1]] = val
+        return handler
+
+    trie.add(v.requestsPerPriority, per_priority('requestsPerPriority'))
+    trie.add(v.indicationsPerPriority, per_priority('indicationsPerPriority'))
+
+    def qos_group_stats(index, val):
+        ifIndex, ifDirection, queueId, counterId = index[-4:]
+        results['snmp_interfaces'][ifIndex]['queues'][ifDirection][queueId][counterId] = val
+
+    trie.add(v.csqIfQosGroupStats, qos_group_stats)
+    trie.add(v.cefcFRUPowerOperStatus, set_row('snmp_psu', 'operstatus'))
+
+    def cidr_route(key):
+        def handler(index, val):
+            # next hop IP
+            results['snmp_cidr_route']['.'.join(str(component) for component in index)][key] = val
+        return handler
+
+    trie.add(v.ipCidrRouteEntry, cidr_route('route_dest'))
+    trie.add(v.ipCidrRouteStatus, cidr_route('status'))
+
+    return trie
+
+
+def bulk_walk(snmp_auth, host, columns, max_repetitions):
+    """
+    Walk columns with GETBULK requests. Every thread must use its own CommandGenerator.
+
+    Returns:
+        (errorIndication, [(oid as a tuple of integers, value), ...]) of the rows in the columns.
+    """
+    cmdGen = cmdgen.CommandGenerator()
+    errorIndication, errorStatus, errorIndex, varTable = cmdGen.bulkCmd(
+        snmp_auth,
+        cmdgen.UdpTransportTarget((host, 161)),
+        0, max_repetitions,
+        *[cmdgen.MibVariable(column,) for column in columns],
+        lookupMib=False, lexicographicMode=False
+    )
+
+    if errorIndication:
+        return errorIndication, []
+
+    prefixes = [tuple(int(component) for component in column.strip('.').split('.')) for column in columns]
+    varBinds = []
+    for varBindRow in varTable:
+        for prefix, (oid, val) in zip(prefixes, varBindRow):
+            oid = tuple(oid)
+            # Skip the values of columns which reached their end before the others
+            if val is None or oid[:len(prefix)] != prefix or isinstance(val, rfc1905.EndOfMibView):
+                continue
+            varBinds.append((oid, val))
+    return None, varBinds
+
 
 def main():
     module = AnsibleModule(
@@ -308,6 +521,8 @@ def main():
             privkey=dict(required=False),
             is_dell=dict(required=False, default=False, type='bool'),
             is_eos=dict(required=False, default=False, type='bool'),
+            max_repetitions=dict(required=False, default=25, type='int'),
+            concurrency=dict(required=False, default=4, type='int'),
             removeplaceholder=dict(required=False)),
             required_together = ( ['username','level','integrity','authkey'],['privacy','privkey'],),
         supports_check_mode=False)
@@ -408,222 +623,26 @@ def main():
         elif current_oid == v.sysLocation:
             results['ansible_syslocation'] = current_val
 
-    errorIndication, errorStatus, errorIndex, varTable = cmdGen.nextCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)),
-        cmdgen.MibVariable(p.ifIndex,),
-        cmdgen.MibVariable(p.ifDescr,),
-        cmdgen.MibVariable(p.ifType,),
-        cmdgen.MibVariable(p.ifMtu,),
-        cmdgen.MibVariable(p.ifSpeed,),
-        cmdgen.MibVariable(p.ifPhysAddress,),
-        cmdgen.MibVariable(p.ifAdminStatus,),
-        cmdgen.MibVariable(p.ifOperStatus,),
-        cmdgen.MibVariable(p.ifHighSpeed,),
-        cmdgen.MibVariable(p.ipAdEntAddr,),
-        cmdgen.MibVariable(p.ipAdEntIfIndex,),
-        cmdgen.MibVariable(p.ipAdEntNetMask,),
-        cmdgen.MibVariable(p.ifAlias,),
-        lookupMib=False, lexicographicMode=False
-    )
-
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication) + ' querying interface details')
-
-    interface_indexes = []
-
-    all_ipv4_addresses = []
+    results['ansible_all_ipv4_addresses'] = []
     ipv4_networks = Tree()
+    trie = build_column_trie(v, results, ipv4_networks)
 
-    for varBinds in varTable:
-        for oid, val in varBinds:
-            current_oid = oid.prettyPrint()
-            current_val = val.prettyPrint()
-            if v.ifIndex in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['ifindex'] = current_val
-                interface_indexes.append(ifIndex)
-            if v.ifDescr in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['name'] = current_val
-            if v.ifType in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['type'] = current_val
-            if v.ifMtu in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['mtu'] = current_val
-            if v.ifSpeed in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['speed'] = current_val
-            if v.ifPhysAddress in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['mac'] = decode_mac(current_val)
-            if v.ifAdminStatus in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['adminstatus'] = lookup_adminstatus(int(current_val))
-            if v.ifOperStatus in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['operstatus'] = lookup_operstatus(int(current_val))
-            if v.ifHighSpeed in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['ifHighSpeed'] = current_val
-            if v.ipAdEntAddr in current_oid:
-                curIPList = current_oid.rsplit('.', 4)[-4:]
-                curIP = ".".join(curIPList)
-                ipv4_networks[curIP]['address'] = current_val
-                all_ipv4_addresses.append(current_val)
-            if v.ipAdEntIfIndex in current_oid:
-                curIPList = current_oid.rsplit('.', 4)[-4:]
-                curIP = ".".join(curIPList)
-                ipv4_networks[curIP]['interface'] = current_val
-            if v.ipAdEntNetMask in current_oid:
-                curIPList = current_oid.rsplit('.', 4)[-4:]
-                curIP = ".".join(curIPList)
-                ipv4_networks[curIP]['netmask'] = current_val
-            if v.ifAlias in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['description'] = current_val
-
-    errorIndication, errorStatus, errorIndex, varTable = cmdGen.nextCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)),
-        cmdgen.MibVariable(p.ifInDiscards,),
-        cmdgen.MibVariable(p.ifOutDiscards,),
-        cmdgen.MibVariable(p.ifInErrors,),
-        cmdgen.MibVariable(p.ifOutErrors,),
-        cmdgen.MibVariable(p.ifHCInOctets,),
-        cmdgen.MibVariable(p.ifHCOutOctets,),
-        cmdgen.MibVariable(p.ifInUcastPkts,),
-        cmdgen.MibVariable(p.ifOutUcastPkts,),
-        lookupMib=False, lexicographicMode=False
-    )
-
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication) + ' querying interface counters')
-
-    for varBinds in varTable:
-        for oid, val in varBinds:
-            current_oid = oid.prettyPrint()
-            current_val = val.prettyPrint()
-            if v.ifInDiscards in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['ifInDiscards'] = current_val
-            if v.ifOutDiscards in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['ifOutDiscards'] = current_val
-            if v.ifInErrors in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['ifInErrors'] = current_val
-            if v.ifOutErrors in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['ifOutErrors'] = current_val
-            if v.ifHCInOctets in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['ifHCInOctets'] = current_val
-            if v.ifHCOutOctets in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['ifHCOutOctets'] = current_val
-            if v.ifInUcastPkts in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['ifInUcastPkts'] = current_val
-            if v.ifOutUcastPkts in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['ifOutUcastPkts'] = current_val
-
-    errorIndication, errorStatus, errorIndex, varTable = cmdGen.nextCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)),
-        cmdgen.MibVariable(p.entPhysDescr,),
-        cmdgen.MibVariable(p.entPhysContainedIn, ),
-        cmdgen.MibVariable(p.entPhysClass,),
-        cmdgen.MibVariable(p.entPhyParentRelPos, ),
-        cmdgen.MibVariable(p.entPhysName,),
-        cmdgen.MibVariable(p.entPhysHwVer,),
-        cmdgen.MibVariable(p.entPhysFwVer,),
-        cmdgen.MibVariable(p.entPhysSwVer,),
-        cmdgen.MibVariable(p.entPhysSerialNum,),
-        cmdgen.MibVariable(p.entPhysMfgName,),
-        cmdgen.MibVariable(p.entPhysModelName,),
-        cmdgen.MibVariable(p.entPhysIsFRU, ),
-    )
+    pool = ThreadPool(min(m_args['concurrency'], len(WALKS)))
+    try:
+        walked = pool.map(lambda walk: bulk_walk(snmp_auth, m_args['host'], [getattr(p, column) for column in walk[1]],
+                                                 m_args['max_repetitions']), WALKS)
+    finally:
+        pool.close()
 
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication) + ' querying physical table')
+    for (description, _), (errorIndication, varBinds) in zip(WALKS, walked):
+        if errorIndication:
+            module.fail_json(msg=str(errorIndication) + ' querying ' + description)
 
-    for varBinds in varTable:
         for oid, val in varBinds:
-            current_oid = oid.prettyPrint()
-            current_val = val.prettyPrint()
-            if v.entPhysDescr in current_oid:
-                entity_oid = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_physical_entities'][entity_oid]['entPhysDescr'] = current_val
-            if v.entPhysContainedIn in current_oid:
-                entity_oid = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_physical_entities'][entity_oid]['entPhysContainedIn'] = int(current_val)
-            if v.entPhysClass in current_oid:
-                entity_oid = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_physical_entities'][entity_oid]['entPhysClass'] = int(current_val)
-            if v.entPhyParentRelPos in current_oid:
-                entity_oid = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_physical_entities'][entity_oid]['entPhyParentRelPos'] = int(current_val)
-            if v.entPhysName in current_oid:
-                entity_oid = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_physical_entities'][entity_oid]['entPhysName'] = current_val
-            if v.entPhysHwVer in current_oid:
-                entity_oid = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_physical_entities'][entity_oid]['entPhysHwVer'] = current_val
-            if v.entPhysFwVer in current_oid:
-                entity_oid = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_physical_entities'][entity_oid]['entPhysFwVer'] = current_val
-            if v.entPhysSwVer in current_oid:
-                entity_oid = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_physical_entities'][entity_oid]['entPhysSwVer'] = current_val
-            if v.entPhysSerialNum in current_oid:
-                entity_oid = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_physical_entities'][entity_oid]['entPhysSerialNum'] = current_val
-            if v.entPhysMfgName in current_oid:
-                entity_oid = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_physical_entities'][entity_oid]['entPhysMfgName'] = current_val
-            if v.entPhysModelName in current_oid:
-                entity_oid = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_physical_entities'][entity_oid]['entPhysModelName'] = current_val
-            if v.entPhysIsFRU in current_oid:
-                entity_oid = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_physical_entities'][entity_oid]['entPhysIsFRU'] = int(current_val)
-
-
-    errorIndication, errorStatus, errorIndex, varTable = cmdGen.nextCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)),
-        cmdgen.MibVariable(p.entPhySensorType,),
-        cmdgen.MibVariable(p.entPhySensorScale,),
-        cmdgen.MibVariable(p.entPhySensorPrecision,),
-        cmdgen.MibVariable(p.entPhySensorValue,),
-        cmdgen.MibVariable(p.entPhySensorOperStatus,),
-    )
-
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication) + ' querying physical table')
-
-    for varBinds in varTable:
-        for oid, val in varBinds:
-            current_oid = oid.prettyPrint()
-            current_val = val.prettyPrint()
-            if v.entPhySensorType in current_oid:
-                sensor_oid = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_sensors'][sensor_oid]['entPhySensorType'] = current_val
-            if v.entPhySensorScale in current_oid:
-                sensor_oid = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_sensors'][sensor_oid]['entPhySensorScale'] = int(current_val)
-            if v.entPhySensorPrecision in current_oid:
-                sensor_oid = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_sensors'][sensor_oid]['entPhySensorPrecision'] = current_val
-            if v.entPhySensorValue in current_oid:
-                sensor_oid = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_sensors'][sensor_oid]['entPhySensorValue'] = current_val
-            if v.entPhySensorOperStatus in current_oid:
-                sensor_oid = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_sensors'][sensor_oid]['entPhySensorOperStatus'] = current_val
+            match = trie.lookup(oid)
+            if match:
+                handler, index = match
+                handler(index, val.prettyPrint())
 
     interface_to_ipv4 = {}
     for ipv4_network in ipv4_networks:
@@ -641,8 +660,6 @@ def main():
     for interface in interface_to_ipv4:
         results['snmp_interfaces'][int(interface)]['ipv4'] = interface_to_ipv4[interface]
 
-    results['ansible_all_ipv4_addresses'] = all_ipv4_addresses
-
     if m_args['is_dell']:
         errorIndication, errorStatus, errorIndex, varBinds = cmdGen.getCmd(
             snmp_auth,
@@ -684,227 +701,6 @@ def main():
         elif current_oid == v.lldpLocSysDesc:
             results['snmp_lldp']['lldpLocSysDesc'] = current_val
 
-    errorIndication, errorStatus, errorIndex, varTable = cmdGen.nextCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)),
-        cmdgen.MibVariable(p.lldpLocPortIdSubtype,),
-        cmdgen.MibVariable(p.lldpLocPortId,),
-        cmdgen.MibVariable(p.lldpLocPortDesc,),
-    )
-
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication) + ' querying lldpLocPortTable counters')
-
-    for varBinds in varTable:
-        for oid, val in varBinds:
-            current_oid = oid.prettyPrint()
-            current_val = val.prettyPrint()
-            if v.lldpLocPortIdSubtype in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['lldpLocPortIdSubtype'] = current_val
-            if v.lldpLocPortId in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['lldpLocPortId'] = current_val
-            if v.lldpLocPortDesc in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['lldpLocPortDesc'] = current_val
-
-    errorIndication, errorStatus, errorIndex, varTable = cmdGen.nextCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)),
-        cmdgen.MibVariable(p.lldpLocManAddrLen,),
-        cmdgen.MibVariable(p.lldpLocManAddrIfSubtype,),
-        cmdgen.MibVariable(p.lldpLocManAddrIfId,),
-        cmdgen.MibVariable(p.lldpLocManAddrOID,),
-    )
-
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication) + ' querying lldpLocPortTable counters')
-
-    for varBinds in varTable:
-        for oid, val in varBinds:
-            current_oid = oid.prettyPrint()
-            current_val = val.prettyPrint()
-            if v.lldpLocManAddrLen in current_oid:
-                address = '.'.join(current_oid.split('.')[13:])
-                results['snmp_lldp']['lldpLocManAddrLen'] = current_val
-            if v.lldpLocManAddrIfSubtype in current_oid:
-                address = '.'.join(current_oid.split('.')[13:])
-                results['snmp_lldp']['lldpLocManAddrIfSubtype'] = current_val
-            if v.lldpLocManAddrIfId in current_oid:
-                address = '.'.join(current_oid.split('.')[13:])
-                results['snmp_lldp']['lldpLocManAddrIfId'] = current_val
-            if v.lldpLocManAddrOID in current_oid:
-                address = '.'.join(current_oid.split('.')[13:])
-                results['snmp_lldp']['lldpLocManAddrOID'] = current_val
-
-    errorIndication, errorStatus, errorIndex, varTable = cmdGen.nextCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)),
-        cmdgen.MibVariable(p.lldpRemChassisIdSubtype,),
-        cmdgen.MibVariable(p.lldpRemChassisId,),
-        cmdgen.MibVariable(p.lldpRemPortIdSubtype,),
-        cmdgen.MibVariable(p.lldpRemPortId,),
-        cmdgen.MibVariable(p.lldpRemPortDesc,),
-        cmdgen.MibVariable(p.lldpRemSysName,),
-        cmdgen.MibVariable(p.lldpRemSysDesc,),
-        cmdgen.MibVariable(p.lldpRemSysCapSupported,),
-        cmdgen.MibVariable(p.lldpRemSysCapEnabled,),
-    )
-
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication) + ' querying lldpLocPortTable counters')
-
-    for varBinds in varTable:
-        for oid, val in varBinds:
-            current_oid = oid.prettyPrint()
-            current_val = val.prettyPrint()
-            if v.lldpRemChassisIdSubtype in current_oid:
-                ifIndex = int(current_oid.split('.')[12])
-                results['snmp_interfaces'][ifIndex]['lldpRemChassisIdSubtype'] = current_val
-            if v.lldpRemChassisId in current_oid:
-                ifIndex = int(current_oid.split('.')[12])
-                results['snmp_interfaces'][ifIndex]['lldpRemChassisId'] = current_val
-            if v.lldpRemPortIdSubtype in current_oid:
-                ifIndex = int(current_oid.split('.')[12])
-                results['snmp_interfaces'][ifIndex]['lldpRemPortIdSubtype'] = current_val
-            if v.lldpRemPortId in current_oid:
-                ifIndex = int(current_oid.split('.')[12])
-                results['snmp_interfaces'][ifIndex]['lldpRemPortId'] = current_val
-            if v.lldpRemPortDesc in current_oid:
-                ifIndex = int(current_oid.split('.')[12])
-                results['snmp_interfaces'][ifIndex]['lldpRemPortDesc'] = current_val
-            if v.lldpRemSysName in current_oid:
-                ifIndex = int(current_oid.split('.')[12])
-                results['snmp_interfaces'][ifIndex]['lldpRemSysName'] = current_val
-            if v.lldpRemSysDesc in current_oid:
-                ifIndex = int(current_oid.split('.')[12])
-                results['snmp_interfaces'][ifIndex]['lldpRemSysDesc'] = current_val
-            if v.lldpRemSysCapSupported in current_oid:
-                ifIndex = int(current_oid.split('.')[12])
-                results['snmp_interfaces'][ifIndex]['lldpRemSysCapSupported'] = current_val
-            if v.lldpRemSysCapEnabled in current_oid:
-                ifIndex = int(current_oid.split('.')[12])
-                results['snmp_interfaces'][ifIndex]['lldpRemSysCapEnabled'] = current_val
-
-    errorIndication, errorStatus, errorIndex, varTable = cmdGen.nextCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)),
-        cmdgen.MibVariable(p.lldpRemManAddrIfSubtype,),
-        cmdgen.MibVariable(p.lldpRemManAddrIfId,),
-        cmdgen.MibVariable(p.lldpRemManAddrOID,),
-    )
-
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication) + ' querying lldpLocPortTable counters')
-
-    for varBinds in varTable:
-        for oid, val in varBinds:
-            current_oid = oid.prettyPrint()
-            current_val = val.prettyPrint()
-            if v.lldpRemManAddrIfSubtype in current_oid:
-                ifIndex = int(current_oid.split('.')[12])
-                address = '.'.join(current_oid.split('.')[16:])
-                results['snmp_interfaces'][ifIndex]['lldpRemManAddrIfSubtype'] = current_val
-            if v.lldpRemManAddrIfId in current_oid:
-                ifIndex = int(current_oid.split('.')[12])
-                address = '.'.join(current_oid.split('.')[16:])
-                results['snmp_interfaces'][ifIndex]['lldpRemManAddrIfId'] = current_val
-            if v.lldpRemManAddrOID in current_oid:
-                ifIndex = int(current_oid.split('.')[12])
-                address = '.'.join(current_oid.split('.')[16:])
-                results['snmp_interfaces'][ifIndex]['lldpRemManAddrOID'] = current_val
-
-    errorIndication, errorStatus, errorIndex, varTable = cmdGen.nextCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)),
-        cmdgen.MibVariable(p.cpfcIfRequests,),
-        cmdgen.MibVariable(p.cpfcIfIndications,),
-        cmdgen.MibVariable(p.requestsPerPriority,),
-        cmdgen.MibVariable(p.indicationsPerPriority,),
-    )
-
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication) + ' querying PFC counters')
-
-    for varBinds in varTable:
-        for oid, val in varBinds:
-            current_oid = oid.prettyPrint()
-            current_val = val.prettyPrint()
-            if v.cpfcIfRequests in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['cpfcIfRequests'] = current_val
-            if v.cpfcIfIndications in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['snmp_interfaces'][ifIndex]['cpfcIfIndications'] = current_val
-            if v.requestsPerPriority in current_oid:
-                ifIndex = int(current_oid.split('.')[-2])
-                prio = int(current_oid.split('.')[-1])
-                results['snmp_interfaces'][ifIndex]['requestsPerPriority'][prio] = current_val
-            if v.indicationsPerPriority in current_oid:
-                ifIndex = int(current_oid.split('.')[-2])
-                prio = int(current_oid.split('.')[-1])
-                results['snmp_interfaces'][ifIndex]['indicationsPerPriority'][prio] = current_val
-
-    errorIndication, errorStatus, errorIndex, varTable = cmdGen.nextCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)),
-        cmdgen.MibVariable(p.csqIfQosGroupStats,),
-    )
-
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication) + ' querying QoS stats')
-
-    for varBinds in varTable:
-        for oid, val in varBinds:
-            current_oid = oid.prettyPrint()
-            current_val = val.prettyPrint()
-            if v.csqIfQosGroupStats in current_oid:
-                ifIndex = int(current_oid.split('.')[-4])
-                ifDirection = int(current_oid.split('.')[-3])
-                queueId = int(current_oid.split('.')[-2])
-                counterId = int(current_oid.split('.')[-1])
-                results['snmp_interfaces'][ifIndex]['queues'][ifDirection][queueId][counterId] = current_val
-
-    errorIndication, errorStatus, errorIndex, varTable = cmdGen.nextCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)),
-        cmdgen.MibVariable(p.cefcFRUPowerOperStatus,),
-    )
-
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication) + ' querying FRU')
-
-    for varBinds in varTable:
-        for oid, val in varBinds:
-            current_oid = oid.prettyPrint()
-            current_val = val.prettyPrint()
-            if v.cefcFRUPowerOperStatus in current_oid:
-                psuIndex = int(current_oid.split('.')[-1])
-                results['snmp_psu'][psuIndex]['operstatus'] = current_val
-
-    errorIndication, errorStatus, errorIndex, varTable = cmdGen.nextCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)),
-        cmdgen.MibVariable(p.ipCidrRouteEntry,),
-        cmdgen.MibVariable(p.ipCidrRouteStatus,),
-    )
-
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication) + ' querying CidrRouteTable')
-
-    for varBinds in varTable:
-        for oid, val in varBinds:
-            current_oid = oid.prettyPrint()
-            current_val = val.prettyPrint()
-            if v.ipCidrRouteEntry in current_oid:
-                # extract next hop ip from oid
-                next_hop = current_oid.split(v.ipCidrRouteEntry + ".")[1]
-                results['snmp_cidr_route'][next_hop]['route_dest'] = current_val
-            if v.ipCidrRouteStatus in current_oid:
-                next_hop = current_oid.split(v.ipCidrRouteStatus + ".")[1]
-                results['snmp_cidr_route'][next_hop]['status'] = current_val
-
     if not m_args['is_eos']:
         errorIndication, errorStatus, errorIndex, varBinds = cmdGen.getCmd(
             snmp_auth,
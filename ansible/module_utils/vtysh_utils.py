@@ -0,0 +1,152 @@
+"""
+Helpers to query the routing stack in the bgp containers of the DUT with vtysh.
+
+    - run_vtysh runs many vtysh commands with a few 'docker exec', passing several '-c' options to vtysh
+    - split_json_outputs splits the concatenated JSON outputs of these commands
+    - is_frr detects whether the routing stack is FRR or Quagga, the result is cached on the DUT per image
+    - BgpRouteIndex indexes a 'show ip bgp json' dump per prefix, to look up many prefixes with one query
+"""
+import json
+import os
+
+import netaddr
+
+try:
+    from shlex import quote as shlex_quote
+except ImportError:
+    from pipes import quote as shlex_quote
+
+# Commands passed to vtysh per 'docker exec'
+VTYSH_BATCH_SIZE = 100
+SONIC_VERSION_FILE = '/etc/sonic/sonic_version.yml'
+ROUTING_STACK_CACHE_FILE = '/tmp/vtysh_routing_stack.json'
+
+
+def vtysh_command(commands, instance='bgp'):
+    return 'docker exec -i {} vtysh {}'.format(
+        instance, ' '.join('-c {}'.format(shlex_quote(command)) for command in commands))
+
+
+def run_vtysh(module, commands, instance='bgp', batch_size=VTYSH_BATCH_SIZE):
+    """
+    Run vtysh commands, batch_size commands per 'docker exec'. Fail the module if a command fails.
+
+    Returns:
+        List of the outputs of the batches.
+    """
+    outputs = []
+    for start in range(0, len(commands), batch_size):
+        command = vtysh_command(commands[start:start + batch_size], instance)
+        rc, out, err = module.run_command(command, use_unsafe_shell=True)
+        if rc != 0:
+            module.fail_json(msg="command %s failed rc=%d, out=%s, err=%s" % (command, rc, out, err))
+        outputs.append(out)
+    return outputs
+
+
+def split_json_outputs(out):
+    """Split the concatenated JSON outputs of several vtysh commands, return the decoded documents."""
+    decoder = json.JSONDecoder()
+    documents = []
+    position = 0
+    while True:
+        while position < len(out) and out[position].isspace():
+            position += 1
+        if position == len(out):
+            return documents
+        try:
+            document, position = decoder.raw_decode(out, position)
+        except ValueError:
+            raise ValueError("Invalid JSON output of vtysh at offset %d: %s" % (position, out[position:position + 200]))
+        documents.append(document)
+
+
+def run_vtysh_json(module, commands, instance='bgp', batch_size=VTYSH_BATCH_SIZE):
+    """Run vtysh commands with JSON output, return the decoded output of every command."""
+    documents = []
+    for out in run_vtysh(module, commands, instance, batch_size):
+        documents.extend(split_json_outputs(out))
+    if len(documents) != len(commands):
+        module.fail_json(msg="Got %d JSON outputs for %d vtysh commands" % (len(documents), len(commands)))
+    return documents
+
+
+def _image_version():
+    try:
+        with open(SONIC_VERSION_FILE) as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def is_frr(module, instance='bgp'):
+    """
+    Return True if the routing stack is FRR, False if it is Quagga.
+
+    The routing stack doesn't change until the image changes, so the result is cached in ROUTING_STACK_CACHE_FILE
+    for the current image.
+    """
+    version = _image_version()
+    cache = {}
+    if version is not None:
+        try:
+            with open(ROUTING_STACK_CACHE_FILE) as f:
+                cache = json.load(f)
+            if cache.get('version') == version and instance in cache.get('is_frr', {}):
+                return cache['is_frr'][instance]
+        except (IOError, OSError, ValueError):
+            cache = {}
+
+    out = run_vtysh(module, ['show version'], instance)[0]
+    frr = "FRRouting" in out
+
+    if version is not None:
+        if cache.get('version') != version:
+            cache = {'version': version, 'is_frr': {}}
+        cache['is_frr'][instance] = frr
+        try:
+            tmp_file = '{}.{}'.format(ROUTING_STACK_CACHE_FILE, os.getpid())
+            with open(tmp_file, 'w') as f:
+                json.dump(cache, f)
+            os.rename(tmp_file, ROUTING_STACK_CACHE_FILE)
+        except (IOError, OSError):
+            pass
+    return frr
+
+
+class BgpRouteIndex(object):
+    """
+    Routes of a 'show ip bgp json' or 'show ipv6 bgp json' dump of FRR, indexed per prefix.
+    """
+
+    def __init__(self, table):
+        # {"10.0.0.0/24": [path, ...], ...}
+        self.routes = table.get('routes', {})
+
+    @staticmethod
+    def _aspath(path):
+        if 'aspath' in path:
+            return path['aspath']['string']
+        # The paths of the table dump have the AS path as a string, empty for local routes
+        return path.get('path') or 'Local'
+
+    def lookup(self, prefix):
+        """
+        Look up the route of a prefix, with the longest prefix match if the prefix is an address without prefix
+        length, like 'show ip bgp <prefix>'.
+
+        Returns:
+            Facts of the route: {'found': True, 'path_num': ..., 'aspath': [...]}, or {'found': False}
+        """
+        if '/' in prefix:
+            candidates = [netaddr.IPNetwork(prefix).cidr]
+        else:
+            address = netaddr.IPAddress(prefix)
+            max_prefixlen = 32 if address.version == 4 else 128
+            candidates = (netaddr.IPNetwork('{}/{}'.format(address, prefixlen)).cidr
+                          for prefixlen in range(max_prefixlen, -1, -1))
+        for candidate in candidates:
+            paths = self.routes.get(str(candidate))
+            if paths:
+                return {'found': True, 'path_num': len(paths), 'aspath': [self._aspath(path) for path in paths]}
+        return {'found': False}
@@ -60,5 +60,10 @@ class ActionModule(ActionBase):
                                       reboot=_reboot,
                                       timeout=_timeout)
 
+        # login and command time of the connections which measure them
+        timing = getattr(self._connection, 'timing', None)
+        if timing is not None:
+            result['timing'] = timing
+
         return result
 
@@ -1,6 +1,7 @@
 from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
+import atexit
 import os
 import subprocess
 import shlex
@@ -17,6 +18,56 @@ from ansible import constants as C
 from ansible.errors import AnsibleError, AnsibleConnectionFailure, AnsibleFileNotFound
 from ansible.plugins.connection import ConnectionBase
 
+# Seconds to wait for the prompt when checking a session kept from a previous command
+SESSION_CHECK_TIMEOUT = 5
+
+# Prompts of the CLI modes, formatted with the hostname of the device:
+# "%s>": non privileged prompt
+# "%s(\([a-z\-]+\))?#": privileged prompt including configure mode
+# Prompt includes Login, Password, and yes/no for "start shell" case in Dell FTOS (launch bash shell)
+CLI_PROMPTS = ["%s>", "%s.+", "%s(\([a-zA-Z0-9\/\-]+\))?#"]
+CLI_DIALOG_PROMPTS = ['[Ll]ogin:', '[Pp]assword:', '\[(confirm )?yes\/no\]:', '\(y\/n\)\??\s?\[n\]']
+# Prompts of the shell mode per device type
+BASH_PROMPTS = {
+    # bash-3.2$ for nexus 6.5
+    'nxos': ['bash-3\.2\$', 'bash-3\.2#'],
+    'eos': ['\$ '],
+}
+# Extra prompts per device type
+EXTRA_PROMPTS = {
+    # default \u@\h:\w# for docker container prompts
+    'mlnx_os': ['%s@.*:.*#' % 'root'],
+}
+
+# Logged in sessions kept alive between the commands run in this process,
+# keyed by (host, user, enable, bash, su)
+_sessions = {}
+# Compiled prompt patterns, keyed by (sku, hostname, bash)
+_prompt_patterns = {}
+
+
+def _close_sessions():
+    for session in _sessions.values():
+        session.client.close()
+    _sessions.clear()
+
+atexit.register(_close_sessions)
+
+
+class Session(object):
+    ''' a logged in pexpect child with the facts learned at login '''
+
+    def __init__(self, client, sku, hname, prompts, home_prompts, login_time):
+        self.client = client
+        self.sku = sku
+        self.hname = hname
+        # prompts expected after a command
+        self.prompts = prompts
+        # prompts of the mode the session was logged in, to check the session is back to it
+        self.home_prompts = home_prompts
+        self.login_time = login_time
+
+
 class Connection(ConnectionBase):
     ''' ssh based connections with expect '''
 
@@ -47,6 +98,10 @@ class Connection(ConnectionBase):
             self._ssh_command += ['-o', 'ControlMaster=auto',
                                   '-o', 'ControlPersist=60s',
                                   '-o', 'ControlPath=/tmp/ansible-ssh-%h-%p-%r']
+        if not any(arg.startswith('ControlPath') for arg in self._ssh_command):
+            # ControlMaster is ignored without ControlPath. With it, the logins after the first one reuse
+            # the master connection of the first one and the password is not asked again.
+            self._ssh_command += ['-o', 'ControlPath=/tmp/ansible-ssh-%h-%p-%r']
 
         if not C.HOST_KEY_CHECKING:
             self._ssh_command += ['-o', 'StrictHostKeyChecking=no']
@@ -60,6 +115,7 @@ class Connection(ConnectionBase):
         return filter(lambda x: x in string.printable, buff)
 
     def _spawn_connect(self):
+        start_time = time.time()
         last_user = None
         client = None
         attempt = 0
@@ -77,8 +133,8 @@ class Connection(ConnectionBase):
                         client.close()
                     self._display.vvv("SSH: EXEC {0}".format(' '.join(cmd)), host=self.host)
                     client = pexpect.spawn(' '.join(cmd), env={'TERM': 'dumb'}, timeout=self.timeout)
-                    i = client.expect(['[Pp]assword:', pexpect.EOF, pexpect.TIMEOUT])
-                    if i == 0:
+                    i = client.expect(['[Pp]assword:', '>', '#', pexpect.EOF, pexpect.TIMEOUT])
+                    if i < 3:
                         break
                     else:
                         self._display.vvv("Establish connection to server failed", host=self.host)
@@ -88,6 +144,12 @@ class Connection(ConnectionBase):
                 else:
                     raise AnsibleError("Establish connection to server failed after tried %d times." % max_retries)
 
+                if i > 0:
+                    # Logged in through the ControlMaster of a previous login, i is the index of '>' or '#'
+                    self._display.vvv("Logged in through ControlMaster", host=self.host)
+                    i -= 1
+                    break
+
             self._display.vvv("Try password %s..." % login_passwd[0:4], host=self.host)
             client.sendline(login_passwd)
             i = client.expect(['>', '#', '[Pp]assword:', pexpect.EOF])
@@ -186,7 +248,48 @@ class Connection(ConnectionBase):
             else:
                 raise AnsibleError("do not support shell mode for sku %s" % self.sku)
 
-        return client
+        prompts, home_prompts = self._compile_prompts(client)
+        return Session(client, self.sku, self.hname, prompts, home_prompts, time.time() - start_time)
+
+    def _compile_prompts(self, client):
+        key = (self.sku, self.hname, self.enable, self.bash)
+        if key not in _prompt_patterns:
+            if not self.bash:
+                prompts = [prompt % self.hname for prompt in CLI_PROMPTS] + CLI_DIALOG_PROMPTS
+                home_prompts = ["%s\s*%s" % (self.hname, '#' if self.enable else '>')]
+            else:
+                prompts = list(BASH_PROMPTS[self.sku])
+                home_prompts = []
+            prompts += EXTRA_PROMPTS.get(self.sku, [])
+            # The prompts of the other modes end the check of the home prompt early
+            home_prompts += prompts + [pexpect.EOF, pexpect.TIMEOUT]
+            prompts.append(pexpect.EOF)
+            _prompt_patterns[key] = (client.compile_pattern_list(prompts), client.compile_pattern_list(home_prompts))
+        return _prompt_patterns[key]
+
+    def _at_home_prompt(self, session):
+        ''' check the session is alive and back to the mode it was logged in '''
+        if not session.client.isalive():
+            return False
+        session.client.sendline('')
+        i = session.client.expect_list(session.home_prompts, timeout=SESSION_CHECK_TIMEOUT)
+        if self.bash:
+            return i < len(BASH_PROMPTS[session.sku])
+        return i == 0
+
+    def _get_session(self, key):
+        ''' return a session kept from a previous command, or a new one '''
+        session = _sessions.pop(key, None)
+        if session is not None:
+            if self._at_home_prompt(session):
+                self._display.vvv("Reuse session logged in %.2fs" % session.login_time, host=self.host)
+                session.client.timeout = self.timeout
+                self.sku = session.sku
+                self.hname = session.hname
+                return session, True
+            self._display.vvv("Session closed by the device or in another mode, log in again", host=self.host)
+            session.client.close()
+        return self._spawn_connect(), False
 
     def exec_command(self, *args, **kwargs):
 
@@ -206,25 +309,13 @@ class Connection(ConnectionBase):
             self.timeout = 60
         self._build_command()
 
-        client = self._spawn_connect()
-
-        # "%s>": non privileged prompt
-        # "%s(\([a-z\-]+\))?#": privileged prompt including configure mode
-        # Prompt includes Login, Password, and yes/no for "start shell" case in Dell FTOS (launch bash shell)
-        if not self.bash:
-            prompts = ["%s>" % self.hname, "%s.+" % self.hname, "%s(\([a-zA-Z0-9\/\-]+\))?#" % self.hname, '[Ll]ogin:', '[Pp]assword:', '\[(confirm )?yes\/no\]:', '\(y\/n\)\??\s?\[n\]']
-        else:
-            if self.sku == 'nxos':
-                # bash-3.2$ for nexus 6.5
-                prompts = ['bash-3\.2\$', 'bash-3\.2#']
-            elif self.sku == 'eos':
-                prompts = ['\$ ']
-
-        if self.sku in ('mlnx_os',):
-            # extend with default \u@\h:\w# for docker container prompts
-            prompts.extend(['%s@.*:.*#' % 'root'])
-
-        prompts.append(pexpect.EOF)
+        user = self.login['user'] if kwargs['root'] else self.login['user'][0][0]
+        key = (self.host, user, self.enable, self.bash, self.su)
+        start_time = time.time()
+        session, reused = self._get_session(key)
+        login_time = time.time() - start_time
+        client = session.client
+        prompts = session.prompts
 
         stdout = ""
         if self.template:
@@ -234,7 +325,7 @@ class Connection(ConnectionBase):
         for cmd in cmds:
             self._display.vvv('> %s' % (cmd), host=self.host)
             client.sendline(cmd)
-            client.expect(prompts)
+            client.expect_list(prompts)
             before = self._remove_unprintable(client.before)
             stdout += before
             self._display.vvv('< %s' % (before), host=self.host)
@@ -258,6 +349,17 @@ class Connection(ConnectionBase):
             if i < 2:
                 raise AnsibleError("Box failed to reboot. stdout = %s" % stdout)
             self._display.vvv("Box rebooted", host=self.host)
+            client.close()
+        elif self._at_home_prompt(session):
+            # Keep the session for the next commands on this device
+            _sessions[key] = session
+        else:
+            client.close()
+
+        command_time = time.time() - start_time - login_time
+        self.timing = {'login': round(login_time, 3), 'commands': round(command_time, 3), 'session_reused': reused}
+        self._display.vvv("Login %.2fs%s, commands %.2fs" % (login_time, " (session reused)" if reused else "",
+                                                              command_time), host=self.host)
 
         return stdout
 
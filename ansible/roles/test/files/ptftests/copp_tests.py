@@ -15,7 +15,9 @@
 # IP2METest
 # DefaultTest
 
+import collections
 import datetime
+import math
 import os
 import ptf
 import signal
@@ -28,6 +30,69 @@ from ptf.base_tests import BaseTest
 from ptf import config
 
 
+SendStats = collections.namedtuple('SendStats', ['sent', 'elapsed', 'target_pps', 'achieved_pps', 'jitter_pps',
+                                                 'max_gap_ms', 'dropped_tokens'])
+
+
+class TokenBucketSender(object):
+    '''
+    Send a packet at a target rate, paced by a token bucket.
+
+    Tokens are added at rate_pps and the bucket holds up to burst tokens, each token sends a packet. The packet is
+    serialized once and the available tokens are sent in a burst with dataplane.send, so the TX rate doesn't depend
+    on the time taken per packet as long as the sender keeps up. When it doesn't, the bucket overflows and the lost
+    tokens are counted: the result is then sender-bound.
+    '''
+    WINDOW_SEC = 0.1
+
+    def __init__(self, dataplane, intf, packet, rate_pps, burst):
+        self.dataplane = dataplane
+        self.device, self.port = intf
+        self.packet = str(packet)
+        self.rate_pps = float(rate_pps)
+        self.burst = burst
+
+    def run(self, duration):
+        send = self.dataplane.send
+        device, port, packet = self.device, self.port, self.packet
+        windows = [0] * int(math.ceil(duration / self.WINDOW_SEC))
+        sent = 0
+        dropped_tokens = 0.0
+        max_gap = 0.0
+        tokens = 1.0
+
+        start = last = last_burst = time.time()
+        end = start + duration
+        while last < end:
+            now = time.time()
+            tokens += (now - last) * self.rate_pps
+            last = now
+            if tokens > self.burst:
+                dropped_tokens += tokens - self.burst
+                tokens = self.burst
+            if tokens < 1:
+                time.sleep((1 - tokens) / self.rate_pps)
+                continue
+
+            count = int(tokens)
+            for _ in xrange(count):
+                send(device, port, packet)
+            tokens -= count
+            sent += count
+            windows[min(int((now - start) / self.WINDOW_SEC), len(windows) - 1)] += count
+            max_gap = max(max_gap, now - last_burst)
+            last_burst = now
+        elapsed = time.time() - start
+
+        # Jitter: standard deviation of the rate over WINDOW_SEC windows
+        rates = [count / self.WINDOW_SEC for count in windows]
+        mean = sum(rates) / len(rates)
+        jitter_pps = math.sqrt(sum((rate - mean) ** 2 for rate in rates) / len(rates))
+
+        return SendStats(sent, elapsed, self.rate_pps, sent / elapsed, jitter_pps, max_gap * 1000,
+                         int(dropped_tokens))
+
+
 class ControlPlaneBaseTest(BaseTest):
     MAX_PORTS = 128
     PPS_LIMIT = 600
@@ -41,6 +106,8 @@ class ControlPlaneBaseTest(BaseTest):
     DEFAULT_SEND_INTERVAL_SEC = 10
     DEFAULT_RECEIVE_WAIT_TIME = 3
     DEFAULT_SERVER_SEND_RATE_LIMIT_PPS = 2000
+    DEFAULT_SEND_BURST = 20  # 10ms of tokens at DEFAULT_SERVER_SEND_RATE_LIMIT_PPS
+    SENDER_BOUND_RATIO = 0.95  # The sender is the bottleneck below this ratio of the target rate
 
     def __init__(self):
         BaseTest.__init__(self)
@@ -57,6 +124,7 @@ class ControlPlaneBaseTest(BaseTest):
         self.peerip = test_params.get('peerip', None)
 
         self.needPreSend = None
+        self.send_stats = None
 
     def log(self, message, debug=False):
         current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -127,16 +195,14 @@ class ControlPlaneBaseTest(BaseTest):
         pre_test_nn_rx_counter = self.dataplane.get_nn_counters(*recv_intf)
 
         start_time = datetime.datetime.now()
-        end_time = datetime.datetime.now() + datetime.timedelta(seconds=self.DEFAULT_SEND_INTERVAL_SEC)
-
-        send_count = 0
-        while datetime.datetime.now() < end_time:
-            testutils.send_packet(self, send_intf, packet)
-            send_count += 1
 
-            # Depending on the server/platform combination it is possible for the server to
-            # overwhelm the DUT, so we add an artificial delay here to rate-limit the server.
-            time.sleep(1.0 / self.DEFAULT_SERVER_SEND_RATE_LIMIT_PPS)
+        # Depending on the server/platform combination it is possible for the server to
+        # overwhelm the DUT, so the server is rate-limited by a token bucket.
+        sender = TokenBucketSender(self.dataplane, send_intf, packet, self.DEFAULT_SERVER_SEND_RATE_LIMIT_PPS,
+                                   self.DEFAULT_SEND_BURST)
+        self.send_stats = sender.run(self.DEFAULT_SEND_INTERVAL_SEC)
+        send_count = self.send_stats.sent
+        end_time = start_time + datetime.timedelta(seconds=self.send_stats.elapsed)
 
         self.log("Sent out %d packets in %ds" % (send_count, self.DEFAULT_SEND_INTERVAL_SEC))
 
@@ -206,6 +272,21 @@ class ControlPlaneBaseTest(BaseTest):
         self.log('Test time = %s' % str(time_delta))
         self.log('TX PPS = %d' % tx_pps)
         self.log('RX PPS = %d' % rx_pps)
+        if self.send_stats is not None:
+            self.log('Sender: %s' % self.sender_summary())
+
+    def sender_bound(self):
+        return (self.send_stats is not None and
+                self.send_stats.achieved_pps < self.send_stats.target_pps * self.SENDER_BOUND_RATIO)
+
+    def sender_summary(self):
+        stats = self.send_stats
+        summary = 'achieved %d of target %d PPS (%.1f%%), jitter %.1f PPS over %dms, max gap %.1fms, %d tokens lost' % (
+            stats.achieved_pps, stats.target_pps, stats.achieved_pps * 100 / stats.target_pps, stats.jitter_pps,
+            TokenBucketSender.WINDOW_SEC * 1000, stats.max_gap_ms, stats.dropped_tokens)
+        if self.sender_bound():
+            summary += ', the sender did not reach the target rate: the result is sender-bound'
+        return summary
 
 
 class NoPolicyTest(ControlPlaneBaseTest):
@@ -227,8 +308,8 @@ class NoPolicyTest(ControlPlaneBaseTest):
             (int(recv_count), int(pkt_rx_limit), str(recv_count > pkt_rx_limit))
         )
 
-        assert(rx_pps > self.NO_POLICER_LIMIT)
-        assert(recv_count > pkt_rx_limit)
+        assert(rx_pps > self.NO_POLICER_LIMIT), self.sender_summary()
+        assert(recv_count > pkt_rx_limit), self.sender_summary()
 
 
 class PolicyTest(ControlPlaneBaseTest):
@@ -247,7 +328,7 @@ class PolicyTest(ControlPlaneBaseTest):
              str(self.PPS_LIMIT_MIN <= rx_pps <= self.PPS_LIMIT_MAX))
         )
 
-        assert(self.PPS_LIMIT_MIN <= rx_pps <= self.PPS_LIMIT_MAX)
+        assert(self.PPS_LIMIT_MIN <= rx_pps <= self.PPS_LIMIT_MAX), self.sender_summary()
 
 
 # SONIC config contains policer CIR=600 for ARP
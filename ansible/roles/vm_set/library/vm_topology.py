@@ -9,6 +9,8 @@ import docker
 from ansible.module_utils.basic import *
 import traceback
 import hashlib
+import time
+import functools
 
 DOCUMENTATION = '''
 ---
@@ -61,6 +63,7 @@ Parameters:
     - duts_mgmt_port: duts mgmt port
     - duts_name: duts names
     - fp_mtu: MTU for FP ports
+    - batch_cmds: run ip and ovs-vsctl commands in batches (ip -batch, one ovs-vsctl transaction). Default: True
 '''
 
 EXAMPLES = '''
@@ -128,6 +131,72 @@ VS_CHASSIS_INBAND_BRIDGE_NAME = "br-T2Inband"
 VS_CHASSIS_MIDPLANE_BRIDGE_NAME = "br-T2Midplane"
 
 cmd_debug_fname = None
+cmd_batch = None
+
+
+class CmdBatch(object):
+    """
+    Queue of ip and ovs-vsctl commands which change the host state.
+
+    Consecutive ip commands of the same network namespace are run with one 'ip -batch',
+    consecutive ovs-vsctl commands are run as one ovs-vsctl transaction. The commands are
+    run in the order they were queued, before any other command (see VMTopology.cmd).
+    """
+    IP_CMD_REGEX = re.compile(r'^(?:nsenter -t (\d+) -n )?ip ([a-z].*)$')
+    OVS_VSCTL_PREFIX = 'ovs-vsctl '
+
+    def __init__(self):
+        self.segments = []
+
+    def add(self, cmdline):
+        m = CmdBatch.IP_CMD_REGEX.match(cmdline)
+        if m:
+            key = ('ip', m.group(1))
+            arg = m.group(2)
+        elif cmdline.startswith(CmdBatch.OVS_VSCTL_PREFIX):
+            key = ('ovs-vsctl', None)
+            arg = cmdline[len(CmdBatch.OVS_VSCTL_PREFIX):]
+        else:
+            return False
+
+        if not self.segments or self.segments[-1][0] != key:
+            self.segments.append((key, [], []))
+        self.segments[-1][1].append(cmdline)
+        self.segments[-1][2].append(arg)
+
+        return True
+
+    def flush(self):
+        segments, self.segments = self.segments, []
+        for (kind, pid), cmdlines, args in segments:
+            if len(cmdlines) == 1:
+                VMTopology.run(cmdlines[0])
+            elif kind == 'ip':
+                cmdline = 'ip -batch -'
+                if pid is not None:
+                    cmdline = 'nsenter -t %s -n %s' % (pid, cmdline)
+                VMTopology.run(cmdline, cmdlines, '\n'.join(args) + '\n')
+            else:
+                VMTopology.run(CmdBatch.OVS_VSCTL_PREFIX + ' -- '.join(args), cmdlines)
+
+        return
+
+
+def phase(func):
+    """Run the commands of a VMTopology step before it returns and account its run time"""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        start = time.time()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            try:
+                VMTopology.flush()
+            finally:
+                self.phase_times[func.__name__] = self.phase_times.get(func.__name__, 0.0) + time.time() - start
+
+    return wrapper
+
 
 class HostInterfaces(object):
     """Data descriptor that supports multi-DUTs interface definition."""
@@ -181,8 +250,10 @@ class VMTopology(object):
         self.fp_mtu = fp_mtu
         self.max_fp_num = max_fp_num
         self.topo = topo
+        self.phase_times = {}
         return
 
+    @phase
     def init(self, vm_set_name, vm_base, duts_fp_ports, duts_name, ptf_exists=True):
         self.vm_set_name = vm_set_name
         self.duts_name = duts_name
@@ -225,6 +296,9 @@ class VMTopology(object):
         return
 
     def update(self):
+        # run queued commands outside of the retries, their errors must not be ignored
+        VMTopology.flush()
+
         errmsg = []
         i = 0
         while i < RETRIES:
@@ -252,29 +326,41 @@ class VMTopology(object):
 
         return vlans
 
+    @phase
     def create_bridges(self):
+        bridge_names = []
         for vm in self.vm_names:
             for fp_num in range(self.max_fp_num):
-                fp_br_name = OVS_FP_BRIDGE_TEMPLATE % (vm, fp_num)
-                self.create_ovs_bridge(fp_br_name, self.fp_mtu)
+                bridge_names.append(OVS_FP_BRIDGE_TEMPLATE % (vm, fp_num))
 
         if self.topo and 'DUT' in self.topo and 'vs_chassis' in self.topo['DUT']:
             # We have a KVM based virtual chassis, need to create bridge for midplane and inband.
-            self.create_ovs_bridge(VS_CHASSIS_INBAND_BRIDGE_NAME, self.fp_mtu)
-            self.create_ovs_bridge(VS_CHASSIS_MIDPLANE_BRIDGE_NAME, self.fp_mtu)
+            bridge_names.append(VS_CHASSIS_INBAND_BRIDGE_NAME)
+            bridge_names.append(VS_CHASSIS_MIDPLANE_BRIDGE_NAME)
+
+        self.create_ovs_bridges(bridge_names, self.fp_mtu)
 
         return
 
     def create_ovs_bridge(self, bridge_name, mtu):
-        VMTopology.cmd('ovs-vsctl --may-exist add-br %s' % bridge_name)
+        self.create_ovs_bridges([bridge_name], mtu)
+
+        return
+
+    def create_ovs_bridges(self, bridge_names, mtu):
+        # add all bridges first, so that they are added in one ovs transaction
+        for bridge_name in bridge_names:
+            VMTopology.cmd('ovs-vsctl --may-exist add-br %s' % bridge_name, batch=True)
 
-        if mtu != DEFAULT_MTU:
-            VMTopology.cmd('ifconfig %s mtu %d' % (bridge_name, mtu))
+        for bridge_name in bridge_names:
+            if mtu != DEFAULT_MTU:
+                VMTopology.cmd('ip link set dev %s mtu %d' % (bridge_name, mtu), batch=True)
 
-        VMTopology.cmd('ifconfig %s up' % bridge_name)
+            VMTopology.iface_up(bridge_name)
 
         return
 
+    @phase
     def destroy_bridges(self):
         host_ifaces = VMTopology.ifconfig('ifconfig -a')
         for vm in self.vm_names:
@@ -285,7 +371,7 @@ class VMTopology(object):
         return
 
     def destroy_ovs_bridge(self, bridge_name):
-        VMTopology.cmd('ovs-vsctl --if-exists del-br %s' % bridge_name)
+        VMTopology.cmd('ovs-vsctl --if-exists del-br %s' % bridge_name, batch=True)
 
         return
 
@@ -297,6 +383,7 @@ class VMTopology(object):
 
         return brs
 
+    @phase
     def add_injected_fp_ports_to_docker(self):
         """
         add injected front panel ports to docker
@@ -313,6 +400,7 @@ class VMTopology(object):
 
         return
 
+    @phase
     def add_mgmt_port_to_docker(self, mgmt_bridge, mgmt_ip, mgmt_gw, mgmt_ipv6_addr=None, mgmt_gw_v6=None, api_server_pid=None):
         if api_server_pid:
             self.pid = api_server_pid
@@ -326,12 +414,13 @@ class VMTopology(object):
                 self.add_br_if_to_docker(mgmt_bridge, 'apiserver', tmp_mgmt_if)
 
             VMTopology.iface_down(tmp_mgmt_if, self.pid)
-            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" % (self.pid, tmp_mgmt_if, MGMT_PORT_NAME))
+            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" % (self.pid, tmp_mgmt_if, MGMT_PORT_NAME), batch=True)
 
         VMTopology.iface_up(MGMT_PORT_NAME, self.pid)
         self.add_ip_to_docker_if(MGMT_PORT_NAME, mgmt_ip, mgmt_ipv6_addr=mgmt_ipv6_addr, mgmt_gw=mgmt_gw, mgmt_gw_v6=mgmt_gw_v6, api_server_pid=api_server_pid)
         return
 
+    @phase
     def add_bp_port_to_docker(self, mgmt_ip, mgmt_ipv6):
         self.add_br_if_to_docker(self.bp_bridge, PTF_BP_IF_TEMPLATE % self.vm_set_name, BP_PORT_NAME)
         self.add_ip_to_docker_if(BP_PORT_NAME, mgmt_ip, mgmt_ipv6)
@@ -343,7 +432,7 @@ class VMTopology(object):
         self.update()
 
         if ext_if not in self.host_ifaces:
-            VMTopology.cmd("ip link add %s type veth peer name %s" % (ext_if, int_if))
+            VMTopology.cmd("ip link add %s type veth peer name %s" % (ext_if, int_if), batch=True)
 
         if ext_if not in self.host_if_to_br:
             VMTopology.cmd("brctl addif %s %s" % (bridge, ext_if))
@@ -352,7 +441,7 @@ class VMTopology(object):
 
         self.update()
         if int_if in self.host_ifaces and int_if not in self.cntr_ifaces:
-            VMTopology.cmd("ip link set netns %s dev %s" % (self.pid, int_if))
+            VMTopology.cmd("ip link set netns %s dev %s" % (self.pid, int_if), batch=True)
 
         VMTopology.iface_up(int_if, self.pid)
 
@@ -363,12 +452,12 @@ class VMTopology(object):
             self.pid = api_server_pid
         self.update()
         if int_if in self.cntr_ifaces:
-            VMTopology.cmd("nsenter -t %s -n ip addr flush dev %s" % (self.pid, int_if))
-            VMTopology.cmd("nsenter -t %s -n ip addr add %s dev %s" % (self.pid, mgmt_ip_addr, int_if))
+            VMTopology.cmd("nsenter -t %s -n ip addr flush dev %s" % (self.pid, int_if), batch=True)
+            VMTopology.cmd("nsenter -t %s -n ip addr add %s dev %s" % (self.pid, mgmt_ip_addr, int_if), batch=True)
             if mgmt_gw:
                 if api_server_pid:
-                    VMTopology.cmd("nsenter -t %s -n ip route del default" % (self.pid))
-                VMTopology.cmd("nsenter -t %s -n ip route add default via %s dev %s" % (self.pid, mgmt_gw, int_if))
+                    VMTopology.cmd("nsenter -t %s -n ip route del default" % (self.pid), batch=True)
+                VMTopology.cmd("nsenter -t %s -n ip route add default via %s dev %s" % (self.pid, mgmt_gw, int_if), batch=True)
             if mgmt_ipv6_addr:
                 VMTopology.cmd("nsenter -t %s -n ip -6 addr flush dev %s" % (self.pid, int_if))
                 VMTopology.cmd("nsenter -t %s -n ip -6 addr add %s dev %s" % (self.pid, mgmt_ipv6_addr, int_if))
@@ -381,11 +470,11 @@ class VMTopology(object):
 
         self.update()
         if dut_iface in self.host_ifaces and dut_iface not in self.cntr_ifaces and iface_name not in self.cntr_ifaces:
-            VMTopology.cmd("ip link set netns %s dev %s" % (self.pid, dut_iface))
+            VMTopology.cmd("ip link set netns %s dev %s" % (self.pid, dut_iface), batch=True)
 
         self.update()
         if dut_iface in self.cntr_ifaces and iface_name not in self.cntr_ifaces:
-            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" % (self.pid, dut_iface, iface_name))
+            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" % (self.pid, dut_iface, iface_name), batch=True)
 
         VMTopology.iface_up(iface_name, self.pid)
 
@@ -401,11 +490,11 @@ class VMTopology(object):
             VMTopology.iface_down(iface_name, self.pid)
 
         if iface_name in self.cntr_ifaces and dut_iface not in self.cntr_ifaces:
-            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" % (self.pid, iface_name, dut_iface))
+            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" % (self.pid, iface_name, dut_iface), batch=True)
 
         self.update()
         if dut_iface not in self.host_ifaces and dut_iface in self.cntr_ifaces:
-            VMTopology.cmd("nsenter -t %s -n ip link set netns 1 dev %s" % (self.pid, dut_iface))
+            VMTopology.cmd("nsenter -t %s -n ip link set netns 1 dev %s" % (self.pid, dut_iface), batch=True)
 
         return
 
@@ -415,52 +504,55 @@ class VMTopology(object):
         t_int_if = hashlib.md5((PTF_NAME_TEMPLATE % self.vm_set_name).encode("utf-8")).hexdigest()[0:6] + int_if + '_t'
 
         if t_int_if in self.host_ifaces:
-            VMTopology.cmd("ip link del dev %s" % t_int_if)
+            VMTopology.cmd("ip link del dev %s" % t_int_if, batch=True)
 
         self.update()
 
         if ext_if not in self.host_ifaces:
-            VMTopology.cmd("ip link add %s type veth peer name %s" % (ext_if, t_int_if))
+            VMTopology.cmd("ip link add %s type veth peer name %s" % (ext_if, t_int_if), batch=True)
 
         self.update()
 
         if self.fp_mtu != DEFAULT_MTU:
-            VMTopology.cmd("ip link set dev %s mtu %d" % (ext_if, self.fp_mtu))
+            VMTopology.cmd("ip link set dev %s mtu %d" % (ext_if, self.fp_mtu), batch=True)
             if t_int_if in self.host_ifaces:
-                VMTopology.cmd("ip link set dev %s mtu %d" % (t_int_if, self.fp_mtu))
+                VMTopology.cmd("ip link set dev %s mtu %d" % (t_int_if, self.fp_mtu), batch=True)
             elif t_int_if in self.cntr_ifaces:
-                VMTopology.cmd("nsenter -t %s -n ip link set dev %s mtu %d" % (self.pid, t_int_if, self.fp_mtu))
+                VMTopology.cmd("nsenter -t %s -n ip link set dev %s mtu %d" % (self.pid, t_int_if, self.fp_mtu), batch=True)
             elif int_if in self.cntr_ifaces:
-                VMTopology.cmd("nsenter -t %s -n ip link set dev %s mtu %d" % (self.pid, int_if, self.fp_mtu))
+                VMTopology.cmd("nsenter -t %s -n ip link set dev %s mtu %d" % (self.pid, int_if, self.fp_mtu), batch=True)
 
         VMTopology.iface_up(ext_if)
 
         self.update()
 
         if t_int_if in self.host_ifaces and t_int_if not in self.cntr_ifaces and int_if not in self.cntr_ifaces:
-            VMTopology.cmd("ip link set netns %s dev %s" % (self.pid, t_int_if))
+            VMTopology.cmd("ip link set netns %s dev %s" % (self.pid, t_int_if), batch=True)
 
         self.update()
 
         if t_int_if in self.cntr_ifaces and int_if not in self.cntr_ifaces:
-            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" % (self.pid, t_int_if, int_if))
+            VMTopology.cmd("nsenter -t %s -n ip link set dev %s name %s" % (self.pid, t_int_if, int_if), batch=True)
 
         VMTopology.iface_up(int_if, self.pid)
 
         return
 
+    @phase
     def bind_mgmt_port(self, br_name, mgmt_port):
         if mgmt_port not in self.host_if_to_br:
             VMTopology.cmd("brctl addif %s %s" % (br_name, mgmt_port))
 
         return
 
+    @phase
     def unbind_mgmt_port(self, mgmt_port):
         if mgmt_port in self.host_if_to_br:
             VMTopology.cmd("brctl delif %s %s" % (self.host_if_to_br[mgmt_port], mgmt_port))
 
         return
 
+    @phase
     def bind_fp_ports(self, disconnect_vm=False):
         """
         bind dut front panel ports to VMs
@@ -492,6 +584,7 @@ class VMTopology(object):
 
         return
 
+    @phase
     def unbind_fp_ports(self):
         for attr in self.VMs.values():
             for vlan_num, vlan in enumerate(attr['vlans']):
@@ -511,6 +604,7 @@ class VMTopology(object):
 
         return
 
+    @phase
     def bind_vm_backplane(self):
 
         if self.bp_bridge not in self.host_ifaces:
@@ -531,6 +625,7 @@ class VMTopology(object):
 
         return
 
+    @phase
     def unbind_vm_backplane(self):
 
         if self.bp_bridge in self.host_ifaces:
@@ -550,10 +645,10 @@ class VMTopology(object):
             port_name = "{}-{}".format(dut_name, (a_port + 1))
             br = VMTopology.get_ovs_bridge_by_port(port_name)
             if br is not None and br != br_name:
-                VMTopology.cmd('ovs-vsctl del-port %s %s' % (br, port_name))
+                VMTopology.cmd('ovs-vsctl del-port %s %s' % (br, port_name), batch=True)
 
             if port_name not in br_ports:
-                VMTopology.cmd('ovs-vsctl add-port %s %s' % (br_name, port_name))
+                VMTopology.cmd('ovs-vsctl add-port %s %s' % (br_name, port_name), batch=True)
 
 
     def unbind_vs_dut_ports(self, br_name, dut_ports):
@@ -563,7 +658,7 @@ class VMTopology(object):
             dut_name = self.duts_name[dut_index]
             port_name = "{}-{}".format(dut_name, (a_port + 1))
             if port_name in ports:
-                VMTopology.cmd('ovs-vsctl del-port %s %s' % (br_name, port_name))
+                VMTopology.cmd('ovs-vsctl del-port %s %s' % (br_name, port_name), batch=True)
 
         return
 
@@ -581,18 +676,18 @@ class VMTopology(object):
         """
         br = VMTopology.get_ovs_bridge_by_port(injected_iface)
         if br is not None and br != br_name:
-            VMTopology.cmd('ovs-vsctl del-port %s %s' % (br, injected_iface))
+            VMTopology.cmd('ovs-vsctl del-port %s %s' % (br, injected_iface), batch=True)
 
         br = VMTopology.get_ovs_bridge_by_port(dut_iface)
         if br is not None and br != br_name:
-            VMTopology.cmd('ovs-vsctl del-port %s %s' % (br, dut_iface))
+            VMTopology.cmd('ovs-vsctl del-port %s %s' % (br, dut_iface), batch=True)
 
         ports = VMTopology.get_ovs_br_ports(br_name)
         if injected_iface not in ports:
-            VMTopology.cmd('ovs-vsctl add-port %s %s' % (br_name, injected_iface))
+            VMTopology.cmd('ovs-vsctl add-port %s %s' % (br_name, injected_iface), batch=True)
 
         if dut_iface not in ports:
-            VMTopology.cmd('ovs-vsctl add-port %s %s' % (br_name, dut_iface))
+            VMTopology.cmd('ovs-vsctl add-port %s %s' % (br_name, dut_iface), batch=True)
 
         bindings = VMTopology.get_ovs_port_bindings(br_name, [dut_iface])
         dut_iface_id = bindings[dut_iface]
@@ -627,7 +722,7 @@ class VMTopology(object):
 
         for port in ports:
             if port != vm_port:
-                VMTopology.cmd('ovs-vsctl del-port %s %s' % (br_name, port))
+                VMTopology.cmd('ovs-vsctl del-port %s %s' % (br_name, port), batch=True)
 
         return
 
@@ -636,7 +731,7 @@ class VMTopology(object):
         ports = VMTopology.get_ovs_br_ports(br_name)
 
         if port in ports:
-            VMTopology.cmd('ovs-vsctl del-port %s %s' % (br_name, port))
+            VMTopology.cmd('ovs-vsctl del-port %s %s' % (br_name, port), batch=True)
 
         return
 
@@ -658,12 +753,12 @@ class VMTopology(object):
         for intf in [host_if, upper_if, lower_if]:
             br = VMTopology.get_ovs_bridge_by_port(intf)
             if br is not None and br != br_name:
-                VMTopology.cmd('ovs-vsctl del-port %s %s' % (br, intf))
+                VMTopology.cmd('ovs-vsctl del-port %s %s' % (br, intf), batch=True)
 
         ports = VMTopology.get_ovs_br_ports(br_name)
         for intf in [host_if, upper_if, lower_if]:
             if intf not in ports:
-                VMTopology.cmd('ovs-vsctl add-port %s %s' % (br_name, intf))
+                VMTopology.cmd('ovs-vsctl add-port %s %s' % (br_name, intf), batch=True)
 
         bindings = VMTopology.get_ovs_port_bindings(br_name, [upper_if, lower_if])
         host_if_id = bindings[host_if]
@@ -693,6 +788,7 @@ class VMTopology(object):
         return
 
 
+    @phase
     def add_host_ports(self):
         """
         add dut port in the ptf docker
@@ -731,6 +827,7 @@ class VMTopology(object):
 
         return
 
+    @phase
     def remove_host_ports(self):
         """
         remove dut port from the ptf docker
@@ -764,9 +861,9 @@ class VMTopology(object):
     @staticmethod
     def iface_updown(iface_name, state, pid):
         if pid is None:
-            return VMTopology.cmd('ip link set %s %s' % (iface_name, state))
+            return VMTopology.cmd('ip link set %s %s' % (iface_name, state), batch=True)
         else:
-            return VMTopology.cmd('nsenter -t %s -n ip link set %s %s' % (pid, iface_name, state))
+            return VMTopology.cmd('nsenter -t %s -n ip link set %s %s' % (pid, iface_name, state), batch=True)
 
     @staticmethod
     def iface_disable_txoff(iface_name, pid=None):
@@ -776,15 +873,43 @@ class VMTopology(object):
             return VMTopology.cmd('nsenter -t %s -n ethtool -K %s tx off' % (pid, iface_name))
 
     @staticmethod
-    def cmd(cmdline):
+    def cmd(cmdline, batch=False):
+        """
+        Run a command. With batch=True, ip and ovs-vsctl commands are queued and run
+        later, together with the other queued commands, and an empty output is returned.
+        Queued commands are always run before a command which is not queued.
+        """
+        if batch and cmd_batch is not None and cmd_batch.add(cmdline):
+            return ''
+
+        VMTopology.flush()
+
+        return VMTopology.run(cmdline)
+
+    @staticmethod
+    def flush():
+        if cmd_batch is not None:
+            cmd_batch.flush()
+
+        return
+
+    @staticmethod
+    def run(cmdline, cmdlines=None, input=None):
         with open(cmd_debug_fname, 'a') as fp:
-            fp.write("CMD: %s\n" % cmdline)
+            if cmdlines:
+                for line in cmdlines:
+                    fp.write("CMD: %s\n" % line)
+                fp.write("BATCH: %s\n" % cmdline)
+            else:
+                fp.write("CMD: %s\n" % cmdline)
         cmd = cmdline.split(' ')
         process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()
+        stdout, stderr = process.communicate(input.encode('utf-8') if input is not None else None)
         ret_code = process.returncode
 
         if ret_code != 0:
+            if cmdlines:
+                cmdline = "%s (%s)" % (cmdline, "; ".join(cmdlines))
             raise Exception("ret_code=%d, error message=%s. cmd=%s" % (ret_code, stderr, cmdline))
 
         with open(cmd_debug_fname, 'a') as fp:
@@ -802,6 +927,7 @@ class VMTopology(object):
 
     @staticmethod
     def get_ovs_bridge_by_port(port):
+        VMTopology.flush()
         try:
             out = VMTopology.cmd('ovs-vsctl port-to-br %s' % port)
         except:
@@ -981,6 +1107,18 @@ def check_topo(topo, is_multi_duts=False):
     return hostif_exists, vms_exists
 
 
+def write_phase_report(net):
+    if net is None or not net.phase_times:
+        return
+
+    with open(cmd_debug_fname, 'a') as fp:
+        fp.write("PHASES:\n")
+        for name, duration in sorted(net.phase_times.items(), key=lambda x: -x[1]):
+            fp.write("%-40s %8.3fs\n" % (name, duration))
+
+    return
+
+
 def check_params(module, params, mode):
     for param in params:
         if param not in module.params:
@@ -1010,6 +1148,7 @@ def main():
             duts_name=dict(required=False, type='list'),
             fp_mtu=dict(required=False, type='int', default=DEFAULT_MTU),
             max_fp_num=dict(required=False, type='int', default=NUM_FP_VLANS_PER_FP),
+            batch_cmds=dict(required=False, type='bool', default=True),
         ),
         supports_check_mode=False)
 
@@ -1028,6 +1167,11 @@ def main():
     cmd_debug_fname = CMD_DEBUG_FNAME % curtime
     exception_debug_fname = EXCEPTION_DEBUG_FNAME % curtime
 
+    global cmd_batch
+    if module.params['batch_cmds']:
+        cmd_batch = CmdBatch()
+    net = None
+
     try:
         if os.path.exists(cmd_debug_fname) and os.path.isfile(cmd_debug_fname):
             os.remove(cmd_debug_fname)
@@ -1230,9 +1374,11 @@ def main():
     except Exception as error:
         with open(exception_debug_fname, 'w') as fp:
             traceback.print_exc(file=fp)
+        write_phase_report(net)
         module.fail_json(msg=str(error))
 
-    module.exit_json(changed=True)
+    write_phase_report(net)
+    module.exit_json(changed=True, phase_times=net.phase_times)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+Benchmark announce_routes against local dummy exabgp http sinks.
+
+A sink is started in a separate process for every exabgp port of the
+topology. It counts the announced routes and optionally sleeps per route to
+mimic exabgp. The routes of the topology are then generated and announced
+once in a single post per VM, one VM at a time (the old behaviour) and once
+chunked and concurrently.
+
+Usage:
+    python announce_routes_benchmark.py [-t TOPO] [-b BATCH_SIZE] [-w WORKERS] [-d DELAY_US]
+"""
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from urlparse import parse_qs
+
+from benchmark_utils import SONIC_MGMT_DIR, load_source, timed
+
+SINK_IPV4_BASE_PORT = 25000
+SINK_IPV6_BASE_PORT = 26000
+
+
+class SinkServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    routes = None
+    delay = 0.0
+
+    def handle_error(self, request, client_address):
+        # keep-alive connections are dropped when the benchmark exits
+        pass
+
+
+class SinkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # write the response in one segment, unbuffered header writes stall on delayed ack
+    wbufsize = -1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.getheader('content-length', 0)))
+        commands = parse_qs(body).get('commands', [''])[0]
+        count = commands.count('announce route')
+        with self.server.routes.get_lock():
+            self.server.routes.value += count
+        time.sleep(self.server.delay * count)
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write('OK')
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_sinks(ports, delay, routes, ready):
+    for port in ports:
+        sink = SinkServer(('127.0.0.1', port), SinkHandler)
+        sink.delay = delay
+        sink.routes = routes
+        thread = threading.Thread(target=sink.serve_forever)
+        thread.daemon = True
+        thread.start()
+    ready.set()
+    while True:
+        time.sleep(3600)
+
+
+def start_sinks(ports, delay):
+    routes = multiprocessing.Value('L', 0)
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=serve_sinks, args=(ports, delay, routes, ready))
+    process.daemon = True
+    process.start()
+    ready.wait()
+    return process, routes
+
+
+def run(ar, topo, topo_type, batch_size, max_workers, use_cache):
+    fib = {'t0': ar.fib_t0, 't1': ar.fib_t1_lag, 't2': ar.fib_t2_lag}[topo_type]
+    ar._routes_cache.clear()
+    generate_routes = ar.generate_routes
+    if not use_cache:
+        ar.generate_routes = lambda *args, **kwargs: list(ar.iter_routes(*args, **kwargs))
+    try:
+        announcer = ar.RouteAnnouncer('127.0.0.1', batch_size, max_workers)
+        gen = timed(fib, topo, announcer)[0]
+        post = timed(announcer.run)[0]
+    finally:
+        ar.generate_routes = generate_routes
+    return gen, post
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark announce_routes.')
+    parser.add_argument('-t', '--topo', default='t1-64-lag', help='topology name (default: t1-64-lag)')
+    parser.add_argument('-b', '--batch-size', type=int, default=1000, help='routes per post')
+    parser.add_argument('-w', '--workers', type=int, default=8, help='concurrent exabgp posts')
+    parser.add_argument('-d', '--delay-us', type=float, default=0, help='sink processing time per route')
+    args = parser.parse_args()
+
+    # announce_routes reads the topologies relative to the ansible directory
+    os.chdir(os.path.join(SONIC_MGMT_DIR, 'ansible'))
+    ar = load_source('announce_routes', 'ansible/library/announce_routes.py')
+    ar.IPV4_BASE_PORT = SINK_IPV4_BASE_PORT
+    ar.IPV6_BASE_PORT = SINK_IPV6_BASE_PORT
+    topo = ar.read_topo(args.topo)
+    topo_type = ar.get_topo_type(args.topo)
+
+    offsets = [vm['vm_offset'] for vm in topo['topology']['VMs'].values()]
+    ports = [SINK_IPV4_BASE_PORT + o for o in offsets] + [SINK_IPV6_BASE_PORT + o for o in offsets]
+    process, sink_routes = start_sinks(ports, args.delay_us / 1000000.0)
+
+    print('{:<28} {:>10} {:>10} {:>10} {:>12}'.format('mode', 'gen(ms)', 'post(ms)', 'routes', 'routes/s'))
+    modes = [('single post, sequential', 0, 1, False),
+             ('batch {}, {} workers'.format(args.batch_size, args.workers), args.batch_size, args.workers, True)]
+    try:
+        for name, batch_size, max_workers, use_cache in modes:
+            sink_routes.value = 0
+            gen, post = run(ar, topo, topo_type, batch_size, max_workers, use_cache)
+            routes = sink_routes.value
+            print('{:<28} {:>10.1f} {:>10.1f} {:>10} {:>12.0f}'.format(
+                name, gen * 1000, post * 1000, routes, routes / (gen + post)))
+    finally:
+        process.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+"""
+Measure how many ARP and NDP requests per second tests/scripts/arp_responder.py answers.
+
+A veth pair is created, the responder runs on one end with N IPv4 and N IPv6
+addresses (256 by default). A pcap of ARP requests and neighbor solicitations
+for these addresses is replayed on the other end as fast as possible for
+DURATION seconds, and the replies received there are counted. The pcap is
+generated, unless one is given with --pcap.
+
+Another version of the responder can be measured with --responder and --python,
+e.g. the previous one with scapy:
+    git show HEAD~1:tests/scripts/arp_responder.py > /tmp/arp_responder_old.py
+
+Requires root. Usage:
+    python arp_responder_benchmark.py [-n ADDRESSES] [-d DURATION] [--pcap PCAP] [--responder PATH]
+"""
+from __future__ import print_function
+
+import argparse
+import binascii
+import json
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark_utils import SONIC_MGMT_DIR
+
+RESPONDER = os.path.join(SONIC_MGMT_DIR, 'tests/scripts/arp_responder.py')
+
+ETH_P_ALL = 0x03
+PACKET_OUTGOING = 4
+BROADCAST_MAC = b'\xff' * 6
+REQUESTER_MAC = binascii.unhexlify('02aabbccdd01')
+REQUESTER_IP = '10.0.0.1'
+REQUESTER_IPV6 = 'fc00::1'
+
+
+def responder_addresses(count):
+    """Return {ip: mac} of the responder."""
+    addresses = {}
+    for i in range(count):
+        mac = '0200%08x' % (i + 1)
+        addresses['10.1.%d.%d' % (i // 250, i % 250 + 1)] = mac
+        addresses['fc00::1:%x' % (i + 1)] = mac
+    return addresses
+
+
+def arp_request(target_ip):
+    return (BROADCAST_MAC + REQUESTER_MAC + struct.pack('!HHHBBH', 0x806, 1, 0x800, 6, 4, 1) +
+            REQUESTER_MAC + socket.inet_aton(REQUESTER_IP) + b'\x00' * 6 + socket.inet_aton(target_ip) +
+            b'\x00' * 18)
+
+
+def neigh_solicit(target_ip):
+    target = socket.inet_pton(socket.AF_INET6, target_ip)
+    # solicited-node multicast address and MAC
+    dst_ip = socket.inet_pton(socket.AF_INET6, 'ff02::1:ff00:0')[:13] + target[13:]
+    dst_mac = b'\x33\x33' + dst_ip[12:]
+    icmp = struct.pack('!BBHI', 135, 0, 0, 0) + target + struct.pack('!BB', 1, 1) + REQUESTER_MAC
+    return (dst_mac + REQUESTER_MAC + struct.pack('!H', 0x86dd) +
+            struct.pack('!IHBB', 6 << 28, len(icmp), 58, 255) +
+            socket.inet_pton(socket.AF_INET6, REQUESTER_IPV6) + dst_ip + icmp)
+
+
+def write_pcap(path, packets):
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for packet in packets:
+            f.write(struct.pack('<IIII', 0, 0, len(packet), len(packet)))
+            f.write(packet)
+
+
+def read_pcap(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, = struct.unpack_from('<I', data, 0)
+    endian = '<' if magic in (0xa1b2c3d4, 0xa1b23c4d) else '>'
+    packets = []
+    offset = 24
+    while offset + 16 <= len(data):
+        _, _, caplen, _ = struct.unpack_from(endian + 'IIII', data, offset)
+        packets.append(data[offset + 16:offset + 16 + caplen])
+        offset += 16 + caplen
+    return packets
+
+
+def is_reply(data):
+    ether_type, = struct.unpack_from('!H', data, 12)
+    offset = 14
+    if ether_type == 0x8100:
+        ether_type, = struct.unpack_from('!H', data, 16)
+        offset = 18
+    if ether_type == 0x806:
+        return struct.unpack_from('!H', data, offset + 6)[0] == 2
+    if ether_type == 0x86dd and len(data) > offset + 40:
+        return struct.unpack_from('!B', data, offset + 40)[0] == 136
+    return False
+
+
+def run(args, packets, iface):
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 16 * 1024 * 1024)
+    sock.bind((iface, 0))
+    sock.setblocking(False)
+
+    def drain():
+        replies = 0
+        while True:
+            try:
+                data, address = sock.recvfrom(4096)
+            except socket.error:
+                return replies
+            if address[2] != PACKET_OUTGOING and is_reply(data):
+                replies += 1
+
+    # Wait until the responder answers
+    deadline = time.time() + 30
+    while True:
+        sock.send(packets[0])
+        time.sleep(0.2)
+        if drain():
+            break
+        if time.time() > deadline:
+            raise RuntimeError('The responder does not answer')
+
+    sent = replies = 0
+    start = time.time()
+    while time.time() - start < args.duration:
+        for packet in packets:
+            try:
+                sock.send(packet)
+                sent += 1
+            except socket.error:
+                # The transmit queue is full, read the replies meanwhile
+                replies += drain()
+                continue
+            if sent % args.burst == 0:
+                replies += drain()
+    elapsed = time.time() - start
+    time.sleep(0.5)
+    replies += drain()
+    sock.close()
+    return sent, replies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure ARP and NDP requests answered per second.')
+    parser.add_argument('-n', '--addresses', type=int, default=256, help='IPv4 and IPv6 addresses (default: 256)')
+    parser.add_argument('-d', '--duration', type=float, default=5, help='seconds (default: 5)')
+    parser.add_argument('-b', '--burst', type=int, default=64, help='requests sent between reads (default: 64)')
+    parser.add_argument('--pcap', help='pcap of requests to replay, generated if not given')
+    parser.add_argument('--responder', default=RESPONDER, help='responder script (default: %s)' % RESPONDER)
+    parser.add_argument('--python', default=sys.executable, help='python running the responder')
+    args = parser.parse_args()
+
+    send_iface, recv_iface = 'arpbench0', 'arpbench1'
+    workdir = tempfile.mkdtemp()
+    conf = os.path.join(workdir, 'arp_responder.json')
+    addresses = responder_addresses(args.addresses)
+    with open(conf, 'w') as f:
+        json.dump({send_iface: addresses}, f)
+
+    if args.pcap:
+        packets = read_pcap(args.pcap)
+    else:
+        packets = [arp_request(ip) if ':' not in ip else neigh_solicit(ip) for ip in sorted(addresses)]
+        write_pcap(os.path.join(workdir, 'requests.pcap'), packets)
+
+    subprocess.check_call(['ip', 'link', 'add', send_iface, 'type', 'veth', 'peer', 'name', recv_iface])
+    responder = None
+    try:
+        for iface in (send_iface, recv_iface):
+            subprocess.check_call(['ip', 'link', 'set', iface, 'up'])
+        responder = subprocess.Popen([args.python, args.responder, '-e', '-c', conf])
+        sent, replies, elapsed = run(args, packets, recv_iface)
+    finally:
+        if responder:
+            responder.terminate()
+            responder.wait()
+        subprocess.call(['ip', 'link', 'del', send_iface])
+
+    print('%-12s %10s %10s %12s %10s' % ('responder', 'sent/s', 'answered/s', 'answered(%)', 'requests'))
+    print('%-12s %10.0f %10.0f %12.1f %10d' % (os.path.basename(args.responder)[:12], sent / elapsed,
+                                                replies / elapsed, replies * 100.0 / sent, len(packets)))
+
+
+if __name__ == '__main__':
+    main()
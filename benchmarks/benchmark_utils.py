@@ -0,0 +1,54 @@
+"""
+Helpers shared by the benchmarks in this directory.
+"""
+import imp
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SONIC_MGMT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def timed(func, *args, **kwargs):
+    """Call func, return the elapsed time in seconds and the result."""
+    start = time.time()
+    result = func(*args, **kwargs)
+    return time.time() - start, result
+
+
+def best_of(func, rounds=1):
+    """Call func rounds times, return the shortest elapsed time in seconds."""
+    return min(timed(func)[0] for _ in range(rounds))
+
+
+def median(values):
+    return sorted(values)[len(values) // 2]
+
+
+def load_source(name, path):
+    """Load a python file of sonic-mgmt (path is relative to the top directory) as module name."""
+    return imp.load_source(name, os.path.join(SONIC_MGMT_DIR, path))
+
+
+def run_ansible_module(module, args, env=None, cwd=None):
+    """
+    Run an ansible module script directly, with args in an ANSIBLE_MODULE_ARGS file.
+
+    Returns:
+        The elapsed time in seconds and the result of the module.
+    Raises:
+        RuntimeError: the module failed.
+    """
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+        json.dump({'ANSIBLE_MODULE_ARGS': args}, f)
+    try:
+        elapsed, output = timed(subprocess.check_output, [sys.executable, module, f.name], env=env, cwd=cwd)
+    finally:
+        os.unlink(f.name)
+    result = json.loads(output)
+    if result.get('failed'):
+        raise RuntimeError('%s failed: %s' % (os.path.basename(module), result.get('msg')))
+    return elapsed, result
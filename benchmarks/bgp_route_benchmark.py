@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""
+Benchmark the vtysh queries of ansible/library/bgp_route.py.
+
+The module is run locally, like ansible runs it on the DUT, with a fake 'docker'
+command first in PATH. The fake 'docker exec -i bgp vtysh -c ...' answers the
+vtysh commands like FRR would, from a BGP table generated with N routes
+(100000 by default), and sleeps --exec-latency seconds per run to account for
+the cost of 'docker exec' on the DUT.
+
+P prefixes (1000 by default) are retrieved: existing prefixes, addresses
+covered by a route and missing prefixes, IPv4 and IPv6. They are retrieved:
+    - per-prefix: one 'docker exec' per prefix (batch_size=1), like the previous
+      version of the module
+    - batched: 'show ip bgp <prefix> json' commands, batch_size per 'docker exec'
+    - index: the whole table is retrieved once and indexed ('index_table')
+The facts of the three ways are compared.
+
+Usage:
+    python bgp_route_benchmark.py [-n ROUTES] [-p PREFIXES] [--exec-latency SECONDS] [--batch-size N]
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import random
+import shutil
+import stat
+import sys
+try:
+    import anydbm as dbm
+except ImportError:
+    import dbm
+import tempfile
+
+from benchmark_utils import SONIC_MGMT_DIR, run_ansible_module
+
+MODULE = os.path.join(SONIC_MGMT_DIR, 'ansible/library/bgp_route.py')
+
+# Fake docker command, answers 'docker exec -i <instance> vtysh -c <command> ...' from the generated table
+FAKE_DOCKER = '''#!{python}
+import json
+import os
+import sys
+import time
+
+import netaddr
+try:
+    import anydbm as dbm
+except ImportError:
+    import dbm
+
+DATA_DIR = {data_dir!r}
+time.sleep({latency!r})
+
+ROUTES = dbm.open(os.path.join(DATA_DIR, 'routes'), 'r')
+
+
+def lookup(prefix):
+    if '/' in prefix:
+        candidates = [netaddr.IPNetwork(prefix).cidr]
+    else:
+        address = netaddr.IPAddress(prefix)
+        candidates = [netaddr.IPNetwork('%s/%d' % (address, length)).cidr
+                      for length in range(32 if address.version == 4 else 128, -1, -1)]
+    for candidate in candidates:
+        if str(candidate) in ROUTES:
+            return str(candidate)
+    return None
+
+
+args = sys.argv[1:]
+commands = [args[i + 1] for i, arg in enumerate(args) if arg == '-c']
+for command in commands:
+    words = command.split()
+    if words == ['show', 'version']:
+        sys.stdout.write('FRRouting 7.2.1-sonic (sonic).\\n')
+    elif len(words) == 4 and words[3] == 'json':
+        with open(os.path.join(DATA_DIR, 'table_%s.json' % words[1])) as f:
+            sys.stdout.write(f.read())
+    elif len(words) == 5 and words[4] == 'json':
+        network = lookup(words[3])
+        if network is None:
+            sys.stdout.write('{{}}\\n')
+        else:
+            paths = [{{'aspath': {{'string': path['path'], 'length': len(path['path'].split())}},
+                       'origin': 'IGP', 'valid': True, 'nexthops': path['nexthops']}}
+                     for path in json.loads(ROUTES[network])]
+            sys.stdout.write(json.dumps({{'prefix': network, 'paths': paths}}, indent=2) + '\\n')
+    else:
+        sys.stderr.write('% Unknown command: %s\\n' % command)
+        sys.exit(1)
+'''
+
+
+def generate_routes(count):
+    """Return {prefix: [path, ...]} of count routes, in the format of 'show ip bgp json' of FRR."""
+    routes = {}
+    for i in range(count):
+        if i % 5 == 4:
+            prefix = 'fc00:%x:%x::/64' % (i // 65536 + 1, i % 65536)
+            afi, nexthop = 'ipv6', 'fc00::%x'
+        else:
+            prefix = '%d.%d.%d.0/24' % (100 + i // 65536, i // 256 % 256, i % 256)
+            afi, nexthop = 'ipv4', '10.0.0.%d'
+        paths = []
+        for peer in range(i % 4 + 1):
+            paths.append({'valid': True, 'multipath': True, 'pathFrom': 'external',
+                          'prefix': prefix.split('/')[0], 'prefixLen': int(prefix.split('/')[1]),
+                          'network': prefix, 'metric': 0, 'weight': 0,
+                          'peerId': nexthop % (peer * 2 + 1), 'path': '6460%d 65534 %d' % (peer, 64700 + i % 1000),
+                          'origin': 'IGP', 'nexthops': [{'ip': nexthop % (peer * 2 + 1), 'afi': afi, 'used': True}]})
+        paths[0]['bestpath'] = True
+        routes[prefix] = paths
+    return routes
+
+
+def query_prefixes(routes, count):
+    """Return prefixes to retrieve: existing prefixes, addresses covered by a route and missing prefixes."""
+    rand = random.Random(0)
+    networks = sorted(routes)
+    prefixes = []
+    for i in range(count):
+        network = rand.choice(networks)
+        if i % 4 == 0:
+            # An address of the network: 'a.b.c.17' or 'fc00:x:y::17'
+            address = network.split('/')[0]
+            prefixes.append(address + '17' if ':' in address else address.rsplit('.', 1)[0] + '.17')
+        elif i % 10 == 9:
+            prefixes.append('99.%d.%d.0/24' % (i // 256 % 256, i % 256) if i % 20 == 9 else 'fd00:%x::/64' % i)
+        else:
+            prefixes.append(network)
+    return prefixes
+
+
+def write_data(data_dir, routes, latency):
+    # Routes per prefix, for the fake docker to read only the queried ones
+    db = dbm.open(os.path.join(data_dir, 'routes'), 'n')
+    for prefix, paths in routes.items():
+        db[prefix] = json.dumps(paths)
+    db.close()
+    for af in ('ip', 'ipv6'):
+        table = {'vrfId': 0, 'vrfName': 'default', 'tableVersion': len(routes), 'routerId': '10.1.0.32',
+                 'defaultLocPrf': 100, 'localAS': 65100,
+                 'routes': dict((prefix, paths) for prefix, paths in routes.items() if (':' in prefix) == (af == 'ipv6'))}
+        with open(os.path.join(data_dir, 'table_%s.json' % af), 'w') as f:
+            json.dump(table, f, indent=2)
+    docker = os.path.join(data_dir, 'docker')
+    with open(docker, 'w') as f:
+        f.write(FAKE_DOCKER.format(python=sys.executable, data_dir=data_dir, latency=latency))
+    os.chmod(docker, os.stat(docker).st_mode | stat.S_IEXEC)
+
+
+def run_module(args, env):
+    elapsed, result = run_ansible_module(MODULE, args, env=env, cwd=os.path.join(SONIC_MGMT_DIR, 'ansible/library'))
+    return elapsed, result['ansible_facts']['bgp_route']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the vtysh queries of bgp_route.')
+    parser.add_argument('-n', '--routes', type=int, default=100000, help='routes in the table (default: 100000)')
+    parser.add_argument('-p', '--prefixes', type=int, default=1000, help='prefixes to retrieve (default: 1000)')
+    parser.add_argument('--exec-latency', type=float, default=0.1,
+                        help='seconds added per docker exec (default: 0.1)')
+    parser.add_argument('--batch-size', type=int, default=100, help='vtysh commands per docker exec (default: 100)')
+    args = parser.parse_args()
+
+    routes = generate_routes(args.routes)
+    prefixes = query_prefixes(routes, args.prefixes)
+    data_dir = tempfile.mkdtemp()
+    try:
+        write_data(data_dir, routes, args.exec_latency)
+        env = dict(os.environ, PATH=data_dir + os.pathsep + os.environ.get('PATH', ''))
+
+        print('%-12s %10s %10s' % ('query', 'time(s)', 'found'))
+        facts = {}
+        for name, module_args in (('per-prefix', {'prefixes': prefixes, 'batch_size': 1}),
+                                  ('batched', {'prefixes': prefixes, 'batch_size': args.batch_size}),
+                                  ('index', {'prefixes': prefixes, 'index_table': True})):
+            elapsed, facts[name] = run_module(module_args, env)
+            print('%-12s %10.2f %10d' % (name, elapsed, sum(1 for route in facts[name].values() if route['found'])))
+        print('same facts: %s' % (facts['per-prefix'] == facts['batched'] == facts['index']))
+    finally:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Benchmark pytest collection of tests parametrized from testbed metadata.
+
+A synthetic test tree with N test functions (2000 by default) using the
+enum_dut_portname_oper_up and enum_dut_feature fixtures, and a metadata file
+of a 4 DUT testbed are generated. The tree is collected twice:
+    - 'file': metadata/<testbed>.json is loaded on every pytest_generate_tests
+      call (the old behaviour of tests/conftest.py)
+    - 'store': lists come from tests.common.helpers.metadata.TestbedMetadata
+
+Usage:
+    python metadata_collection_benchmark.py [-n TESTS] [-p PORTS]
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from benchmark_utils import SONIC_MGMT_DIR, timed
+
+TESTBED = 'vms-bench'
+TESTS_PER_FILE = 100
+
+CONFTEST = '''
+import json
+import os
+import sys
+import time
+import types
+
+# load the helpers without tests/common/__init__.py, which imports the DUT libraries
+for name in ('tests', 'tests.common', 'tests.common.helpers'):
+    pkg = types.ModuleType(name)
+    pkg.__path__ = [os.path.join({sonic_mgmt!r}, *name.split('.'))]
+    sys.modules[name] = pkg
+
+from tests.common.helpers.dut_ports import encode_dut_port_name
+from tests.common.helpers.metadata import TestbedMetadata
+
+generate_time = [0.0]
+
+
+def pytest_addoption(parser):
+    parser.addoption("--testbed", action="store")
+    parser.addoption("--metadata-mode", action="store", default="store")
+
+
+def file_port_lists(tbname, scope, state):
+    with open(os.path.join('metadata', tbname + '.json'), 'r') as yf:
+        ports = json.load(yf)
+    ret = []
+    for dut, val in ports[tbname].items():
+        for intf, status in val['intf_status'].items():
+            if scope in intf and (not state or status[state] == 'up'):
+                ret.append(encode_dut_port_name(dut, intf))
+    return ret
+
+
+def file_feature_list(tbname):
+    with open(os.path.join('metadata', tbname + '.json'), 'r') as yf:
+        metadata = json.load(yf)
+    return [encode_dut_port_name(dut, f) for dut, val in metadata[tbname].items() for f in val['features']]
+
+
+def pytest_generate_tests(metafunc):
+    start = time.time()
+    tbname = metafunc.config.getoption("--testbed")
+    store = metafunc.config.getoption("--metadata-mode") == "store"
+    if "enum_dut_portname_oper_up" in metafunc.fixturenames:
+        if store:
+            ports = TestbedMetadata.load(tbname).get_ports('Ethernet', 'oper_state')
+        else:
+            ports = file_port_lists(tbname, 'Ethernet', 'oper_state')
+        metafunc.parametrize("enum_dut_portname_oper_up", ports)
+    if "enum_dut_feature" in metafunc.fixturenames:
+        if store:
+            features = TestbedMetadata.load(tbname).get_features()
+        else:
+            features = file_feature_list(tbname)
+        metafunc.parametrize("enum_dut_feature", features)
+    generate_time[0] += time.time() - start
+
+
+def pytest_collection_finish(session):
+    sys.stdout.write("GENERATE_TIME %f\\n" % generate_time[0])
+'''
+
+
+def write_metadata(folder, ports):
+    metadata = {}
+    for dut_index in range(4):
+        dut = 'str-dut-{}'.format(dut_index)
+        intf_status = {}
+        for port in range(ports):
+            # only a few ports are up, to keep the number of collected items small
+            state = 'up' if port < 2 else 'down'
+            intf_status['Ethernet{}'.format(port * 4)] = {
+                'name': 'Ethernet{}'.format(port * 4), 'speed': '100G', 'fec': 'N/A',
+                'alias': 'etp{}'.format(port + 1), 'vlan': 'routed', 'oper_state': state, 'admin_state': 'up'}
+        for pc in range(16):
+            intf_status['PortChannel{:04d}'.format(pc + 1)] = {'oper_state': 'up', 'admin_state': 'up'}
+        features = {'bgp': 'enabled', 'lldp': 'enabled'}
+        metadata[dut] = {'intf_status': intf_status, 'features': features}
+    os.mkdir(folder)
+    with open(os.path.join(folder, TESTBED + '.json'), 'w') as f:
+        json.dump({TESTBED: metadata}, f, indent=4)
+
+
+def write_tests(folder, tests):
+    with open(os.path.join(folder, 'conftest.py'), 'w') as f:
+        f.write(CONFTEST.format(sonic_mgmt=SONIC_MGMT_DIR))
+    for module in range((tests + TESTS_PER_FILE - 1) // TESTS_PER_FILE):
+        with open(os.path.join(folder, 'test_bench_{:03d}.py'.format(module)), 'w') as f:
+            for index in range(module * TESTS_PER_FILE, min(tests, (module + 1) * TESTS_PER_FILE)):
+                fixture = 'enum_dut_portname_oper_up' if index % 2 else 'enum_dut_feature'
+                f.write('def test_{}({}):\n    pass\n\n'.format(index, fixture))
+
+
+def collect(folder, mode):
+    elapsed, out = timed(subprocess.check_output,
+                         [sys.executable, '-m', 'pytest', '--collect-only', '-q', '-p', 'no:cacheprovider',
+                          '--testbed', TESTBED, '--metadata-mode', mode], cwd=folder)
+    generate_time, items = 0.0, 0
+    for line in out.decode('utf-8').splitlines():
+        if line.startswith('GENERATE_TIME'):
+            generate_time = float(line.split()[1])
+        elif '::' in line:
+            items += 1
+    return elapsed, generate_time, items
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark collection of metadata parametrized tests.')
+    parser.add_argument('-n', '--tests', type=int, default=2000, help='test functions (default: 2000)')
+    parser.add_argument('-p', '--ports', type=int, default=256, help='ports per DUT in metadata (default: 256)')
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    try:
+        write_metadata(os.path.join(folder, 'metadata'), args.ports)
+        write_tests(folder, args.tests)
+        print('{:<8} {:>8} {:>14} {:>20}'.format('mode', 'items', 'collect(ms)', 'generate_tests(ms)'))
+        for mode in ('file', 'store'):
+            elapsed, generate_time, items = collect(folder, mode)
+            print('{:<8} {:>8} {:>14.0f} {:>20.1f}'.format(mode, items, elapsed * 1000, generate_time * 1000))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
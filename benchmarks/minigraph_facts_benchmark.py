@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Benchmark minigraph_facts parsing with and without the parsed facts cache.
+
+For every minigraph in ansible/minigraph (or the files given on the command
+line) it reports the time of a plain parse_xml, a cold cached parse (empty
+cache) and a warm cached parse.
+
+Usage:
+    python minigraph_facts_benchmark.py [-n ROUNDS] [minigraph.xml ...]
+"""
+from __future__ import print_function
+
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+
+from benchmark_utils import SONIC_MGMT_DIR, best_of, load_source, timed
+
+
+def load_minigraph_facts():
+    # minigraph_facts imports port_utils the way ansible packs module_utils
+    import ansible.module_utils
+    port_utils = load_source('ansible.module_utils.port_utils', 'ansible/module_utils/port_utils.py')
+    sys.modules['ansible.module_utils.port_utils'] = port_utils
+    ansible.module_utils.port_utils = port_utils
+    return load_source('minigraph_facts', 'ansible/library/minigraph_facts.py')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark minigraph_facts parsing.')
+    parser.add_argument('-n', '--rounds', type=int, default=5, help='warm rounds per minigraph')
+    parser.add_argument('files', nargs='*', help='minigraph files (default: ansible/minigraph/*.xml)')
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join(SONIC_MGMT_DIR, 'ansible/minigraph', '*.xml')))
+    mgf = load_minigraph_facts()
+    mgf.ANSIBLE_USER_MINIGRAPH_PATH = tempfile.mkdtemp()
+
+    totals = [0.0, 0.0, 0.0]
+    print('{:<40} {:>10} {:>10} {:>10} {:>8}'.format('minigraph', 'plain(ms)', 'cold(ms)', 'warm(ms)', 'speedup'))
+    try:
+        for filename in files:
+            hostname = os.path.splitext(os.path.basename(filename))[0]
+            try:
+                plain = timed(mgf.parse_xml, filename, hostname)[0]
+            except Exception as e:
+                print('{:<40} parse failed: {!r}'.format(os.path.basename(filename), e))
+                continue
+            cold = timed(mgf.parse_xml_cached, filename, hostname)[0]
+            warm = best_of(lambda: mgf.parse_xml_cached(filename, hostname), args.rounds)
+            totals = [totals[0] + plain, totals[1] + cold, totals[2] + warm]
+            print('{:<40} {:>10.2f} {:>10.2f} {:>10.2f} {:>7.1f}x'.format(
+                os.path.basename(filename), plain * 1000, cold * 1000, warm * 1000, plain / warm))
+    finally:
+        shutil.rmtree(mgf.ANSIBLE_USER_MINIGRAPH_PATH)
+
+    if totals[2]:
+        print('{:<40} {:>10.2f} {:>10.2f} {:>10.2f} {:>7.1f}x'.format(
+            'total', totals[0] * 1000, totals[1] * 1000, totals[2] * 1000, totals[0] / totals[2]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+Benchmark the PDU controllers of tests/common/plugins/pdu_controller against simulated PDUs.
+
+N PDUs (8 by default) are simulated by snmpsimd (from the snmpsim package), one
+agent per PDU listening on 127.0.0.<10 + i>:161. The PDUs are alternately
+'Sentry Switched PDU' (with outlet power) and 'APC Web/SNMP Management Card'
+(with lanes), with O outlets each (24 by default). Two outlets of every PDU are
+labelled with the hostname of the DUT, the DUT is connected to all the PDUs.
+
+The pdu manager of the DUT is created and the status of the outlets of the DUT
+is retrieved:
+    - serial, no cache: one PDU at a time, the outlets are probed with SNMP walks
+    - concurrent, no cache: the PDUs are queried concurrently
+    - concurrent, cached: the outlet maps are read from the cache of the previous run
+The cache is kept in a temporary directory.
+
+With --serve, the agents are only started and serve until interrupted, e.g. to
+run the tests using the pdu_controller fixture against them, with the PDUs of
+the DUT in the inventory or the connection graph.
+
+Run it in the sonic-mgmt container, the pdu controllers need pysnmp and the test
+dependencies. The agents listen on port 161: run as root. Usage:
+    python pdu_controller_benchmark.py [-n PDUS] [-o OUTLETS] [-r RUNS] [--serve]
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark_utils import SONIC_MGMT_DIR, median, timed
+
+sys.path.insert(0, SONIC_MGMT_DIR)
+# pdu_manager imports snmp_pdu_controllers as a top-level module
+sys.path.insert(0, os.path.join(SONIC_MGMT_DIR, 'tests/common/plugins/pdu_controller'))
+
+COMMUNITY = 'public'
+DUT_HOSTNAME = 'vlab-01'
+
+# snmprec value types
+INTEGER, OCTET_STRING = 2, 4
+
+SENTRY4_SYSDESCR = 'Sentry Switched PDU'
+SENTRY4_PORT_NAME_BASE_OID = '1.3.6.1.4.1.1718.4.1.8.2.1.3'
+SENTRY4_PORT_STATUS_BASE_OID = '1.3.6.1.4.1.1718.4.1.8.3.1.1'
+SENTRY4_PORT_POWER_BASE_OID = '1.3.6.1.4.1.1718.4.1.8.3.1.9'
+APC_SYSDESCR = 'APC Web/SNMP Management Card'
+APC_PORT_NAME_BASE_OID = '1.3.6.1.4.1.318.1.1.4.4.2.1'
+APC_PORT_STATUS_BASE_OID = '1.3.6.1.4.1.318.1.1.12.3.5.1.1'
+APC_LANES = 2
+
+
+def pdu_address(index):
+    return '127.0.0.%d' % (10 + index)
+
+
+def outlet_label(pdu_index, outlet):
+    if outlet <= 2:
+        return '%s-psu%d' % (DUT_HOSTNAME, outlet)
+    return 'server-%d-%d' % (pdu_index, outlet)
+
+
+def generate_snmprec(pdu_index, outlets):
+    """Return the lines of the .snmprec file of a simulated PDU."""
+    records = []
+    if pdu_index % 2 == 0:
+        records.append(('1.3.6.1.2.1.1.1.0', OCTET_STRING, '%s, Sentry4 v8.0' % SENTRY4_SYSDESCR))
+        for outlet in range(1, outlets + 1):
+            index = '.1.%d' % outlet
+            records += [
+                (SENTRY4_PORT_NAME_BASE_OID + index, OCTET_STRING, outlet_label(pdu_index, outlet)),
+                (SENTRY4_PORT_STATUS_BASE_OID + index, INTEGER, '1'),
+                (SENTRY4_PORT_POWER_BASE_OID + index, INTEGER, str(100 + outlet)),
+            ]
+    else:
+        records.append(('1.3.6.1.2.1.1.1.0', OCTET_STRING, '%s MB:v4.0.1 PF:v6.4.0' % APC_SYSDESCR))
+        for outlet in range(1, outlets + 1):
+            index = '.%d.%d' % ((outlet - 1) % APC_LANES + 1, outlet)
+            records += [
+                (APC_PORT_NAME_BASE_OID + index, OCTET_STRING, outlet_label(pdu_index, outlet)),
+                (APC_PORT_STATUS_BASE_OID + index, INTEGER, '1'),
+            ]
+
+    records.sort(key=lambda record: [int(component) for component in record[0].split('.')])
+    return ['%s|%d|%s' % record for record in records]
+
+
+def start_agents(args, data_dir):
+    agents = []
+    for pdu_index in range(args.pdus):
+        pdu_dir = os.path.join(data_dir, str(pdu_index))
+        os.mkdir(pdu_dir)
+        with open(os.path.join(pdu_dir, COMMUNITY + '.snmprec'), 'w') as f:
+            f.write('\n'.join(generate_snmprec(pdu_index, args.outlets)) + '\n')
+        agents.append(subprocess.Popen([args.snmpsimd, '--data-dir=%s' % pdu_dir,
+                                        '--agent-udpv4-endpoint=%s:161' % pdu_address(pdu_index)]))
+    time.sleep(3)
+    return agents
+
+
+def conn_graph_facts(pdus):
+    psus = {}
+    for pdu_index in range(pdus):
+        psus['PSU%d' % (pdu_index + 1)] = {'peerdevice': 'pdu-%d' % pdu_index, 'HwSku': 'unknown', 'Protocol': 'snmp',
+                                           'ManagementIp': pdu_address(pdu_index), 'Type': 'Pdu', 'peerport': '1'}
+    return {'device_pdu_info': {DUT_HOSTNAME: psus}, 'device_pdu_links': {}}
+
+
+def run(name, args, concurrency, cache_ttl):
+    import pdu_manager
+
+    pdu_manager.MAX_CONCURRENT_PDUS = concurrency
+    pdu_vars = {'snmp_rocommunity': COMMUNITY, 'snmp_rwcommunity': COMMUNITY, 'pdu_cache_ttl': cache_ttl}
+    create_times, status_times = [], []
+    for _ in range(args.runs):
+        elapsed, pduman = timed(pdu_manager.pdu_manager_factory, DUT_HOSTNAME, {}, conn_graph_facts(args.pdus),
+                                pdu_vars)
+        create_times.append(elapsed)
+        elapsed, status = timed(pduman.get_outlet_status)
+        status_times.append(elapsed)
+    print('%-22s %12.0f %12.0f %8d' % (name, median(create_times) * 1000, median(status_times) * 1000, len(status)))
+    return sorted((outlet['pdu_name'], outlet['outlet_id'], outlet['outlet_on']) for outlet in status)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the PDU controllers against simulated PDUs.')
+    parser.add_argument('-n', '--pdus', type=int, default=8, help='simulated PDUs (default: 8)')
+    parser.add_argument('-o', '--outlets', type=int, default=24, help='outlets per PDU (default: 24)')
+    parser.add_argument('-r', '--runs', type=int, default=3, help='runs per way (default: 3)')
+    parser.add_argument('--serve', action='store_true', help='only run the simulated PDUs until interrupted')
+    parser.add_argument('--snmpsimd', default='snmpsimd.py', help='snmpsimd command (default: snmpsimd.py)')
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp()
+    agents = []
+    try:
+        agents = start_agents(args, data_dir)
+        if args.serve:
+            print('Serving %d PDUs on %s-%s, community %s, DUT outlets labelled %s-psu1 and %s-psu2' % (
+                args.pdus, pdu_address(0), pdu_address(args.pdus - 1), COMMUNITY, DUT_HOSTNAME, DUT_HOSTNAME))
+            while True:
+                time.sleep(60)
+
+        from tests.common.cache import FactsCache
+        cache = FactsCache()
+        cache._cache_location = os.path.join(data_dir, 'cache')
+
+        print('%-22s %12s %12s %8s' % ('query', 'create(ms)', 'status(ms)', 'outlets'))
+        serial = run('serial, no cache', args, 1, 0)
+        concurrent = run('concurrent, no cache', args, args.pdus, 0)
+        # Fill the cache, then measure with the cache
+        run('concurrent, cache miss', argparse.Namespace(**dict(vars(args), runs=1)), args.pdus, 3600)
+        cached = run('concurrent, cached', args, args.pdus, 3600)
+        print('same status: %s' % (serial == concurrent == cached))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for agent in agents:
+            agent.terminate()
+            agent.wait()
+        shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+Count the SAI thrift RPCs needed to read the counters of a QoS test step.
+
+tests/saitests/switch.py is run against a mock thrift client. The client
+answers the counter RPCs and counts them. It can also add a latency to each
+RPC, to estimate the time spent on the thrift round trips to the DUT.
+
+A step of the PFC and headroom tests in sai_qos_tests.py reads the port and
+queue counters of the source port and of N destination ports (3 by default),
+and the PG counters of the source port. The step is read:
+    - per call: one sai_thrift_read_port_counters call per port and one
+      sai_thrift_read_pg_counters call, with the queue and PG lists fetched on
+      every call, like before they were cached
+    - snapshot: one sai_thrift_read_counter_snapshot call
+    - snapshot without queues: the same, without the queue counters, which
+      the PFC tests don't check
+
+Run it where the saitests run, switch.py needs ptf and the switch_sai_thrift
+bindings. Usage:
+    python sai_counters_benchmark.py [-p PORTS] [-s STEPS] [--latency SECONDS]
+"""
+from __future__ import print_function
+
+import argparse
+import collections
+import os
+import sys
+import time
+
+from benchmark_utils import SONIC_MGMT_DIR, timed
+
+# the saitests import each other as top-level modules, like ptf runs them
+sys.path.insert(0, os.path.join(SONIC_MGMT_DIR, 'tests/saitests'))
+
+import switch
+from switch_sai_thrift.ttypes import (sai_thrift_attribute_list_t,
+                                      sai_thrift_attribute_t,
+                                      sai_thrift_attribute_value_t,
+                                      sai_thrift_object_list_t)
+from switch_sai_thrift.sai_headers import (SAI_PORT_ATTR_INGRESS_PRIORITY_GROUP_LIST,
+                                           SAI_PORT_ATTR_QOS_QUEUE_LIST)
+
+QUEUES_PER_PORT = 20
+PGS_PER_PORT = 8
+
+
+class MockSaiClient(object):
+    """Answer the counter RPCs of switch.py with increasing counters and count the RPCs."""
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.rpcs = collections.Counter()
+        self.reads = 0
+
+    def _rpc(self, name):
+        self.rpcs[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _counters(self, oid, count):
+        self.reads += 1
+        return [oid * 1000 + self.reads + i for i in range(count)]
+
+    def sai_thrift_get_port_attribute(self, port):
+        self._rpc('get_port_attribute')
+        attrs = []
+        for attr_id, oids in ((SAI_PORT_ATTR_QOS_QUEUE_LIST, range(QUEUES_PER_PORT)),
+                              (SAI_PORT_ATTR_INGRESS_PRIORITY_GROUP_LIST, range(PGS_PER_PORT))):
+            oid_list = [port * 100 + attr_id % 10 * 30 + oid for oid in oids]
+            value = sai_thrift_attribute_value_t(objlist=sai_thrift_object_list_t(count=len(oid_list),
+                                                                                  object_id_list=oid_list))
+            attrs.append(sai_thrift_attribute_t(id=attr_id, value=value))
+        return sai_thrift_attribute_list_t(attr_list=attrs, attr_count=len(attrs))
+
+    def sai_thrift_get_port_stats(self, port, counter_ids, number_of_counters):
+        self._rpc('get_port_stats')
+        return self._counters(port, number_of_counters)
+
+    def sai_thrift_get_queue_stats(self, queue, counter_ids, number_of_counters):
+        self._rpc('get_queue_stats')
+        return self._counters(queue, number_of_counters)
+
+    def sai_thrift_get_pg_stats(self, pg, counter_ids, number_of_counters):
+        self._rpc('get_pg_stats')
+        return self._counters(pg, number_of_counters)
+
+
+def read_per_call(client, src_port, dst_ports):
+    # The queue and PG lists were fetched on every call before they were cached
+    switch.port_qos_lists.clear()
+    counters = [switch.sai_thrift_read_port_counters(client, port) for port in [src_port] + dst_ports]
+    switch.port_qos_lists.clear()
+    return counters, switch.sai_thrift_read_pg_counters(client, src_port)
+
+
+def read_snapshot(client, src_port, dst_ports):
+    return switch.sai_thrift_read_counter_snapshot(client, [src_port] + dst_ports, pg_ports=[src_port])
+
+
+def read_snapshot_without_queues(client, src_port, dst_ports):
+    return switch.sai_thrift_read_counter_snapshot(client, [src_port] + dst_ports, queue_ports=[],
+                                                   pg_ports=[src_port])
+
+
+def run(name, read, args):
+    switch.port_qos_lists.clear()
+    client = MockSaiClient(args.latency)
+    src_port, dst_ports = 1, list(range(2, args.ports + 2))
+    elapsed = timed(lambda: [read(client, src_port, dst_ports) for _ in range(args.steps)])[0]
+    rpcs = ', '.join('%s=%d' % item for item in sorted(client.rpcs.items()))
+    print('%-18s %12.1f %14.2f   %s' % (name, float(sum(client.rpcs.values())) / args.steps,
+                                       elapsed * 1000 / args.steps, rpcs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Count the SAI thrift RPCs per counter snapshot.')
+    parser.add_argument('-p', '--ports', type=int, default=3, help='destination ports (default: 3)')
+    parser.add_argument('-s', '--steps', type=int, default=100, help='steps (default: 100)')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added per RPC (default: 0)')
+    args = parser.parse_args()
+
+    print('%-18s %12s %14s   %s' % ('read', 'RPCs/step', 'time/step(ms)', 'RPCs'))
+    run('per call', read_per_call, args)
+    run('snapshot', read_snapshot, args)
+    run('snapshot, no queue', read_snapshot_without_queues, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Benchmark the executors of ansible/library/shell_cmds.py.
+
+The module is run locally, like ansible runs it on the DUT, with N trivial
+commands (1000 by default), with the fork executor (one /bin/sh per command)
+and the session executor (all commands in one /bin/sh). The results of both
+executors are compared, without their timing.
+
+Usage:
+    python shell_cmds_benchmark.py [-n COMMANDS]
+"""
+from __future__ import print_function
+
+import argparse
+import os
+
+from benchmark_utils import SONIC_MGMT_DIR, run_ansible_module
+
+MODULE = os.path.join(SONIC_MGMT_DIR, 'ansible/library/shell_cmds.py')
+TIMING_FIELDS = ('start', 'end', 'delta')
+
+
+def commands(count):
+    cmds = []
+    for i in range(count):
+        if i % 4 == 0:
+            cmds.append('echo line %d' % i)
+        elif i % 4 == 1:
+            cmds.append('echo error %d >&2' % i)
+        elif i % 4 == 2:
+            cmds.append('true')
+        else:
+            cmds.append('printf "%s" no-newline')
+    return cmds
+
+
+def run_module(args):
+    elapsed, result = run_ansible_module(MODULE, args)
+    results = result['results']
+    for result in results:
+        for field in TIMING_FIELDS:
+            result.pop(field)
+    return elapsed, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the executors of shell_cmds.')
+    parser.add_argument('-n', '--commands', type=int, default=1000, help='commands (default: 1000)')
+    args = parser.parse_args()
+
+    cmds = commands(args.commands)
+    print('%-10s %10s %12s %10s' % ('executor', 'time(ms)', 'per cmd(ms)', 'speedup'))
+    base = None
+    outputs = {}
+    for executor in ('fork', 'session'):
+        elapsed, outputs[executor] = run_module({'cmds': cmds, 'executor': executor})
+        base = base or elapsed
+        print('%-10s %10.0f %12.2f %9.1fx' % (executor, elapsed * 1000, elapsed * 1000 / len(cmds), base / elapsed))
+    print('same results: %s' % (outputs['fork'] == outputs['session']))
+
+
+if __name__ == '__main__':
+    main()
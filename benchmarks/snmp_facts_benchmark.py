@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""
+Benchmark ansible/library/snmp_facts.py against a local SNMP agent.
+
+snmpsimd (from the snmpsim package) serves recorded walk data, either an
+.snmprec file recorded from a DUT with 'snmprec.py', or data generated for
+N interfaces (512 by default). The module is run R times (3 by default) and
+the median time is reported. With --baseline, another version of the module
+is run too, e.g. the previous one:
+    git show HEAD~1:ansible/library/snmp_facts.py > /tmp/snmp_facts_old.py
+and the facts of both versions are compared.
+
+The module queries port 161: run as root, with no other agent listening on
+the address given by --host.
+
+Usage:
+    python snmp_facts_benchmark.py [-n INTERFACES | --data SNMPREC] [--baseline PATH] [-r RUNS]
+                                   [--max-repetitions N] [--concurrency N]
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from benchmark_utils import SONIC_MGMT_DIR, median, run_ansible_module
+
+MODULE = os.path.join(SONIC_MGMT_DIR, 'ansible/library/snmp_facts.py')
+COMMUNITY = 'public'
+
+# snmprec value types
+INTEGER, OCTET_STRING, OID, IP_ADDRESS, COUNTER32, GAUGE32, TIME_TICKS, COUNTER64 = 2, 4, 6, 64, 65, 66, 67, 70
+
+
+def generate_snmprec(interfaces):
+    """Return the lines of an .snmprec file of a DUT with the given number of interfaces."""
+    records = [
+        ('1.3.6.1.2.1.1.1.0', OCTET_STRING, 'SONiC Software Version: SONiC.master.0-dirty-20201231.000000'),
+        ('1.3.6.1.2.1.1.2.0', OID, '1.3.6.1.4.1.8072.3.2.10'),
+        ('1.3.6.1.2.1.1.3.0', TIME_TICKS, '123456'),
+        ('1.3.6.1.2.1.1.4.0', OCTET_STRING, 'admin@sonic'),
+        ('1.3.6.1.2.1.1.5.0', OCTET_STRING, 'vlab-01'),
+        ('1.3.6.1.2.1.1.6.0', OCTET_STRING, 'lab'),
+        ('1.0.8802.1.1.2.1.3.1.0', INTEGER, '4'),
+        ('1.0.8802.1.1.2.1.3.2.0', OCTET_STRING, '52:54:00:12:34:56'),
+        ('1.0.8802.1.1.2.1.3.3.0', OCTET_STRING, 'vlab-01'),
+        ('1.0.8802.1.1.2.1.3.4.0', OCTET_STRING, 'SONiC'),
+        ('1.3.6.1.4.1.2021.4.5.0', INTEGER, '4029888'),
+        ('1.3.6.1.4.1.2021.4.6.0', INTEGER, '2029888'),
+        ('1.3.6.1.4.1.2021.4.13.0', INTEGER, '29888'),
+        ('1.3.6.1.4.1.2021.4.14.0', INTEGER, '129888'),
+        ('1.3.6.1.4.1.2021.4.15.0', INTEGER, '929888'),
+    ]
+    for i in range(1, interfaces + 1):
+        name = 'Ethernet%d' % ((i - 1) * 4)
+        records += [
+            ('1.3.6.1.2.1.2.2.1.1.%d' % i, INTEGER, str(i)),
+            ('1.3.6.1.2.1.2.2.1.2.%d' % i, OCTET_STRING, name),
+            ('1.3.6.1.2.1.2.2.1.3.%d' % i, INTEGER, '6'),
+            ('1.3.6.1.2.1.2.2.1.4.%d' % i, INTEGER, '9100'),
+            ('1.3.6.1.2.1.2.2.1.5.%d' % i, GAUGE32, '4294967295'),
+            ('1.3.6.1.2.1.2.2.1.6.%d' % i, OCTET_STRING, '525400%06x' % i),
+            ('1.3.6.1.2.1.2.2.1.7.%d' % i, INTEGER, '1'),
+            ('1.3.6.1.2.1.2.2.1.8.%d' % i, INTEGER, '1'),
+            ('1.3.6.1.2.1.31.1.1.1.15.%d' % i, GAUGE32, '100000'),
+            ('1.3.6.1.2.1.31.1.1.1.18.%d' % i, OCTET_STRING, 'ARISTA%02dT1:Ethernet1' % (i % 100)),
+            ('1.3.6.1.2.1.31.1.1.1.6.%d' % i, COUNTER64, str(i * 1000)),
+            ('1.3.6.1.2.1.31.1.1.1.10.%d' % i, COUNTER64, str(i * 2000)),
+            ('1.0.8802.1.1.2.1.3.7.1.2.%d' % i, INTEGER, '7'),
+            ('1.0.8802.1.1.2.1.3.7.1.3.%d' % i, OCTET_STRING, name),
+            ('1.0.8802.1.1.2.1.3.7.1.4.%d' % i, OCTET_STRING, name),
+            ('1.3.6.1.4.1.9.9.813.1.1.1.1.%d' % i, COUNTER64, '0'),
+            ('1.3.6.1.4.1.9.9.813.1.1.1.2.%d' % i, COUNTER64, '0'),
+        ]
+        for column in (13, 14, 19, 20, 11, 17):
+            records.append(('1.3.6.1.2.1.2.2.1.%d.%d' % (column, i), COUNTER32, str(i * column)))
+        for column, value in ((4, '4'), (5, '10.0.0.%d' % i), (6, '7'), (7, 'Ethernet1'), (8, 'Ethernet1'),
+                              (9, 'ARISTA%02dT1' % (i % 100)), (10, 'Arista'), (11, '28'), (12, '20')):
+            records.append(('1.0.8802.1.1.2.1.4.1.1.%d.0.%d.1' % (column, i), OCTET_STRING, value))
+        for prio in range(8):
+            records.append(('1.3.6.1.4.1.9.9.813.1.2.1.2.%d.%d' % (i, prio), COUNTER64, '0'))
+            records.append(('1.3.6.1.4.1.9.9.813.1.2.1.3.%d.%d' % (i, prio), COUNTER64, '0'))
+        for queue in range(1, 9):
+            for counter in range(1, 5):
+                records.append(('1.3.6.1.4.1.9.9.580.1.5.5.1.4.%d.2.%d.%d' % (i, queue, counter), COUNTER64, '0'))
+        if i % 4 == 1:
+            ip = '10.0.%d.%d' % (i // 256, i % 256)
+            records += [
+                ('1.3.6.1.2.1.4.20.1.1.%s' % ip, IP_ADDRESS, ip),
+                ('1.3.6.1.2.1.4.20.1.2.%s' % ip, INTEGER, str(i)),
+                ('1.3.6.1.2.1.4.20.1.3.%s' % ip, IP_ADDRESS, '255.255.255.254'),
+            ]
+    for i in range(1, interfaces // 8 + 2):
+        for column, value in ((2, 'Entity %d' % i), (4, '1'), (5, '10'), (6, str(i)), (7, 'Entity%d' % i),
+                              (8, 'A1'), (9, '1.0'), (10, '1.0'), (11, 'SN%06d' % i), (12, 'Vendor'),
+                              (13, 'Model'), (16, '2')):
+            records.append(('1.3.6.1.2.1.47.1.1.1.1.%d.%d' % (column, i), OCTET_STRING, value))
+        for column, value in ((1, '8'), (2, '9'), (3, '3'), (4, '45000'), (5, '1')):
+            records.append(('1.3.6.1.2.1.99.1.1.1.%d.%d' % (column, i), INTEGER, value))
+
+    records.sort(key=lambda record: [int(component) for component in record[0].split('.')])
+    return ['%s|%d|%s' % record for record in records]
+
+
+def benchmark(name, module, args, runs):
+    times = []
+    for _ in range(runs):
+        elapsed, result = run_ansible_module(module, args)
+        times.append(elapsed)
+    facts = result['ansible_facts']
+    facts.pop('ansible_sysuptime', None)
+    print('%-10s %12.0f %12.0f %12d' % (name, median(times) * 1000, min(times) * 1000,
+                                         len(facts.get('snmp_interfaces', {}))))
+    return median(times), facts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark snmp_facts against a local snmpsim agent.')
+    parser.add_argument('-n', '--interfaces', type=int, default=512, help='interfaces of the generated data')
+    parser.add_argument('--data', help='.snmprec file to serve instead of generated data')
+    parser.add_argument('--baseline', help='other version of snmp_facts.py to compare with')
+    parser.add_argument('-r', '--runs', type=int, default=3, help='runs per version (default: 3)')
+    parser.add_argument('--max-repetitions', type=int, default=25)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--host', default='127.0.0.1', help='address snmpsimd listens on (default: 127.0.0.1)')
+    parser.add_argument('--snmpsimd', default='snmpsimd.py', help='snmpsimd command (default: snmpsimd.py)')
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp()
+    agent = None
+    try:
+        data_file = os.path.join(data_dir, COMMUNITY + '.snmprec')
+        if args.data:
+            shutil.copy(args.data, data_file)
+        else:
+            with open(data_file, 'w') as f:
+                f.write('\n'.join(generate_snmprec(args.interfaces)) + '\n')
+
+        agent = subprocess.Popen([args.snmpsimd, '--data-dir=%s' % data_dir,
+                                  '--agent-udpv4-endpoint=%s:161' % args.host])
+        time.sleep(3)
+
+        module_args = {'host': args.host, 'version': 'v2c', 'community': COMMUNITY}
+        print('%-10s %12s %12s %12s' % ('module', 'median(ms)', 'best(ms)', 'interfaces'))
+        new_args = dict(module_args, max_repetitions=args.max_repetitions, concurrency=args.concurrency)
+        elapsed, facts = benchmark('current', MODULE, new_args, args.runs)
+        if args.baseline:
+            base_elapsed, base_facts = benchmark('baseline', args.baseline, module_args, args.runs)
+            print('speedup: %.1fx, same facts: %s' % (base_elapsed / elapsed, facts == base_facts))
+    finally:
+        if agent:
+            agent.terminate()
+            agent.wait()
+        shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Benchmark loading of a large testbed file with tests/common/testbed.py.
+
+A synthetic testbed csv file with N entries (500 by default) is generated
+and loaded:
+    - without cache, building topology data of all testbeds (the old behaviour)
+    - cold, for one testbed, with an empty on-disk cache
+    - warm, for one testbed, from the on-disk cache (a new process, e.g. a xdist worker)
+    - through the process-wide cache (TestbedInfo.load)
+
+Usage:
+    python testbed_benchmark.py [-n ENTRIES] [-r ROUNDS]
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import tempfile
+
+from benchmark_utils import best_of, load_source
+
+TOPOS = ['t0', 't0-64', 't1-lag', 't1-64-lag', 't0-116', 'ptf32', 'dualtor', 't2']
+HEADER = '# conf-name,group-name,topo,ptf_image_name,ptf,ptf_ip,ptf_ipv6,server,vm_base,dut,inv_name,auto_recover,comment'
+
+
+def write_testbed_csv(filename, entries):
+    with open(filename, 'w') as f:
+        f.write(HEADER + '\n')
+        for i in range(entries):
+            topo = TOPOS[i % len(TOPOS)]
+            duts = 'str-dut-{:03d}-1;str-dut-{:03d}-2'.format(i, i) if topo in ('dualtor', 't2') else 'str-dut-{:03d}'.format(i)
+            f.write('vms-{0:03d},vms{0:03d},{1},docker-ptf,ptf_vms{0:03d},10.{2}.{3}.10/23,fec0::{0:x}/64,server_{4},VM{5:04d},[{6}],lab,True,Synthetic\n'.format(
+                i, topo, i // 250, i % 250, i % 20, (i * 32) % 10000, duts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark testbed file loading.')
+    parser.add_argument('-n', '--entries', type=int, default=500, help='testbed entries (default: 500)')
+    parser.add_argument('-r', '--rounds', type=int, default=3, help='rounds per measurement')
+    args = parser.parse_args()
+
+    testbed = load_source('testbed', 'tests/common/testbed.py')
+    tmpdir = tempfile.mkdtemp()
+    testbed.TESTBED_CACHE_DIR = os.path.join(tmpdir, 'cache')
+    tbfile = os.path.join(tmpdir, 'testbed.csv')
+    tbname = 'vms-{:03d}'.format(args.entries // 2)
+    write_testbed_csv(tbfile, args.entries)
+
+    def new_process():
+        testbed.TestbedInfo._instances.clear()
+        testbed._topo_file_cache.clear()
+
+    def no_cache():
+        new_process()
+        testbed.TestbedInfo(tbfile, use_cache=False)
+
+    def cold():
+        new_process()
+        shutil.rmtree(testbed.TESTBED_CACHE_DIR, ignore_errors=True)
+        testbed.TestbedInfo.load(tbfile, tbname)
+
+    def warm():
+        new_process()
+        testbed.TestbedInfo.load(tbfile, tbname)
+
+    def in_process():
+        testbed.TestbedInfo.load(tbfile, tbname).get_testbed(tbname)
+
+    try:
+        base = best_of(no_cache, args.rounds)
+        print('{:<36} {:>10}'.format('{} testbeds'.format(args.entries), 'time(ms)'))
+        print('{:<36} {:>10.2f}'.format('no cache, all topologies', base * 1000))
+        for name, func in (('cold disk cache, one topology', cold),
+                           ('warm disk cache, one topology', warm),
+                           ('process cache', in_process)):
+            elapsed = best_of(func, args.rounds)
+            print('{:<36} {:>10.2f} {:>8.1f}x'.format(name, elapsed * 1000, base / elapsed))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -121,6 +121,11 @@ dev_defaults = {
     "SPYTEST_HELPER_CONFIG_DB_RELOAD": "yes",
     "SPYTEST_CHECK_HELPER_SIGNATURE": "0",
     "SPYTEST_CLICK_HELPER_ARGS": "",
+    "SPYTEST_BASE64_TRANSFER_COMPRESS": "1",
+    "SPYTEST_UPLOAD_CACHE": "1",
+    "SPYTEST_SESSION_INIT_PIPELINE": "1",
+    "SPYTEST_PROFILE_EXPORT": "1",
+    "SPYTEST_PROFILE_TOP_COUNT": "10",
 }
 
 def _get_logs_path():
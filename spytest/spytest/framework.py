@@ -1,6 +1,7 @@
 import os
 import re
 import sys
+import json
 import pdb
 import time
 import glob
@@ -34,6 +35,7 @@ from spytest.termserv import TermServ
 from spytest.dicts import SpyTestDict
 from spytest.tgen import tg as tgapi
 from spytest.version import get_git_ver
+from spytest.profile import ProfileSummary
 from spytest.datamap import DataMap
 from spytest import batch
 from spytest.st_time import get_timenow
@@ -306,6 +308,7 @@ class Context(object):
         sysinfo_csv = paths.get_sysinfo_csv(self.logs_path)
         Result.write_report_csv(sysinfo_csv, [], ReportType.SYSINFO, is_batch=False)
         utils.delete_file(paths.get_stats_txt(self.logs_path))
+        utils.delete_file(paths.get_stats_trace(self.logs_path))
         utils.delete_file(os.path.join(self.logs_path, "node_dead"))
 
     def log_verion_info(self):
@@ -652,6 +655,10 @@ class WorkArea(object):
         self.app_vars = dict()
         self.cli_type_cache = OrderedDict()
         self.module_vars = dict()
+        self.session_phase_times = OrderedDict()
+        self.profile_export = bool(env.get("SPYTEST_PROFILE_EXPORT", "1") != "0")
+        top_count = utils.integer_parse(env.get("SPYTEST_PROFILE_TOP_COUNT", "10"), 10)
+        self.profile_summary = ProfileSummary(top_count)
         self._context = None
         self.file_prefix = None
         self.chat = None
@@ -1626,6 +1633,81 @@ class WorkArea(object):
         if self._trace_exceptions(None, msg, exceptions):
             os._exit(6)
 
+    def _session_phase_dut(self, dut, phase, func, *args, **kwargs):
+        start_time = get_timenow()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.session_phase_times[dut][phase] = get_elapsed(start_time)
+
+    # each DUT goes through init, port build and reading vars on its own
+    # so that the next phase does not wait for the slowest DUT
+    # the DUTs join only at the checks which need all of them
+    def _session_pipeline_dut(self, dut, no_recovery):
+        self._session_phase_dut(dut, "Init", self._session_init_dut, dut)
+        retval = self._session_phase_dut(dut, "Ports", self._session_build_ports_dut,
+                                         dut, no_recovery)
+        if not retval and not self.cfg.filemode:
+            return retval
+        self._module_init_cli_cache_dut(dut)
+        self.module_vars[dut] = dict()
+        self._session_phase_dut(dut, "Vars", self._read_vars, dut)
+        return retval
+
+    def _session_phase_report(self):
+        phases = ["Init", "Ports", "Vars"]
+        (header, rows) = (["DUT"] + phases + ["Total"], [])
+        for dut in self.get_dut_names():
+            times = self.session_phase_times.get(dut, {})
+            row = [dut]
+            for phase in phases:
+                row.append(utils.time_format(times.get(phase, 0)))
+            row.append(utils.time_format(sum(times.values())))
+            rows.append(row)
+        self.log("session init phase times")
+        self.log(utils.sprint_vtable(header, rows), split_lines=True)
+
+    def _session_init_phases(self):
+        no_recovery = bool(env.get("SPYTEST_RECOVER_INITIAL_SYSTEM_NOT_READY", "0") == "1")
+        self.session_phase_times = OrderedDict()
+        for dut in self.get_dut_names():
+            self.session_phase_times[dut] = OrderedDict()
+
+        if env.get("SPYTEST_SESSION_INIT_PIPELINE", "1") != "0":
+            # load image and config, build port list, save base config and read vars
+            self.log("session init pipeline: load image, build port list, save base config and read vars")
+            self._module_init_cli_cache()
+            [retvals, exceptions] = self._foreach_dev(self._session_pipeline_dut, no_recovery)
+            self._session_phase_report()
+            if self._trace_exceptions(None, "exception in session init pipeline", exceptions):
+                os._exit(6)
+            return retvals
+
+        # load current image, config and perform
+        [retvals, exceptions] = self._foreach_dev(self._session_phase_dut_all, "Init",
+                                                  self._session_init_dut)
+        if self._trace_exceptions(None, "exception loading image or init config", exceptions):
+            os._exit(6)
+
+        # identify invalid port names given in testbed file
+        self.log("building port list and save base config")
+        [retvals, exceptions] = self._foreach_dev(self._session_phase_dut_all, "Ports",
+                                                  self._session_build_ports_dut, no_recovery)
+        if self._trace_exceptions(None, "exception saving base config", exceptions):
+            os._exit(6)
+
+        # get application vars
+        self._module_init_cli_cache()
+        for dut in self.get_dut_names():
+            self.module_vars[dut] = dict()
+            self._session_phase_dut(dut, "Vars", self._read_vars, dut)
+        self._session_phase_report()
+
+        return retvals
+
+    def _session_phase_dut_all(self, dut, phase, func, *args, **kwargs):
+        return self._session_phase_dut(dut, phase, func, dut, *args, **kwargs)
+
     def _session_init(self):
         self.log_time("session init start")
         apis_instrument("session-init-start", None)
@@ -1641,17 +1723,8 @@ class WorkArea(object):
         # set interface alias mode to native
         self._session_ifname_type_set("native")
 
-        # load current image, config and perform
-        [retvals, exceptions] = self._foreach_dev(self._session_init_dut)
-        if self._trace_exceptions(None, "exception loading image or init config", exceptions):
-            os._exit(6)
-
-        # identify invalid port names given in testbed file
-        self.log("building port list and save base config")
-        no_recovery = bool(env.get("SPYTEST_RECOVER_INITIAL_SYSTEM_NOT_READY", "0") == "1")
-        [retvals, exceptions] = self._foreach_dev(self._session_build_ports_dut, no_recovery)
-        if self._trace_exceptions(None, "exception saving base config", exceptions):
-            os._exit(6)
+        # load image and config, build port list and read vars
+        retvals = self._session_init_phases()
 
         # bail out if there are erros detected in topology
         if not all(retvals):
@@ -1661,12 +1734,6 @@ class WorkArea(object):
                 self.dut_log(dut, msg, lvl=logging.ERROR)
             if not self.cfg.filemode: os._exit(6)
 
-        # get application vars
-        self._module_init_cli_cache()
-        for dut in self.get_dut_names():
-            self.module_vars[dut] = dict()
-            self._read_vars(dut)
-
         # bail out if there is any difference in software version
         version_check = env.get("SPYTEST_ABORT_ON_VERSION_MISMATCH", "2")
         if version_check != "0":
@@ -1802,6 +1869,7 @@ class WorkArea(object):
     def _session_clean(self):
         self.log_time("session clean start")
         apis_instrument("session-clean-start", None)
+        self._write_profile_summary()
 
         if batch.is_member():
             data = self._report_file_generation()
@@ -1905,9 +1973,12 @@ class WorkArea(object):
         self.cli_records.clear()
         self.cli_type_cache.clear()
         for dut in self.get_dut_names():
-            self.module_sysinfo[dut] = {}
-            self.cli_records[dut] = []
-            self.cli_type_cache[dut] = OrderedDict()
+            self._module_init_cli_cache_dut(dut)
+
+    def _module_init_cli_cache_dut(self, dut):
+        self.module_sysinfo[dut] = {}
+        self.cli_records[dut] = []
+        self.cli_type_cache[dut] = OrderedDict()
 
     def _module_init_tgen(self):
         tgapi.module_init()
@@ -2192,6 +2263,7 @@ class WorkArea(object):
         apis_instrument("module-clean-start", filepath)
 
         self._module_complete(nodeid, filepath)
+        self._write_profile_summary()
 
         # apply base configuration
         if self.apply_base_config_after_module:
@@ -2570,6 +2642,37 @@ class WorkArea(object):
                stats.tc_cmd_time, stats.tg_cmd_time, stats.tc_total_wait,
                stats.tg_total_wait, stats.pnfound, desc.replace(",", " ")]
         Result.write_report_csv(stats_csv, [row], ReportType.STATS, False, True)
+        if self.profile_export:
+            self._write_profile(logs_path, module, func, stats)
+
+    def _write_profile(self, logs_path, module, func, stats):
+
+        # append the events in chrome trace-event format
+        # the closing bracket is optional in the JSON array format
+        trace_json = paths.get_stats_trace(logs_path)
+        is_new = not os.path.exists(trace_json)
+        with open(trace_json, "a") as ofh:
+            if is_new: ofh.write("[\n")
+            pname = "{}::{}".format(module, func)
+            for event in self._context.net.get_trace_events(pname, self.stats_count):
+                ofh.write(json.dumps(event))
+                ofh.write(",\n")
+
+        # per module aggregates, written when the module is cleaned
+        self.profile_summary.add(module, stats)
+
+    def _write_profile_summary(self):
+        if not self.profile_summary.modules:
+            return
+        # append the rows of the modules done since the last call
+        [_, logs_path, _] = _get_logs_path()
+        profile_csv = paths.get_profile_csv(logs_path)
+        cols, rows = self.profile_summary.get_module_report()
+        utils.write_csv_file(cols, rows, profile_csv, os.path.exists(profile_csv))
+        profile_top_csv = paths.get_profile_top_csv(logs_path)
+        cols, rows = self.profile_summary.get_top_report()
+        utils.write_csv_file(cols, rows, profile_top_csv, os.path.exists(profile_top_csv))
+        self.profile_summary.clear()
 
     def get_device_names(self, dtype):
         """
@@ -4450,11 +4553,13 @@ def read_all_results(logs_path, suffix):
     return results
 
 def concat_files(target, files, add_prefix=True):
-    utils.write_file(target, "")
-    for fp in files:
-        for line in utils.read_lines(fp):
+    # keep the target open for the whole merge instead of once per line
+    with utils.open_file(target, "w") as ofh:
+        for fp in files:
             prefix = "{},".format(os.path.basename(fp)) if add_prefix else ""
-            utils.write_file(target, "{}{}\n".format(prefix, line), "a")
+            with open(fp, "r") as ifh:
+                for line in ifh:
+                    ofh.write("{}{}\n".format(prefix, line.strip()))
 
 def get_header_info(index, cols, is_batch=True):
     links, indexes = {}, {}
@@ -4485,9 +4590,12 @@ def consolidate_results(progress=None, thread=False, count=None):
     if progress is not None and progress <= 0:
         return
 
+    # read the node results once and build all the reports from them
+    func_results = sorted(read_all_results(logs_path, "functions"), key=itemgetter(5))
+    tc_results = sorted(read_all_results(logs_path, "testcases"), key=itemgetter(5))
+
     # functions
-    results = read_all_results(logs_path, "functions")
-    consolidated = sorted(results, key=itemgetter(5))
+    consolidated = func_results
     results_csv = paths.get_results_csv(logs_path, True)
     Result.write_report_csv(results_csv, consolidated, ReportType.FUNCTIONS)
     ############## REMOVE ME ##########################
@@ -4508,16 +4616,15 @@ def consolidate_results(progress=None, thread=False, count=None):
     results_htm = paths.get_results_htm(logs_path, True)
     align = {col: True for col in ["Module", "TestFunction", "Description", "Devices"]}
     Result.write_report_html(results_htm, consolidated, ReportType.FUNCTIONS, True, 4, links=links, align=align)
-    save_failed_function_list(results_csv, 1)
+    save_failed_function_list(results_csv, 1, rows=func_results)
     wa = get_work_area()
     if wa and wa._context:
         wa._context.run_progress_report(len(consolidated))
     tcresults_csv = paths.get_tc_results_csv(logs_path, True)
-    generate_module_report(results_csv, tcresults_csv, 1)
+    generate_module_report(results_csv, tcresults_csv, 1, func_results, tc_results)
 
     # testcases
-    results = read_all_results(logs_path, "testcases")
-    consolidated = sorted(results, key=itemgetter(5))
+    consolidated = tc_results
     tcresults_csv = paths.get_tc_results_csv(logs_path, True)
     Result.write_report_csv(tcresults_csv, consolidated, ReportType.TESTCASES)
     ############## REMOVE ME ##########################
@@ -4536,7 +4643,7 @@ def consolidate_results(progress=None, thread=False, count=None):
     results_htm = paths.get_tc_results_htm(logs_path, True)
     align = {col: True for col in ["Feature", "TestCase", "Description", "Function", "Module", "Devices"]}
     Result.write_report_html(results_htm, consolidated, ReportType.TESTCASES, True, 4, links=links, align=align)
-    generate_features_report(results_csv, tcresults_csv, 1)
+    generate_features_report(results_csv, tcresults_csv, 1, func_results, tc_results)
 
     # analisys - reuse from testcases report
     try:
@@ -4787,18 +4894,20 @@ def generate_email_report(count=None):
     report_htm = paths.get_report_htm(logs_path, True)
     generate_email_report_files(files, nodes, report_htm)
 
-def generate_module_report(results_csv, tcresults_csv, offset=0):
+def generate_module_report(results_csv, tcresults_csv, offset=0, rows=None, tc_rows=None):
     [_, logs_path, _] = _get_logs_path()
     report_csv = paths.get_modules_csv(logs_path, bool(offset))
     report_htm = paths.get_modules_htm(logs_path, bool(offset))
     syslog_htm = paths.get_syslog_htm(None, bool(offset))
-    rows = Result.read_report_csv(results_csv)
+    if rows is None:
+        rows = Result.read_report_csv(results_csv)
     module_logs = OrderedDict()
     sys_logs = OrderedDict()
     modules = OrderedDict()
 
     tc_all, tc_pass = OrderedDict(), OrderedDict()
-    tc_rows = Result.read_report_csv(tcresults_csv)
+    if tc_rows is None:
+        tc_rows = Result.read_report_csv(tcresults_csv)
     for row in tc_rows:
         module = row[offset+7]
         res = row[offset+2]
@@ -4939,24 +5048,28 @@ def save_function_list(items, logs_path):
     utils.write_file(out_file, "\n".join(func_list))
 
 save_failed_function_list_supported = False
-def save_failed_function_list(csv_file, offset=0):
+def save_failed_function_list(csv_file, offset=0, rows=None):
     if not save_failed_function_list_supported:
         return
     func_list = []
-    for row in Result.read_report_csv(csv_file):
+    if rows is None:
+        rows = Result.read_report_csv(csv_file)
+    for row in rows:
         res = row[offset+2].upper()
         if not res in ["", "PASS"]:
             func_list.append(row[offset+1])
     out_file = os.path.splitext(csv_file)[0]+'_fails.txt'
     utils.write_file(out_file, "\n".join(func_list))
 
-def generate_features_report(results_csv, tcresults_csv, offset=0):
+def generate_features_report(results_csv, tcresults_csv, offset=0, func_rows=None, tc_rows=None):
     modules = OrderedDict()
     func_time = dict()
     func_syslogs = dict()
     tcmodmap = dict()
-    tc_rows = Result.read_report_csv(tcresults_csv)
-    func_rows = Result.read_report_csv(results_csv)
+    if tc_rows is None:
+        tc_rows = Result.read_report_csv(tcresults_csv)
+    if func_rows is None:
+        func_rows = Result.read_report_csv(results_csv)
     for row in func_rows:
         name = row[offset]
         func = row[offset+1]
@@ -5154,8 +5267,9 @@ def _report_data_generation(execution_start, execution_end,
     results_csv = paths.get_results_csv(logs_path)
     results_htm = paths.get_results_htm(logs_path)
 
-    generate_features_report(results_csv, tcresults_csv)
     tc_rows = Result.read_report_csv(tcresults_csv)
+    func_rows = Result.read_report_csv(results_csv)
+    generate_features_report(results_csv, tcresults_csv, 0, func_rows, tc_rows)
     links, indexes = get_header_info(ReportType.TESTCASES, ["Result", "Module"], False)
     for row in tc_rows:
         mlog = paths.get_mlog_path(row[indexes["Module"]])
@@ -5164,9 +5278,8 @@ def _report_data_generation(execution_start, execution_end,
     align = {col: True for col in ["Feature", "TestCase", "Description", "Function", "Module", "Devices"]}
     Result.write_report_html(tcresults_htm, tc_rows, ReportType.TESTCASES, False, links=links, align=align)
 
-    save_failed_function_list(results_csv)
-    generate_module_report(results_csv, tcresults_csv)
-    func_rows = Result.read_report_csv(results_csv)
+    save_failed_function_list(results_csv, rows=func_rows)
+    generate_module_report(results_csv, tcresults_csv, 0, func_rows, tc_rows)
     links, indexes = get_header_info(ReportType.FUNCTIONS, ["Module", "Result", "Syslogs"], False)
     for row in func_rows:
         syslog_htm = paths.get_syslog_htm()
@@ -74,6 +74,7 @@ class Net(object):
         self.syslogs = dict()
         self.memory_checks = dict()
         self.skip_trans_helper = dict()
+        self.upload_cache = dict()
         self.last_mode = dict()
         self.image_install_status = OrderedDict()
         self.devices_used_in_tc = OrderedDict()
@@ -106,6 +107,8 @@ class Net(object):
         self.orig_time_sleep = time.sleep
         self.force_console_transfer = False
         self.max_cmds_once = 100
+        self.transfer_compress = bool(env.get("SPYTEST_BASE64_TRANSFER_COMPRESS", "1") != "0")
+        self.upload_cache_support = bool(env.get("SPYTEST_UPLOAD_CACHE", "1") != "0")
         self.pending_downloads = dict()
         self.log_dutid_fmt = env.get("SPYTEST_LOG_DUTID_FMT", "LABEL")
         self.dut_log_lock = putils.Lock()
@@ -2747,6 +2750,7 @@ class Net(object):
 
         # we need to download the helper files again
         self.skip_trans_helper[devname] = dict()
+        self.upload_cache[devname] = dict()
 
         # Issue reboot command and look for ONIE rescue mode.
         if not self.reboot(devname, onie=True):
@@ -2860,6 +2864,7 @@ class Net(object):
 
         # we need to download the helper files again
         self.skip_trans_helper[devname] = dict()
+        self.upload_cache[devname] = dict()
 
         # Issue reboot command.
         reboot_flag = False
@@ -3172,7 +3177,7 @@ class Net(object):
         script_cmd = "rm -f {0}.tmp {0}".format(dst_file)
         self._exec(devname, script_cmd, prompt)
         redir = ">"
-        lines = utils.b64encode(src_file)
+        lines = utils.b64encode(src_file, self.transfer_compress)
         (count, split) = (len(lines), self.max_cmds_once)
         for i in range(0, count, split):
             script_cmds = []
@@ -3185,7 +3190,10 @@ class Net(object):
                 script_cmd = "echo {} {} {}.tmp".format(line, redir, dst_file)
                 self._send_command(access, script_cmd, prompt, True)
                 redir = ">>"
-        script_cmd = "base64 -d {0}.tmp > {0}".format(dst_file)
+        if self.transfer_compress:
+            script_cmd = "base64 -d {0}.tmp | gzip -dc > {0}".format(dst_file)
+        else:
+            script_cmd = "base64 -d {0}.tmp > {0}".format(dst_file)
         self._exec(devname, script_cmd, prompt)
 
     def _transfer_base64_small(self, access, src_file, dst_file):
@@ -3258,6 +3266,36 @@ class Net(object):
     def _upload_file(self, access, src_file, dst_file=None):
         return self._upload_file1(access, src_file, dst_file, self.force_console_transfer)
 
+    def _check_upload_cache(self, access, src_file, dst_file):
+        """
+        returns the md5 of the source file and whether the same content
+        was already uploaded to the destination in this session
+        :param access:
+        :param src_file:
+        :param dst_file:
+        :return: (md5sum, skip), md5sum is None when the cache is disabled
+        """
+        if not self.upload_cache_support:
+            return None, False
+        md5sum = utils.md5(src_file)
+        devname = access["devname"]
+        cache = self.upload_cache.setdefault(devname, dict())
+        if cache.get(dst_file) != md5sum:
+            return md5sum, False
+
+        # the cache only says what we uploaded - confirm the remote content
+        prompt = self._get_cli_prompt(devname)
+        script_cmd = "sudo md5sum {}".format(dst_file)
+        output = self._send_command(access, script_cmd, prompt, False)
+        try:
+            md5sum2 = output.split(nl)[0].strip().split(" ")[0].strip()
+            if md5sum == md5sum2:
+                return md5sum, True
+        except Exception:
+            pass
+        cache.pop(dst_file, None)
+        return md5sum, False
+
     def _upload_file1(self, access, src_file, dst_file=None, force_console_transfer=False):
         if not dst_file:
             dst_file = "/tmp/{}".format(os.path.basename(src_file))
@@ -3266,8 +3304,14 @@ class Net(object):
         self.dut_log(devname, msg)
         if access["filemode"]:
             return dst_file
+        md5sum, skip = self._check_upload_cache(access, src_file, dst_file)
+        if skip:
+            self.dut_log(devname, "Transfer skipped - remote md5 {} matches".format(md5sum))
+            return dst_file
         if force_console_transfer:
             self._transfer_base64(access, src_file, dst_file)
+            if self.upload_cache_support:
+                self.upload_cache.setdefault(devname, dict())[dst_file] = md5sum
             return dst_file
         try:
             connection_param = access["connection_param"]
@@ -3280,6 +3324,8 @@ class Net(object):
             print(e)
             self.dut_log(devname, "SFTP Failed - Doing Console transfer")
             self._transfer_base64(access, src_file, dst_file)
+        if self.upload_cache_support:
+            self.upload_cache.setdefault(devname, dict())[dst_file] = md5sum
         return dst_file
 
     def _upload_file2(self, devname, access, src_file, md5check=False):
@@ -4516,6 +4562,9 @@ class Net(object):
     def get_stats(self):
         return profile.get_stats()
 
+    def get_trace_events(self, pname, pid=1):
+        return profile.get_trace_events(pname, pid)
+
     def set_prev_tc(self, prev_tc=None):
         self.prev_testcase = prev_tc
         for devname in self.topo["duts"]:
@@ -68,6 +68,15 @@ def get_stats_htm(prefix=None, consolidated=False):
 def get_stats_txt(prefix=None, consolidated=False):
     return get_file_path("stats", "txt", prefix, consolidated)
 
+def get_stats_trace(prefix=None, consolidated=False):
+    return get_file_path("stats_trace", "json", prefix, consolidated)
+
+def get_profile_csv(prefix=None, consolidated=False):
+    return get_file_path("profile", "csv", prefix, consolidated)
+
+def get_profile_top_csv(prefix=None, consolidated=False):
+    return get_file_path("profile_top", "csv", prefix, consolidated)
+
 def get_report_txt(prefix=None, consolidated=False):
     return get_file_path("summary", "txt", prefix, consolidated)
 
@@ -1,8 +1,18 @@
 
+import re
+import time
+from collections import OrderedDict
+
 from spytest.st_time import get_timenow
 from spytest.dicts import SpyTestDict
 import spytest.logger as logger
 
+def _monotonic_us():
+    try:
+        return int(time.monotonic() * 1000000)
+    except AttributeError:
+        return int(time.time() * 1000000)
+
 class Profile(object):
 
     def __init__(self):
@@ -18,7 +28,12 @@ class Profile(object):
         self.helper_cmds = []
         self.cmds = []
         self.profile_ids = dict()
+        self.profile_mono = dict()
+        self.profile_times = dict()
         self.canbe_parallel = []
+        self.canbe_parallel_ms = 0
+        # [monotonic start (us), duration (us), thread, type, dut, msg]
+        self.events = []
 
     def init(self):
         self.__init__()
@@ -28,6 +43,7 @@ class Profile(object):
         msg = msg.replace("\n", "\\n")
         count = len(self.profile_ids)
         self.profile_ids[count] = [get_timenow(), dut, msg, data]
+        self.profile_mono[count] = _monotonic_us()
         return count
 
     def stop(self, pid):
@@ -35,34 +51,45 @@ class Profile(object):
         delta = get_timenow() - start_time
         cmd_time = int(delta.total_seconds() * 1000)
         thid = logger.get_thread_name()
+        self.profile_times[pid] = cmd_time
+        mono_start = self.profile_mono.get(pid, 0)
         if dut:
             if pid > 0 and thid == "T0000: ":
                 [_, pdut, pmsg, _] = self.profile_ids[pid-1]
                 if pmsg == msg and dut != pdut:
                     self.canbe_parallel.append([start_time, msg, dut, pdut])
+                    # running both together would have saved the shorter one
+                    ptime = self.profile_times.get(pid-1, 0)
+                    self.canbe_parallel_ms += min(ptime, cmd_time)
             if "spytest-helper.py" in msg:
                 self.helper_cmds.append([start_time, thid, dut, msg, cmd_time])
                 self.helper_cmd_time = self.helper_cmd_time + cmd_time
                 self.cmds.append([start_time, thid, "HELPER", dut, msg, cmd_time])
+                self.events.append([mono_start, cmd_time * 1000, thid, "HELPER", dut, msg])
             else:
                 self.tc_cmds.append([start_time, thid, dut, msg, cmd_time])
                 self.tc_cmd_time = self.tc_cmd_time + cmd_time
                 self.cmds.append([start_time, thid, "CMD", dut, msg, cmd_time])
+                self.events.append([mono_start, cmd_time * 1000, thid, "CMD", dut, msg])
         else:
             self.tg_cmds.append([start_time, thid, dut, msg, cmd_time])
             self.tg_cmd_time = self.tg_cmd_time + cmd_time
             self.cmds.append([start_time, thid, "TG", dut, msg, cmd_time])
+            self.events.append([mono_start, cmd_time * 1000, thid, "TG", dut, msg])
         return data
 
     def wait(self, val, is_tg=False):
         start_time = get_timenow()
+        mono_start = _monotonic_us()
         thid = logger.get_thread_name()
         if is_tg:
             self.tg_total_wait = self.tg_total_wait + val
             self.cmds.append([start_time, thid, "TGWAIT", None, "TG sleep", val])
+            self.events.append([mono_start, int(val * 1000000), thid, "TGWAIT", None, "TG sleep"])
         else:
             self.tc_total_wait = self.tc_total_wait + val
             self.cmds.append([start_time, thid, "WAIT", None, "static delay", val])
+            self.events.append([mono_start, int(val * 1000000), thid, "WAIT", None, "static delay"])
 
     def prompt_nfound(self, cmd):
         start_time = get_timenow()
@@ -82,9 +109,100 @@ class Profile(object):
         stats.helper_cmds = self.helper_cmds
         stats.cmds = self.cmds
         stats.canbe_parallel = self.canbe_parallel
+        stats.canbe_parallel_ms = self.canbe_parallel_ms
         stats.pnfound = self.pnfound
+        stats.events = self.events
         return stats
 
+    def get_trace_events(self, pname, pid=1):
+        """
+        returns the recorded events in chrome trace-event format
+        :param pname: process name to group the events under (test name)
+        :param pid: process id to use for the events
+        :return: list of trace event dictionaries
+        """
+        retval = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": pname}}]
+        for [ts, dur, thid, ctype, dut, msg] in self.events:
+            event = OrderedDict()
+            event["name"] = msg
+            event["cat"] = ctype
+            event["ph"] = "X"
+            event["ts"] = ts
+            event["dur"] = dur
+            event["pid"] = pid
+            event["tid"] = thid.strip().rstrip(":")
+            event["args"] = {"dut": dut} if dut else {}
+            retval.append(event)
+        return retval
+
+class ProfileSummary(object):
+    """
+    accumulates the per test profile data into per module aggregates
+    commands are aggregated with their numbers masked, at most max_cmds
+    distinct commands are kept per module and the others are counted together
+    """
+
+    other_cmds = "(other commands)"
+
+    def __init__(self, top=10, max_cmds=200):
+        self.top = top
+        self.max_cmds = max_cmds
+        self.modules = OrderedDict()
+
+    @staticmethod
+    def normalize(msg):
+        return re.sub(r"\d+", "N", " ".join(msg.split()))[:200]
+
+    def add(self, module, stats):
+        if module not in self.modules:
+            self.modules[module] = SpyTestDict(tests=0, cmd_ms=0, helper_ms=0,
+                                               tg_ms=0, wait_ms=0, parallel_ms=0,
+                                               cmds=dict())
+        entry = self.modules[module]
+        entry.tests = entry.tests + 1
+        entry.parallel_ms = entry.parallel_ms + stats.canbe_parallel_ms
+        for [_, dur, _, ctype, _, msg] in stats.events:
+            dur_ms = dur // 1000
+            if ctype in ["WAIT", "TGWAIT"]:
+                entry.wait_ms = entry.wait_ms + dur_ms
+                continue
+            if ctype == "CMD":
+                entry.cmd_ms = entry.cmd_ms + dur_ms
+            elif ctype == "HELPER":
+                entry.helper_ms = entry.helper_ms + dur_ms
+            else:
+                entry.tg_ms = entry.tg_ms + dur_ms
+            key = self.normalize(msg)
+            if key not in entry.cmds and len(entry.cmds) >= self.max_cmds:
+                key = self.other_cmds
+            [count, total] = entry.cmds.get(key, [0, 0])
+            entry.cmds[key] = [count + 1, total + dur_ms]
+
+    def get_module_report(self):
+        cols = ["Module", "Tests", "CMD Time (ms)", "HELPER Time (ms)",
+                "TG Time (ms)", "Wait Time (ms)", "Wait Share",
+                "Parallel Savings (ms)"]
+        rows = []
+        for module, entry in self.modules.items():
+            total = entry.cmd_ms + entry.helper_ms + entry.tg_ms + entry.wait_ms
+            share = entry.wait_ms * 1.0 / total if total else 0
+            rows.append([module, entry.tests, entry.cmd_ms, entry.helper_ms,
+                         entry.tg_ms, entry.wait_ms, "{:.2%}".format(share),
+                         entry.parallel_ms])
+        return cols, rows
+
+    def get_top_report(self):
+        cols = ["Module", "Rank", "Command", "Count", "Total Time (ms)", "Avg Time (ms)"]
+        rows = []
+        for module, entry in self.modules.items():
+            cmds = sorted(entry.cmds.items(), key=lambda x: x[1][1], reverse=True)
+            for rank, (msg, [count, total]) in enumerate(cmds[:self.top]):
+                rows.append([module, rank + 1, msg, count, total, total // count])
+        return cols, rows
+
+    def clear(self):
+        self.modules.clear()
+
 obj = Profile()
 def init():
     return obj.init()
@@ -101,6 +219,9 @@ def wait(val, is_tg=False):
 def get_stats():
     return obj.get_stats()
 
+def get_trace_events(pname, pid=1):
+    return obj.get_trace_events(pname, pid)
+
 def prompt_nfound(cmd):
     return obj.prompt_nfound(cmd)
 
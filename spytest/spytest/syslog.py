@@ -8,6 +8,16 @@ import utilities.common as utils
 config = None
 levels = ['emerg', 'alert', 'crit', 'err', 'warning', 'notice', 'info', 'debug', 'none']
 
+# the alternatives are tried in order so the first one matching wins
+_chars = r"[a-zA-Z0-9-_/\.]+"
+_module_cre = re.compile(r"^\s*(?:" + "|".join([
+    r"(?P<m1>{0}#{0}):*\s(?P<t1>.*)",
+    r"(?P<m2>{0}#{0}\[\d+\]):*\s(?P<t2>.*)",
+    r"(?P<m3>{0}\[\d+\]):\s*(?P<t3>.*)",
+    r"(?P<m4>{0}):\s*(?P<t4>.*)"]).format(_chars) + ")")
+_level_cres = dict()
+_match_cres = dict()
+
 def get_config():
     global config
     if config: return config
@@ -20,48 +30,51 @@ def get_config():
     for color in ["yellow", "green", "red"]:
         if color not in data:
             data[color] = []
+        data[color] = [re.compile(regex) for regex in data[color]]
+    config = data
     return data
 
+def _get_level_cre(lvl):
+    if lvl not in _level_cres:
+        index = levels.index(lvl)
+        needed = "|".join(levels[:index+1])
+        regex = r"^(\S+\s+\d+\s+\d+:\d+:\d+(\.\d+){{0,1}}(\s+\d+){{0,1}})\s+(\S+)\s+({})\s+(.*)"
+        _level_cres[lvl] = re.compile(regex.format(needed.upper()))
+    return _level_cres[lvl]
+
 def match(lvl, line):
-    index = levels.index(lvl)
-    needed = "|".join(levels[:index + 1])
-    regex = r"^\S+\s+\d+\s+\d+:\d+:\d+(\.\d+){{0,1}}\s+\S+\s+({})\s+"
-    cre = re.compile(regex.format(needed.upper()))
-    return cre.search(line)
+    if lvl not in _match_cres:
+        index = levels.index(lvl)
+        needed = "|".join(levels[:index + 1])
+        regex = r"^\S+\s+\d+\s+\d+:\d+:\d+(\.\d+){{0,1}}\s+\S+\s+({})\s+"
+        _match_cres[lvl] = re.compile(regex.format(needed.upper()))
+    return _match_cres[lvl].search(line)
+
+def _parse_line(cre, line, dut_name, msgtype):
+    rv = cre.search(line)
+    if not rv: return None
+    msg = rv.group(6)
+    entry = [dut_name, msgtype, rv.group(1), rv.group(4), rv.group(5), msg]
+    rv = _module_cre.search(msg)
+    if rv:
+        for index in range(1, 5):
+            module = rv.group("m{}".format(index))
+            if module is not None:
+                entry.append(module) #module
+                entry.append(rv.group("t{}".format(index))) #message
+                break
+    else:
+        entry.append("") #module
+        entry.append(msg) #message
+    return entry
 
 def parse(lvl, msgtype, dut_name, output, filemode=False):
     entries = []
     if lvl in levels:
-        index = levels.index(lvl)
-        needed = "|".join(levels[:index+1])
-        regex = r"^(\S+\s+\d+\s+\d+:\d+:\d+(\.\d+){{0,1}}(\s+\d+){{0,1}})\s+(\S+)\s+({})\s+(.*)"
-        cre = re.compile(regex.format(needed.upper()))
-        cre_list = []
-        chars = r"[a-zA-Z0-9-_/\.]+"
-        cre_list.append(re.compile(r"^\s*({0}#{0}):*\s(.*)".format(chars)))
-        cre_list.append(re.compile(r"^\s*({0}#{0}\[\d+\]):*\s(.*)".format(chars)))
-        cre_list.append(re.compile(r"^\s*({0}\[\d+\]):\s*(.*)".format(chars)))
-        cre_list.append(re.compile(r"^\s*({0}):\s*(.*)".format(chars)))
+        cre = _get_level_cre(lvl)
         for line in output.split("\n"):
-            rv = cre.search(line)
-            if not rv: continue
-            entry = [dut_name, msgtype]
-            entry.append(rv.group(1)) #date
-            entry.append(rv.group(4)) #host
-            entry.append(rv.group(5)) #level
-            msg = rv.group(6)
-            entry.append(msg) #message
-            rv = None
-            for cre2 in cre_list:
-                rv = cre2.search(msg)
-                if rv:
-                    entry.append(rv.group(1)) #module
-                    entry.append(rv.group(2)) #message
-                    break
-            if not rv:
-                entry.append("") #module
-                entry.append(msg) #message
-            entries.append(entry)
+            entry = _parse_line(cre, line, dut_name, msgtype)
+            if entry: entries.append(entry)
 
     if filemode and lvl != "none":
         val = random.randint(1, 1000)
@@ -84,7 +97,7 @@ def store(prev, current):
 
         # find green syslogs to discard
         for regex in cfg["green"]:
-            if re.compile(regex).match(entry[offset]):
+            if regex.match(entry[offset]):
                 gmatch = regex
                 break
         if gmatch is not None:
@@ -92,7 +105,7 @@ def store(prev, current):
 
         # find yellow syslogs to report only once
         for regex in cfg["yellow"]:
-            if re.compile(regex).match(entry[offset]):
+            if regex.match(entry[offset]):
                 ymatch = regex
                 break
 
@@ -112,7 +125,7 @@ def store(prev, current):
 
         # check if red syslog to report SW Issue
         for regex in cfg["red"]:
-            if re.compile(regex).match(entry[offset]):
+            if regex.match(entry[offset]):
                 rmatch = " ".join(entry)
                 break
 
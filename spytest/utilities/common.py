@@ -3,6 +3,7 @@ import re
 import sys
 import csv
 import glob
+import gzip
 import base64
 import random
 import socket
@@ -15,6 +16,7 @@ import datetime
 import fnmatch
 import subprocess
 import inspect
+from io import BytesIO
 from collections import OrderedDict
 
 import yaml
@@ -316,9 +318,17 @@ def str_decode(s):
         return rv
     return s
 
-def b64encode(file_path):
-    fh = open_file(file_path)
-    text = str_encode(fh.read())
+def b64encode(file_path, compress=False):
+    if compress:
+        with open(file_path, "rb") as fh:
+            data = fh.read()
+        buf = BytesIO()
+        with gzip.GzipFile(fileobj=buf, mode="wb") as gz:
+            gz.write(data)
+        text = buf.getvalue()
+    else:
+        fh = open_file(file_path)
+        text = str_encode(fh.read())
     encoded_data = base64.b64encode(text)
     encoded_data = str_decode(encoded_data)
     retval = []
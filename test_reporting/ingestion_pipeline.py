@@ -0,0 +1,200 @@
+"""Batched ingestion of test report data into a back-end data store.
+
+Records are buffered per table and written to gzip-compressed files with one JSON record per
+line, which is valid for both the JSON and the MULTIJSON ingestion formats. When the records
+buffered for a table reach the batch size, the batch is handed to a bounded pool of workers
+that ingest it through an IngestionBackend, retrying on failure.
+"""
+import glob
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+DEFAULT_BATCH_SIZE = 64 * 1024 * 1024  # 64MB of uncompressed JSON
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_INTERVAL = 1.0  # seconds, doubled after every retry
+
+BATCH_FILE_SUFFIX = ".json.gz"
+
+
+class IngestionBackend(ABC):
+    """IngestionBackend ingests batch files into the tables of a data store.
+
+    Backends are called from the workers of an IngestionPipeline, so they must be thread-safe.
+    """
+
+    @abstractmethod
+    def ingest(self, table: str, batch_file: str, raw_size: int) -> None:
+        """Ingest a batch file into a table.
+
+        Args:
+            table: The table to ingest the batch into.
+            batch_file: A gzip-compressed file containing one JSON record per line. The file is
+                removed once the call returns.
+            raw_size: The uncompressed size of the batch file.
+        """
+        pass
+
+
+class FileSinkBackend(IngestionBackend):
+    """FileSinkBackend stores batch files in a local directory instead of a data store.
+
+    It can be used to test and benchmark uploads without a Kusto endpoint.
+    """
+
+    def __init__(self, directory: str, latency: float = 0.0):
+        """Initialize a file sink backend.
+
+        Args:
+            directory: The directory to store the batch files in, one sub-directory per table.
+            latency: Seconds every ingestion takes, to mimic the round trip to a data store.
+        """
+        self.directory = directory
+        self.latency = latency
+        self.ingestion_count = 0
+        self._lock = threading.Lock()
+
+    def ingest(self, table: str, batch_file: str, raw_size: int) -> None:
+        time.sleep(self.latency)
+
+        table_directory = os.path.join(self.directory, table)
+        os.makedirs(table_directory, exist_ok=True)
+        shutil.copyfile(batch_file, os.path.join(table_directory, str(uuid.uuid4()) + BATCH_FILE_SUFFIX))
+
+        with self._lock:
+            self.ingestion_count += 1
+
+    def read_records(self, table: str) -> List[Dict]:
+        """Return the records ingested into a table."""
+        records = []
+        for batch_file in glob.glob(os.path.join(self.directory, table, "*" + BATCH_FILE_SUFFIX)):
+            records.extend(read_batch_file(batch_file))
+
+        return records
+
+
+class IngestionPipeline:
+    """IngestionPipeline buffers records per table and ingests them in compressed batches."""
+
+    def __init__(self,
+                 backend: IngestionBackend,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 retries: int = DEFAULT_RETRIES,
+                 retry_interval: float = DEFAULT_RETRY_INTERVAL):
+        """Initialize an ingestion pipeline.
+
+        Args:
+            backend: The backend to ingest the batches with.
+            batch_size: The uncompressed size of the records buffered for a table before they are
+                ingested as a batch.
+            max_workers: The number of batches ingested concurrently. At most twice as many
+                batches are pending, adding records blocks until one of them is ingested.
+            retries: The number of times the ingestion of a batch is retried.
+            retry_interval: Seconds to wait before the first retry.
+        """
+        self.backend = backend
+        self.batch_size = batch_size
+        self.retries = retries
+        self.retry_interval = retry_interval
+
+        self._buffers = {}
+        self._buffer_sizes = {}
+        self._futures = []
+        self._pending = threading.BoundedSemaphore(max_workers * 2)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def add(self, table: str, record: Dict) -> None:
+        """Buffer a record of a table, the batch is ingested once it reaches the batch size."""
+        line = json.dumps(record).encode("utf-8") + b"\n"
+        self._buffers.setdefault(table, []).append(line)
+        self._buffer_sizes[table] = self._buffer_sizes.get(table, 0) + len(line)
+
+        if self._buffer_sizes[table] >= self.batch_size:
+            self._submit(table)
+
+    def flush(self) -> None:
+        """Ingest the buffered records of every table and wait until all batches are ingested.
+
+        Raises:
+            The error of the first batch that could not be ingested after all retries.
+        """
+        for table in list(self._buffers):
+            self._submit(table)
+
+        futures, self._futures = self._futures, []
+        errors = [future.exception() for future in futures]
+        for error in errors:
+            if error:
+                raise error
+
+    def close(self) -> None:
+        """Flush the pipeline and stop its workers."""
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _submit(self, table: str) -> None:
+        lines = self._buffers.pop(table, None)
+        raw_size = self._buffer_sizes.pop(table, 0)
+        if not lines:
+            return
+
+        self._pending.acquire()
+        try:
+            batch_file = self._write_batch(lines)
+        except Exception:
+            self._pending.release()
+            raise
+
+        future = self._executor.submit(self._ingest, table, batch_file, raw_size)
+        future.add_done_callback(lambda _: self._pending.release())
+        self._futures.append(future)
+
+    @staticmethod
+    def _write_batch(lines: List[bytes]) -> str:
+        with tempfile.NamedTemporaryFile(suffix=BATCH_FILE_SUFFIX, delete=False) as f:
+            with gzip.GzipFile(fileobj=f, mode="wb", compresslevel=6) as gz:
+                gz.writelines(lines)
+
+        return f.name
+
+    def _ingest(self, table: str, batch_file: str, raw_size: int) -> None:
+        try:
+            retry_interval = self.retry_interval
+            for attempt in range(self.retries + 1):
+                try:
+                    self.backend.ingest(table, batch_file, raw_size)
+                    return
+                except Exception as e:
+                    if attempt == self.retries:
+                        raise
+
+                    print(f"could not ingest batch into {table}: {e} - retrying in {retry_interval}s")
+                    time.sleep(retry_interval)
+                    retry_interval *= 2
+        finally:
+            os.remove(batch_file)
+
+
+def read_batch_file(batch_file: str) -> List[Dict]:
+    """Return the records of a batch file."""
+    with gzip.open(batch_file, "rt") as f:
+        return [json.loads(line) for line in f]
@@ -28,7 +28,9 @@ import sys
 import os
 
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from xml.etree.ElementTree import Element, SubElement
 
 import defusedxml.ElementTree as ET
 
@@ -38,6 +40,9 @@ TEST_REPORT_CLIENT_VERSION = (1, 1, 0)
 MAXIMUM_XML_SIZE = 20e7  # 20MB
 MAXIMUM_SUMMARY_SIZE = 1024  # 1MB
 
+# Archives with fewer documents than this are validated in the calling process.
+MINIMUM_PARALLEL_DOCUMENTS = 16
+
 # Fields found in the testsuite/root section of the JUnit XML file.
 TESTSUITE_TAG = "testsuite"
 REQUIRED_TESTSUITE_ATTRIBUTES = {
@@ -73,6 +78,7 @@ REQUIRED_TESTCASE_ATTRIBUTES = [
     "time",
 ]
 REQUIRED_TESTCASE_JSON_FIELDS = ["result", "error", "summary"]
+TESTCASE_RESULT_TAGS = ["failure", "error", "skipped"]
 
 
 class JUnitXMLValidationError(Exception):
@@ -121,29 +127,73 @@ def validate_junit_xml_file(document_name):
     Raises:
         JUnitXMLValidationError: if any of the following are true:
             - The provided file doesn't exist
-            - The provided file exceeds 10MB
             - The provided file is unparseable
             - The provided file is missing required fields
     """
     if not os.path.exists(document_name) or not os.path.isfile(document_name):
         raise JUnitXMLValidationError("file not found")
 
-    if os.path.getsize(document_name) > MAXIMUM_XML_SIZE:
-        raise JUnitXMLValidationError("provided file is too large")
-
     try:
-        tree = ET.parse(document_name, forbid_dtd=True)
+        root = _iterparse_junit_xml(document_name)
     except Exception as e:
         raise JUnitXMLValidationError(f"could not parse {document_name}: {e}") from e
 
-    return _validate_junit_xml(tree.getroot())
+    return _validate_junit_xml(root)
+
 
+def _iterparse_junit_xml(source):
+    """Parse a JUnit XML document incrementally.
+
+    Only the parts of the document that are validated and parsed are kept: the root attributes,
+    the properties and, for every test case, its attributes and result tags without their text
+    (e.g. stack traces). Every other element is discarded as soon as it has been read, so the
+    memory used does not depend on the size of the document.
+
+    Args:
+        source: A file name or file object containing an XML document.
+
+    Returns:
+        The root of the reduced XML document.
+    """
+    root = None
+    reduced_root = None
+    depth = 0
+    for event, element in ET.iterparse(source, events=("start", "end"), forbid_dtd=True):
+        if event == "start":
+            depth += 1
+            if depth == 1:
+                root = element
+                reduced_root = Element(element.tag, element.attrib)
+            continue
+
+        depth -= 1
+        if depth != 1:
+            continue
 
-def validate_junit_xml_archive(directory_name, strict=False):
+        if element.tag == TESTCASE_TAG:
+            test_case = SubElement(reduced_root, TESTCASE_TAG, element.attrib)
+            for child in element:
+                if child.tag in TESTCASE_RESULT_TAGS:
+                    SubElement(test_case, child.tag, child.attrib)
+        elif element.tag == METADATA_TAG:
+            reduced_root.append(element)
+
+        # Top-level elements end one at a time, so this is always the only child of the root.
+        root.remove(element)
+
+    return reduced_root
+
+
+def validate_junit_xml_archive(directory_name, strict=False, max_workers=None):
     """Validate that an XML archive contains valid JUnit XML.
 
+    The documents are validated in a pool of processes, unless the archive is small.
+
     Args:
         directory_name: The name of the directory containing XML documents.
+        strict: Fail if any of the documents is invalid instead of skipping it.
+        max_workers: The number of processes used to validate the documents, defaults to the
+            number of CPUs. 1 validates the documents in the calling process.
 
     Returns:
         A list of roots of validated XML documents.
@@ -151,7 +201,6 @@ def validate_junit_xml_archive(directory_name, strict=False):
     Raises:
         JUnitXMLValidationError: if any of the following are true:
             - The provided directory doesn't exist
-            - The provided files exceed 10MB
             - Any of the provided files are unparseable
             - Any of the provided files are missing required fields
     """
@@ -164,18 +213,19 @@ def validate_junit_xml_archive(directory_name, strict=False):
     doc_list = glob.glob(os.path.join(directory_name, "tr.xml"))
     doc_list += glob.glob(os.path.join(directory_name, "*test*.xml"))
     doc_list += glob.glob(os.path.join(directory_name, "**", "*test*.xml"), recursive=True)
-    doc_list = set(doc_list)
-
-    total_size = 0
-    for document in doc_list:
-        total_size += os.path.getsize(document)
+    doc_list = sorted(set(doc_list))
 
-    if total_size > MAXIMUM_XML_SIZE:
-        raise JUnitXMLValidationError("provided directory is too large")
+    if max_workers == 1 or len(doc_list) < MINIMUM_PARALLEL_DOCUMENTS:
+        results = map(_validate_archive_document, doc_list)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_validate_archive_document, doc_list, chunksize=8))
 
-    for document in doc_list:
+    for document, (root, error) in zip(doc_list, results):
         try:
-            root = validate_junit_xml_file(document)
+            if error:
+                raise error
+
             root_metadata = {k: v for k, v in _parse_test_metadata(root).items()
                              if k in REQUIRED_METADATA_PROPERTIES and k != "timestamp"}
 
@@ -204,6 +254,14 @@ def validate_junit_xml_archive(directory_name, strict=False):
     return roots
 
 
+def _validate_archive_document(document):
+    """Validate a document of an archive, errors are returned so that they can be reported in order."""
+    try:
+        return validate_junit_xml_file(document), None
+    except Exception as e:
+        return None, e
+
+
 def validate_junit_xml_path(path, strict=False):
     if os.path.isfile(path):
         roots = [validate_junit_xml_file(path)]
@@ -298,18 +356,85 @@ def parse_test_result(roots):
         A dict containing the parsed test result.
     """
     test_result_json = defaultdict(dict)
+    test_case_columns = ColumnarTestCases()
 
     for root in roots:
         test_result_json["test_metadata"] = _update_test_metadata(test_result_json["test_metadata"],
                                                                   _parse_test_metadata(root))
-        test_cases = _parse_test_cases(root)
-        test_result_json["test_cases"] = _update_test_cases(test_result_json["test_cases"], test_cases)
+        test_cases = _parse_test_case_columns(root)
+        test_case_columns.extend(test_cases)
         test_result_json["test_summary"] = _update_test_summary(test_result_json["test_summary"],
-                                                                _extract_test_summary(test_cases))
+                                                                test_cases.summary())
+
+    test_result_json["test_cases"] = test_case_columns.to_dict()
 
     return test_result_json
 
 
+class ColumnarTestCases:
+    """Test cases grouped by feature, with one list of values per test case field.
+
+    Test cases of many documents are merged by extending the lists, and only turned back
+    into one dict per test case once all of them have been merged.
+    """
+
+    FIELDS = REQUIRED_TESTCASE_ATTRIBUTES + REQUIRED_TESTCASE_JSON_FIELDS
+
+    def __init__(self):
+        self.features = {}
+
+    def _columns(self, feature):
+        if feature not in self.features:
+            self.features[feature] = {field: [] for field in self.FIELDS}
+
+        return self.features[feature]
+
+    def append(self, feature, values):
+        """Add a test case of a feature, given its values of FIELDS."""
+        columns = self._columns(feature)
+        for field, value in zip(self.FIELDS, values):
+            columns[field].append(value)
+
+    def extend(self, other):
+        """Add the test cases of another ColumnarTestCases."""
+        for feature, other_columns in other.features.items():
+            columns = self._columns(feature)
+            for field in self.FIELDS:
+                columns[field].extend(other_columns[field])
+
+    def __len__(self):
+        return sum(len(columns["name"]) for columns in self.features.values())
+
+    def summary(self):
+        """Return the test summary of the test cases."""
+        if not self.features:
+            return {}
+
+        failures = skipped = errors = 0
+        time = 0
+        for columns in self.features.values():
+            results = columns["result"]
+            failures += results.count("failure") + results.count("error")
+            skipped += results.count("skipped")
+            errors += sum(columns["error"])
+            time = sum(map(float, columns["time"]), time)
+
+        return {
+            "tests": str(len(self)),
+            "failures": str(failures),
+            "skipped": str(skipped),
+            "errors": str(errors),
+            "time": str(time),
+        }
+
+    def to_dict(self):
+        """Return the test cases as lists of test case dicts per feature."""
+        return {
+            feature: [dict(zip(self.FIELDS, values)) for values in zip(*(columns[field] for field in self.FIELDS))]
+            for feature, columns in self.features.items()
+        }
+
+
 def _parse_test_summary(root):
     test_result_summary = {}
     for attribute, _ in REQUIRED_TESTSUITE_ATTRIBUTES:
@@ -318,20 +443,6 @@ def _parse_test_summary(root):
     return test_result_summary
 
 
-def _extract_test_summary(test_cases):
-    test_result_summary = defaultdict(int)
-    for _, cases in test_cases.items():
-        for case in cases:
-            test_result_summary["tests"] += 1
-            test_result_summary["failures"] += case["result"] == "failure" or case["result"] == "error"
-            test_result_summary["skipped"] += case["result"] == "skipped"
-            test_result_summary["errors"] += case["error"]
-            test_result_summary["time"] += float(case["time"])
-
-    test_result_summary = {k: str(v) for k, v in test_result_summary.items()}
-    return test_result_summary
-
-
 def _parse_test_metadata(root):
     properties_element = root.find(METADATA_TAG)
 
@@ -347,52 +458,54 @@ def _parse_test_metadata(root):
 
 
 def _parse_test_cases(root):
-    test_case_results = defaultdict(list)
-
-    def _parse_test_case(test_case):
-        result = {}
-
-        # FIXME: This is specific to pytest, needs to be extended to support spytest.
-        test_class_tokens = test_case.get("classname").split(".")
-        feature = test_class_tokens[0]
-
-        for attribute in REQUIRED_TESTCASE_ATTRIBUTES:
-            result[attribute] = test_case.get(attribute)
-
-        # NOTE: "if failure" and "if error" does not work with the ETree library.
-        failure = test_case.find("failure")
-        error = test_case.find("error")
-        skipped = test_case.find("skipped")
-
-        # NOTE: "error" is unique in that it can occur alongside a succesful, failed, or skipped test result.
-        # Because of this, we track errors separately so that the error can be correlated with the stage it
-        # occurred.
-        #
-        # If there is *only* an error tag we note that as well, as this indicates that the framework
-        # errored out during setup or teardown.
-        if failure is not None:
-            result["result"] = "failure"
-            summary = failure.get("message", "")
-        elif skipped is not None:
-            result["result"] = "skipped"
-            summary = skipped.get("message", "")
-        elif error is not None:
-            result["result"] = "error"
-            summary = error.get("message", "")
-        else:
-            result["result"] = "success"
-            summary = ""
-
-        result["summary"] = summary[:min(len(summary), MAXIMUM_SUMMARY_SIZE)]
-        result["error"] = error is not None
-
-        return feature, result
+    return _parse_test_case_columns(root).to_dict()
+
+
+def _parse_test_case_columns(root):
+    test_case_columns = ColumnarTestCases()
+
+    for test_case in root.iterfind(TESTCASE_TAG):
+        test_case_columns.append(*_parse_test_case(test_case))
+
+    return test_case_columns
+
+
+def _parse_test_case(test_case):
+    """Return the feature of a test case and its values of ColumnarTestCases.FIELDS."""
+    # FIXME: This is specific to pytest, needs to be extended to support spytest.
+    test_class_tokens = test_case.get("classname").split(".")
+    feature = test_class_tokens[0]
+
+    values = [test_case.get(attribute) for attribute in REQUIRED_TESTCASE_ATTRIBUTES]
+
+    # NOTE: "if failure" and "if error" does not work with the ETree library.
+    failure = test_case.find("failure")
+    error = test_case.find("error")
+    skipped = test_case.find("skipped")
+
+    # NOTE: "error" is unique in that it can occur alongside a succesful, failed, or skipped test result.
+    # Because of this, we track errors separately so that the error can be correlated with the stage it
+    # occurred.
+    #
+    # If there is *only* an error tag we note that as well, as this indicates that the framework
+    # errored out during setup or teardown.
+    if failure is not None:
+        result = "failure"
+        summary = failure.get("message", "")
+    elif skipped is not None:
+        result = "skipped"
+        summary = skipped.get("message", "")
+    elif error is not None:
+        result = "error"
+        summary = error.get("message", "")
+    else:
+        result = "success"
+        summary = ""
 
-    for test_case in root.findall("testcase"):
-        feature, result = _parse_test_case(test_case)
-        test_case_results[feature].append(result)
+    # In the order of REQUIRED_TESTCASE_JSON_FIELDS
+    values += [result, error is not None, summary[:min(len(summary), MAXIMUM_SUMMARY_SIZE)]]
 
-    return dict(test_case_results)
+    return feature, values
 
 
 def _update_test_summary(current, update):
@@ -428,21 +541,6 @@ def _update_test_metadata(current, update):
     return new_metadata
 
 
-def _update_test_cases(current, update):
-    if not current:
-        return update.copy()
-
-    new_cases = current.copy()
-    for group, cases in update.items():
-        updated_cases = cases.copy()
-        if group in new_cases:
-            updated_cases += new_cases[group]
-
-        new_cases[group] = updated_cases
-
-    return new_cases
-
-
 def validate_junit_json_file(path):
     """Validate that a JSON file is a valid test report.
 
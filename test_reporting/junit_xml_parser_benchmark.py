@@ -0,0 +1,140 @@
+"""Benchmark validation and parsing of a JUnit XML archive.
+
+An archive of N JUnit XML files (500 by default) is generated, and validated and parsed:
+    - dom: every file parsed into a full tree, one after another, and test cases merged by list
+      concatenation (the previous behaviour)
+    - stream: every file parsed with iterparse, one after another
+    - parallel: every file parsed with iterparse in a pool of processes
+
+Every mode runs in a new process, its peak memory (maxrss) excludes the pool processes.
+
+CLI Usage:
+% python3 junit_xml_parser_benchmark.py [-n FILES] [-t TEST_CASES] [-w WORKERS]
+"""
+import argparse
+import glob
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import defusedxml.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from test_reporting import junit_xml_parser  # noqa: E402
+
+FEATURES = ["acl", "bgp", "everflow", "pfcwd", "qos", "snmp", "vlan", "vxlan"]
+
+PROPERTIES = """    <properties>
+        <property name="topology" value="t0"/>
+        <property name="timestamp" value="2020-09-14 18:24:19.675190" />
+        <property name="testbed" value="vms-kvm-t0" />
+        <property name="host" value="vlab-01"/>
+        <property name="asic" value="vs"/>
+        <property name="platform" value="x86_64-kvm_x86_64-r0"/>
+        <property name="hwsku" value="Force10-S6000"/>
+        <property name="os_version" value="master.449-9c22d19b"/>
+    </properties>
+"""
+
+
+def write_archive(directory, files, test_cases):
+    for index in range(files):
+        feature = FEATURES[index % len(FEATURES)]
+        cases = []
+        for case in range(test_cases):
+            attributes = (f'classname="{feature}.test_{feature}_{index}" file="{feature}/test_{feature}_{index}.py" '
+                          f'line="{case * 10}" name="test_{case}" time="1.5"')
+            if case % 10 == 0:
+                trace = "    assert something\nE   AssertionError: it went wrong\n" * 50
+                output = "some test output\n" * 50
+                cases.append(f'    <testcase {attributes}>\n        <failure message="it went wrong">{trace}</failure>\n'
+                             f'        <system-out>{output}</system-out>\n    </testcase>\n')
+            else:
+                cases.append(f"    <testcase {attributes} />\n")
+
+        with open(os.path.join(directory, f"test_{index:04d}.xml"), "w") as f:
+            f.write(f'<?xml version="1.0" encoding="utf-8"?>\n<testsuite errors="0" failures="{test_cases // 10}" '
+                    f'name="pytest" skipped="0" tests="{test_cases}" time="{test_cases * 1.5}">\n')
+            f.write(PROPERTIES)
+            f.writelines(cases)
+            f.write("</testsuite>\n")
+
+
+def dom_validate_and_parse(directory):
+    """Validate and parse the archive the way junit_xml_parser did before streaming and columns."""
+    roots = []
+    for document in sorted(glob.glob(os.path.join(directory, "*test*.xml"))):
+        roots.append(junit_xml_parser._validate_junit_xml(ET.parse(document, forbid_dtd=True).getroot()))
+
+    test_result_json = defaultdict(dict)
+    for root in roots:
+        test_result_json["test_metadata"] = junit_xml_parser._update_test_metadata(
+            test_result_json["test_metadata"], junit_xml_parser._parse_test_metadata(root))
+
+        test_cases = junit_xml_parser._parse_test_cases(root)
+        summary = defaultdict(int)
+        for group, cases in test_cases.items():
+            test_result_json["test_cases"][group] = cases.copy() + test_result_json["test_cases"].get(group, [])
+            for case in cases:
+                summary["tests"] += 1
+                summary["failures"] += case["result"] == "failure" or case["result"] == "error"
+                summary["skipped"] += case["result"] == "skipped"
+                summary["errors"] += case["error"]
+                summary["time"] += float(case["time"])
+        test_result_json["test_summary"] = junit_xml_parser._update_test_summary(
+            test_result_json["test_summary"], {k: str(v) for k, v in summary.items()})
+
+    return test_result_json
+
+
+def stream_validate_and_parse(directory, max_workers):
+    roots = junit_xml_parser.validate_junit_xml_archive(directory, max_workers=max_workers)
+    return junit_xml_parser.parse_test_result(roots)
+
+
+def run(mode, directory, max_workers):
+    """Run a mode, in a process of its own so that its peak memory is measured alone."""
+    start = time.time()
+    if mode == "dom":
+        test_result_json = dom_validate_and_parse(directory)
+    else:
+        test_result_json = stream_validate_and_parse(directory, 1 if mode == "stream" else max_workers)
+    elapsed = time.time() - start
+    cases = sum(len(c) for c in test_result_json["test_cases"].values())
+    return elapsed, cases, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark validation and parsing of a JUnit XML archive.")
+    parser.add_argument("-n", "--files", type=int, default=500, help="JUnit XML files (default: 500)")
+    parser.add_argument("-t", "--test-cases", type=int, default=200, help="test cases per file (default: 200)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="processes (default: number of CPUs)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        write_archive(directory, args.files, args.test_cases)
+        size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+        print(f"{args.files} files, {args.files * args.test_cases} test cases, {size / 1e6:.1f}MB")
+
+        base = None
+        print(f"{'mode':<10} {'time(ms)':>10} {'speedup':>8} {'maxrss(MB)':>11}")
+        for mode in ("dom", "stream", "parallel"):
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                elapsed, cases, maxrss = executor.submit(run, mode, directory, args.workers).result()
+            base = base or elapsed
+            assert cases == args.files * args.test_cases, f"{mode}: {cases} test cases parsed"
+            print(f"{mode:<10} {elapsed * 1000:>10.0f} {base / elapsed:>7.1f}x {maxrss / 1024:>11.0f}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
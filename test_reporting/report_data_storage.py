@@ -1,7 +1,5 @@
 """Wrappers and utilities for storing test reports."""
-import json
 import os
-import tempfile
 import uuid
 
 from abc import ABC, abstractmethod
@@ -14,10 +12,18 @@ except ImportError:
 
 from azure.kusto.ingest import IngestionProperties
 from azure.kusto.ingest import DataFormat
+from azure.kusto.ingest import FileDescriptor
 
 from datetime import datetime
 from typing import Dict, List
 
+from ingestion_pipeline import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MAX_WORKERS,
+    IngestionBackend,
+    IngestionPipeline
+)
+
 
 class ReportDBConnector(ABC):
     """ReportDBConnector is a wrapper for a back-end data store for JUnit test reports.
@@ -58,6 +64,35 @@ class ReportDBConnector(ABC):
             pdu_status_output: A list of PDU status results from devutils.
         """
 
+    @abstractmethod
+    def flush(self) -> None:
+        """Wait until all uploaded data has been stored in the back-end data store."""
+        pass
+
+
+class KustoIngestionBackend(IngestionBackend):
+    """KustoIngestionBackend ingests batch files into the tables of a Kusto database."""
+
+    def __init__(self, ingestion_client: KustoIngestClient, db_name: str):
+        """Initialize a Kusto ingestion backend.
+
+        Args:
+            ingestion_client: The client to ingest the batch files with.
+            db_name: The Kusto database to ingest into.
+        """
+        self._ingestion_client = ingestion_client
+        self.db_name = db_name
+
+    def ingest(self, table: str, batch_file: str, raw_size: int) -> None:
+        props = IngestionProperties(
+            database=self.db_name,
+            table=table,
+            data_format=KustoConnector.TABLE_FORMAT_LOOKUP[table],
+            ingestion_mapping_reference=KustoConnector.TABLE_MAPPING_LOOKUP[table]
+        )
+
+        self._ingestion_client.ingest_from_file(FileDescriptor(batch_file, raw_size), ingestion_properties=props)
+
 
 class KustoConnector(ReportDBConnector):
     """KustoReportDB is a wrapper for storing test reports in Kusto/Azure Data Explorer."""
@@ -84,14 +119,35 @@ class KustoConnector(ReportDBConnector):
         RAW_PDU_STATUS_TABLE: "RawPduStatusMapping"
     }
 
-    def __init__(self, db_name: str):
+    # Rows (e.g. test cases) of the raw tables are uploaded in records of up to this many rows.
+    RAW_RECORD_ROWS = 1000
+
+    def __init__(self,
+                 db_name: str,
+                 backend: IngestionBackend = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_workers: int = DEFAULT_MAX_WORKERS):
         """Initialize a Kusto report DB connector.
 
+        Uploaded data is buffered, and ingested in batches once the batch size is reached and
+        when flush is called.
+
         Args:
             db_name: The Kusto database to connect to.
+            backend: The backend to ingest data with, defaults to the Kusto cluster in the
+                environment. A FileSinkBackend can be used to upload without a Kusto cluster.
+            batch_size: The uncompressed size of the data buffered for a table before it is ingested.
+            max_workers: The number of batches ingested concurrently.
         """
         self.db_name = db_name
 
+        if backend is None:
+            backend = KustoIngestionBackend(self._create_ingestion_client(), db_name)
+
+        self._pipeline = IngestionPipeline(backend, batch_size, max_workers)
+
+    @staticmethod
+    def _create_ingestion_client():
         ingest_cluster = os.getenv("TEST_REPORT_INGEST_KUSTO_CLUSTER")
         tenant_id = os.getenv("TEST_REPORT_AAD_TENANT_ID")
         service_id = os.getenv("TEST_REPORT_AAD_CLIENT_ID")
@@ -104,7 +160,7 @@ class KustoConnector(ReportDBConnector):
                                                                                     service_id,
                                                                                     service_key,
                                                                                     tenant_id)
-        self._ingestion_client = KustoIngestClient(kcsb)
+        return KustoIngestClient(kcsb)
 
     def upload_report(self, report_json: Dict, external_tracking_id: str = "") -> None:
         """Upload a report to the back-end data store.
@@ -126,8 +182,7 @@ class KustoConnector(ReportDBConnector):
         for result in ping_output:
             result.update({"Timestamp": ping_time})
 
-        reachability_data = {"data": ping_output}
-        self._ingest_data(self.RAW_REACHABILITY_TABLE, reachability_data)
+        self._ingest_rows(self.RAW_REACHABILITY_TABLE, "data", ping_output)
 
     def upload_pdu_status_data(self, pdu_status_output: List) -> None:
         time = str(datetime.utcnow())
@@ -142,8 +197,10 @@ class KustoConnector(ReportDBConnector):
                 status.update({"Timestamp": time, "Host": result["Host"], "data_present": True})
                 pdu_output.append(status)
 
-        pdu_status_data = {"data": pdu_output}
-        self._ingest_data(self.RAW_PDU_STATUS_TABLE, pdu_status_data)
+        self._ingest_rows(self.RAW_PDU_STATUS_TABLE, "data", pdu_output)
+
+    def flush(self) -> None:
+        self._pipeline.flush()
 
     def _upload_metadata(self, report_json, external_tracking_id, report_guid):
         metadata = {
@@ -172,19 +229,14 @@ class KustoConnector(ReportDBConnector):
                     "feature": feature
                 })
                 test_cases.append(case)
-        test_cases = {"cases": test_cases}
 
-        self._ingest_data(self.RAW_CASE_TABLE, test_cases)
+        self._ingest_rows(self.RAW_CASE_TABLE, "cases", test_cases)
 
-    def _ingest_data(self, table, data):
-        props = IngestionProperties(
-            database=self.db_name,
-            table=table,
-            data_format=self.TABLE_FORMAT_LOOKUP[table],
-            ingestion_mapping_reference=self.TABLE_MAPPING_LOOKUP[table]
-        )
+    def _ingest_rows(self, table, key, rows):
+        # The raw tables are expanded from the rows under key by an update policy, so the rows can be
+        # split into several records.
+        for start in range(0, max(len(rows), 1), self.RAW_RECORD_ROWS):
+            self._ingest_data(table, {key: rows[start:start + self.RAW_RECORD_ROWS]})
 
-        with tempfile.NamedTemporaryFile(mode="w+") as temp:
-            temp.write(json.dumps(data))
-            temp.seek(0)
-            self._ingestion_client.ingest_from_file(temp.name, ingestion_properties=props)
+    def _ingest_data(self, table, data):
+        self._pipeline.add(table, data)
@@ -63,6 +63,8 @@ python3 report_uploader.py tests/files/sample_tr.xml -e TRACKING_ID#22
         print('Unknown category "{}"'.format(args.category))
         sys.exit(1)
 
+    kusto_db.flush()
+
 
 if __name__ == "__main__":
     _run_script()
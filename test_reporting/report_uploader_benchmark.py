@@ -0,0 +1,114 @@
+"""Benchmark uploading test reports with KustoConnector, without a Kusto cluster.
+
+N test reports (100 by default) of M test cases are uploaded to a FileSinkBackend, which
+takes LATENCY ms (200 by default) for every ingestion, like a queued Kusto ingestion:
+    - unbatched: one uncompressed file ingested synchronously per table per report (the
+      previous behaviour)
+    - batched: rows buffered per table, and ingested in compressed batches by a pool of workers
+
+CLI Usage:
+% python3 report_uploader_benchmark.py [-n REPORTS] [-t TEST_CASES] [-l LATENCY_MS] [-w WORKERS]
+"""
+import argparse
+import copy
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from ingestion_pipeline import FileSinkBackend
+from report_data_storage import KustoConnector
+
+FEATURES = ["acl", "bgp", "everflow", "pfcwd", "qos", "snmp", "vlan", "vxlan"]
+
+METADATA = {
+    "topology": "t0",
+    "testbed": "vms-kvm-t0",
+    "timestamp": "2020-09-14 18:24:19.675190",
+    "host": "vlab-01",
+    "asic": "vs",
+    "platform": "x86_64-kvm_x86_64-r0",
+    "hwsku": "Force10-S6000",
+    "os_version": "master.449-9c22d19b",
+}
+
+
+class UnbatchedKustoConnector(KustoConnector):
+    """Ingest every upload synchronously in its own file, the way KustoConnector used to."""
+
+    def __init__(self, db_name, backend):
+        super().__init__(db_name, backend)
+        self._backend = backend
+
+    def _ingest_rows(self, table, key, rows):
+        self._ingest_data(table, {key: rows})
+
+    def _ingest_data(self, table, data):
+        with tempfile.NamedTemporaryFile(mode="w+") as temp:
+            temp.write(json.dumps(data))
+            temp.seek(0)
+            self._backend.ingest(table, temp.name, os.path.getsize(temp.name))
+
+
+def generate_report(test_cases):
+    cases = {}
+    for i in range(test_cases):
+        feature = FEATURES[i % len(FEATURES)]
+        cases.setdefault(feature, []).append({
+            "classname": f"{feature}.test_{feature}", "file": f"{feature}/test_{feature}.py", "line": str(i),
+            "name": f"test_{i}", "time": "1.5", "result": "success", "error": False, "summary": ""
+        })
+
+    summary = {"tests": str(test_cases), "failures": "0", "skipped": "0", "errors": "0", "time": str(test_cases * 1.5)}
+    return {"test_metadata": METADATA, "test_summary": summary, "test_cases": cases}
+
+
+def upload(connector, reports):
+    start = time.time()
+    for report in reports:
+        connector.upload_report(copy.deepcopy(report), "TRACKING_ID#22")
+    connector.flush()
+    return time.time() - start
+
+
+def sink_size(directory):
+    return sum(os.path.getsize(os.path.join(path, f)) for path, _, files in os.walk(directory) for f in files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark uploading test reports with KustoConnector.")
+    parser.add_argument("-n", "--reports", type=int, default=100, help="test reports (default: 100)")
+    parser.add_argument("-t", "--test-cases", type=int, default=2000, help="test cases per report (default: 2000)")
+    parser.add_argument("-l", "--latency", type=float, default=200, help="ms per ingestion (default: 200)")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="concurrent ingestions (default: 4)")
+    args = parser.parse_args()
+
+    reports = [generate_report(args.test_cases) for _ in range(args.reports)]
+    print(f"{'mode':<10} {'ingestions':>10} {'time(ms)':>10} {'sink(MB)':>9} {'speedup':>8}")
+
+    base = None
+    for mode in ("unbatched", "batched"):
+        directory = tempfile.mkdtemp()
+        try:
+            backend = FileSinkBackend(directory, args.latency / 1000.0)
+            if mode == "unbatched":
+                connector = UnbatchedKustoConnector("SonicTestData", backend)
+            else:
+                connector = KustoConnector("SonicTestData", backend, max_workers=args.workers)
+
+            elapsed = upload(connector, reports)
+            if mode == "batched":
+                records = backend.read_records(KustoConnector.RAW_CASE_TABLE)
+                cases = sum(len(record["cases"]) for record in records)
+                assert cases == args.reports * args.test_cases, f"{cases} test cases ingested"
+
+            base = base or elapsed
+            print(f"{mode:<10} {backend.ingestion_count:>10} {elapsed * 1000:>10.0f} "
+                  f"{sink_size(directory) / 1e6:>9.1f} {base / elapsed:>7.1f}x")
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
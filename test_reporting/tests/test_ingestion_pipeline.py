@@ -0,0 +1,111 @@
+"""Tests for the ingestion pipeline."""
+import os
+import threading
+import time
+import pytest
+
+from test_reporting.ingestion_pipeline import FileSinkBackend, IngestionPipeline, read_batch_file
+
+
+class FlakyBackend(FileSinkBackend):
+    def __init__(self, directory, failures):
+        super().__init__(directory)
+        self.failures = failures
+        self.batch_files = []
+
+    def ingest(self, table, batch_file, raw_size):
+        self.batch_files.append(batch_file)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("ingestion failed")
+
+        super().ingest(table, batch_file, raw_size)
+
+
+class ConcurrencyBackend(FileSinkBackend):
+    def __init__(self, directory):
+        super().__init__(directory, latency=0.01)
+        self.active = 0
+        self.max_active = 0
+        self._active_lock = threading.Lock()
+
+    def ingest(self, table, batch_file, raw_size):
+        with self._active_lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            super().ingest(table, batch_file, raw_size)
+        finally:
+            with self._active_lock:
+                self.active -= 1
+
+
+def records(count, table="RawTestCases"):
+    return [{"table": table, "name": f"test_{i}", "time": str(i * 1.5)} for i in range(count)]
+
+
+def test_records_ingested_per_table(tmp_path):
+    backend = FileSinkBackend(str(tmp_path))
+    with IngestionPipeline(backend) as pipeline:
+        for record in records(10, "RawTestCases") + records(3, "TestReportMetadata"):
+            pipeline.add(record["table"], record)
+
+        assert backend.ingestion_count == 0
+
+    assert backend.ingestion_count == 2
+    assert sorted(backend.read_records("RawTestCases"), key=str) == sorted(records(10, "RawTestCases"), key=str)
+    assert backend.read_records("TestReportMetadata") == records(3, "TestReportMetadata")
+
+
+def test_records_batched_by_size(tmp_path):
+    backend = FileSinkBackend(str(tmp_path))
+    with IngestionPipeline(backend, batch_size=500) as pipeline:
+        for record in records(100):
+            pipeline.add("RawTestCases", record)
+
+    batch_files = os.listdir(os.path.join(str(tmp_path), "RawTestCases"))
+    assert backend.ingestion_count == len(batch_files) > 1
+    for batch_file in batch_files:
+        batch = read_batch_file(os.path.join(str(tmp_path), "RawTestCases", batch_file))
+        assert sum(len(str(record)) for record in batch[:-1]) < 500
+
+    assert sorted(backend.read_records("RawTestCases"), key=str) == sorted(records(100), key=str)
+
+
+def test_flush_waits_for_all_batches(tmp_path):
+    backend = ConcurrencyBackend(str(tmp_path))
+    pipeline = IngestionPipeline(backend, batch_size=1, max_workers=2)
+    for record in records(20):
+        pipeline.add("RawTestCases", record)
+
+    pipeline.flush()
+    assert backend.ingestion_count == 20
+    assert backend.max_active <= 2
+
+    pipeline.add("RawTestCases", records(1)[0])
+    pipeline.close()
+    assert backend.ingestion_count == 21
+
+
+def test_ingestion_retried(tmp_path):
+    backend = FlakyBackend(str(tmp_path), failures=2)
+    with IngestionPipeline(backend, retries=2, retry_interval=0.01) as pipeline:
+        pipeline.add("RawTestCases", records(1)[0])
+
+    assert backend.read_records("RawTestCases") == records(1)
+    assert len(backend.batch_files) == 3
+    assert not any(os.path.exists(batch_file) for batch_file in backend.batch_files)
+
+
+def test_ingestion_failed(tmp_path):
+    backend = FlakyBackend(str(tmp_path), failures=3)
+    pipeline = IngestionPipeline(backend, retries=2, retry_interval=0.01)
+    pipeline.add("RawTestCases", records(1)[0])
+
+    start = time.time()
+    with pytest.raises(RuntimeError, match="ingestion failed"):
+        pipeline.close()
+
+    assert time.time() - start >= 0.03
+    assert backend.read_records("RawTestCases") == []
+    assert not any(os.path.exists(batch_file) for batch_file in backend.batch_files)
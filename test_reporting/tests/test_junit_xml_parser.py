@@ -1,9 +1,12 @@
 """Tests for the JUnit XML parser."""
 import os
+import shutil
 import pytest
 
+from test_reporting import junit_xml_parser
 from test_reporting.junit_xml_parser import validate_junit_xml_stream, validate_junit_xml_file
 from test_reporting.junit_xml_parser import validate_junit_xml_archive, parse_test_result, JUnitXMLValidationError
+from test_reporting.junit_xml_parser import ColumnarTestCases
 
 
 VALID_TEST_RESULT = """<?xml version="1.0" encoding="utf-8"?>
@@ -242,6 +245,67 @@ def test_json_output_from_archive():
     assert ordered(parse_test_result(roots)) == ordered(EXPECTED_JSON_OUTPUT)
 
 
+def test_json_output_from_file_with_test_output(tmp_path):
+    # Stack traces and test output are not kept by the parser
+    test_string = VALID_TEST_RESULT.replace(
+        "this is definitely a stacktrace", "a very long stacktrace\n" * 10000
+    ).replace(
+        "</testsuite>", "<system-out>" + "some output\n" * 10000 + "</system-out></testsuite>"
+    )
+    test_file = tmp_path / "tr.xml"
+    test_file.write_text(test_string)
+
+    root = validate_junit_xml_file(str(test_file))
+    assert not any(test_case.text and test_case.text.strip() for test_case in root.iter())
+    assert ordered(parse_test_result([root])) == ordered(EXPECTED_JSON_OUTPUT)
+
+
+def test_invalid_junit_xml_file(tmp_path):
+    test_file = tmp_path / "tr.xml"
+    test_file.write_text(VALID_TEST_RESULT.replace("classname", "hehe"))
+
+    with pytest.raises(JUnitXMLValidationError, match=".* not found in test case .*"):
+        validate_junit_xml_file(str(test_file))
+
+
+def test_json_output_from_archive_in_parallel(monkeypatch):
+    monkeypatch.setattr(junit_xml_parser, "MINIMUM_PARALLEL_DOCUMENTS", 1)
+    roots = validate_junit_xml_archive(VALID_TEST_RESULT_ARCHIVE, max_workers=2)
+    assert ordered(parse_test_result(roots)) == ordered(EXPECTED_JSON_OUTPUT)
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_archive_with_invalid_file(tmp_path, monkeypatch, max_workers):
+    monkeypatch.setattr(junit_xml_parser, "MINIMUM_PARALLEL_DOCUMENTS", 1)
+    archive = tmp_path / "archive"
+    shutil.copytree(VALID_TEST_RESULT_ARCHIVE, str(archive))
+    (archive / "test_3.xml").write_text(VALID_TEST_RESULT.replace("</", "<"))
+
+    roots = validate_junit_xml_archive(str(archive), max_workers=max_workers)
+    assert ordered(parse_test_result(roots)) == ordered(EXPECTED_JSON_OUTPUT)
+
+    with pytest.raises(JUnitXMLValidationError, match="could not parse .*test_3.xml"):
+        validate_junit_xml_archive(str(archive), strict=True, max_workers=max_workers)
+
+
+def test_columnar_test_cases():
+    test_cases = EXPECTED_JSON_OUTPUT["test_cases"]
+    columns = ColumnarTestCases()
+    other_columns = ColumnarTestCases()
+    for feature, cases in [("acl", test_cases["acl"]), ("bgp", test_cases["bgp"]), ("acl", test_cases["acl"][:1])]:
+        for test_case in cases:
+            other_columns.append(feature, [test_case[field] for field in ColumnarTestCases.FIELDS])
+    columns.extend(other_columns)
+    columns.extend(other_columns)
+
+    assert len(columns) == 10
+    assert columns.to_dict() == {
+        "acl": (test_cases["acl"] + test_cases["acl"][:1]) * 2,
+        "bgp": test_cases["bgp"] * 2,
+    }
+    assert columns.summary() == {"tests": "10", "failures": "6", "skipped": "2", "errors": "4", "time": "544.22"}
+
+
 def test_xml_file_not_found():
     with pytest.raises(JUnitXMLValidationError, match="file not found"):
         validate_junit_xml_file("nonexistent.xml")
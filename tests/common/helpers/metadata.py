@@ -0,0 +1,135 @@
+"""
+Testbed metadata used to parametrize tests.
+
+The metadata files are created by tests/test_pretest.py:
+    metadata/<testbed>.json: interface status and features of every DUT
+    priority/<testbed>-<lossless|lossy>.json: priorities of every DUT
+
+pytest_generate_tests runs for every test function, so the files are
+loaded and indexed only once per process and reloaded only if changed.
+"""
+import json
+import logging
+import os
+
+from tests.common.helpers.dut_ports import encode_dut_port_name
+
+logger = logging.getLogger(__name__)
+
+METADATA_FOLDER = 'metadata'
+PRIORITY_FOLDER = 'priority'
+
+PORT_SCOPES = ('Ethernet', 'PortChannel')
+PORT_STATES = (None, 'oper_state', 'admin_state')
+
+# Objects built from the json files, keyed by file path
+_file_cache = {}
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime, st.st_size
+
+
+def load_json_file(filepath, build):
+    """
+    Return build(<json content of filepath>), None if the file can't be read.
+    A file which is not valid JSON raises ValueError, broken metadata must not be skipped silently.
+
+    The result is cached until the file is changed, a file must always be loaded with the same build.
+    """
+    stamp = _file_stamp(filepath)
+    if stamp is None:
+        return None
+
+    cached = _file_cache.get(filepath)
+    if cached is None or cached[0] != stamp:
+        try:
+            with open(filepath, 'r') as f:
+                content = json.load(f)
+        except IOError as e:
+            logger.debug('Unable to load {}: {}'.format(filepath, repr(e)))
+            return None
+        except ValueError as e:
+            raise ValueError('Invalid JSON in {}: {}'.format(filepath, e))
+        cached = (stamp, build(content))
+        _file_cache[filepath] = cached
+    return cached[1]
+
+
+class TestbedMetadata(object):
+    """Port and feature lists of the DUTs of a testbed, indexed for lookups."""
+
+    def __init__(self, metadata):
+        # {(dut, scope, state): ['<dut>|<port>', ...]}, state None means any state
+        self._dut_ports = {}
+        # {(scope, state): ['<dut>|<port>', ...]}
+        self._ports = dict(((scope, state), []) for scope in PORT_SCOPES for state in PORT_STATES)
+        self._dut_features = {}
+        self._features = []
+        self.duts = []
+
+        for dut, val in metadata.items():
+            self.duts.append(dut)
+            self._index_ports(dut, val.get('intf_status'))
+            features = [encode_dut_port_name(dut, feature) for feature in val.get('features', {})]
+            self._dut_features[dut] = features
+            self._features.extend(features)
+
+    def _index_ports(self, dut, intf_status):
+        for scope in PORT_SCOPES:
+            for state in PORT_STATES:
+                self._dut_ports[(dut, scope, state)] = []
+        if intf_status is None:
+            return
+
+        for intf, status in intf_status.items():
+            for scope in PORT_SCOPES:
+                if scope not in intf:
+                    continue
+                name = encode_dut_port_name(dut, intf)
+                for state in PORT_STATES:
+                    if not state or status.get(state) == 'up':
+                        self._dut_ports[(dut, scope, state)].append(name)
+                        self._ports[(scope, state)].append(name)
+
+    @classmethod
+    def load(cls, tbname, folder=METADATA_FOLDER):
+        """Return metadata of a testbed, None if there is no metadata for it."""
+        def build(content):
+            return cls(content[tbname]) if tbname in content else None
+
+        return load_json_file(os.path.join(folder, tbname + '.json'), build)
+
+    def get_ports(self, scope, state=None, dut=None):
+        """
+        Return '<dut>|<port>' names of ports in a scope ('Ethernet' or 'PortChannel').
+
+        Args:
+            state: None for all ports, 'oper_state' or 'admin_state' for ports which are up.
+            dut: only return ports of this DUT.
+        """
+        if dut is None:
+            return self._ports.get((scope, state), [])
+        return self._dut_ports.get((dut, scope, state), [])
+
+    def get_features(self, dut=None):
+        """Return '<dut>|<feature>' names of features."""
+        if dut is None:
+            return self._features
+        return self._dut_features.get(dut, [])
+
+
+def load_priorities(tbname, prio_scope, folder=PRIORITY_FOLDER):
+    """Return '<dut>|<priority>' names of 'lossless' or 'lossy' priorities of a testbed."""
+    def build(content):
+        ret = []
+        for dut, priorities in content.get(tbname, {}).items():
+            for p in priorities:
+                ret.append('{}|{}'.format(dut, p))
+        return ret
+
+    return load_json_file(os.path.join(folder, tbname + '-' + prio_scope + '.json'), build) or []
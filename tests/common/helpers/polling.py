@@ -0,0 +1,298 @@
+"""
+Polling engine for waiting until a condition on the DUT becomes True.
+
+A Poller calls a condition until it returns True or a timeout expires. Between two calls it waits:
+    - for a delay given by a backoff strategy (FixedBackoff, ExponentialBackoff), which can be
+      shortened by the expected convergence time learned from previous runs of the same condition
+    - with a waiter, which either sleeps (SleepWaiter) or returns as soon as an event is read from
+      a streamed source (StreamWaiter), e.g. 'redis-cli psubscribe' or 'tail -F' output on the DUT
+
+Statistics of every call (polls, time to True) are kept in POLL_STATS and can be written to a file
+with dump_poll_stats for profiling.
+
+Example:
+    poller = Poller(timeout=300, backoff=ExponentialBackoff(floor=1, ceiling=20), name="bgp_established",
+                    learn=True)
+    assert poller.until(duthost.check_bgp_session_state, neigh_ips)
+"""
+import collections
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CONVERGENCE_HINTS_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                      '../../_cache/polling/convergence.json')
+# Weight of the latest time to True in the learned convergence time
+CONVERGENCE_HINT_WEIGHT = 0.5
+POLL_STATS_LIMIT = 10000
+
+
+class FixedBackoff(object):
+    """Wait the same interval between all polls."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.floor = interval
+        self.ceiling = interval
+
+    def delays(self):
+        while True:
+            yield self.interval
+
+
+class ExponentialBackoff(object):
+    """
+    Wait floor seconds after the first poll, then multiply the delay by factor up to ceiling.
+
+    With jitter, every delay is randomly reduced by up to jitter * delay, so that concurrent pollers
+    don't hit the DUT at the same time.
+    """
+
+    def __init__(self, floor=1, ceiling=30, factor=2, jitter=0.0):
+        self.floor = floor
+        self.ceiling = ceiling
+        self.factor = factor
+        self.jitter = jitter
+
+    def delays(self):
+        delay = self.floor
+        while True:
+            if self.jitter:
+                yield max(self.floor, delay * (1 - random.uniform(0, self.jitter)))
+            else:
+                yield delay
+            delay = min(self.ceiling, delay * self.factor)
+
+
+class SleepWaiter(object):
+    """Wait between polls by sleeping."""
+
+    def wait(self, timeout):
+        """
+        Wait for up to timeout seconds.
+
+        Returns:
+            True if an event was received before the timeout, which is never the case for this waiter.
+        """
+        time.sleep(timeout)
+        return False
+
+    def close(self):
+        pass
+
+
+class StreamWaiter(object):
+    """
+    Wait between polls until a line matching a pattern is read from a stream, or the delay expires.
+
+    The stream is read by a background thread. It can be any iterable of lines, e.g. the output of a
+    long-lived 'redis-cli psubscribe' or 'tail -F' command on the DUT, see StreamWaiter.from_ssh.
+    """
+
+    def __init__(self, lines, pattern=None, on_close=None):
+        """
+        Args:
+            lines: Iterable of lines.
+            pattern: Regular expression the lines must match to be an event, any line is an event if None.
+            on_close: Function called to stop the stream when the waiter is closed.
+        """
+        self.pattern = re.compile(pattern) if pattern else None
+        self.events = 0
+        self._event = threading.Event()
+        self._on_close = on_close
+        self._closed = False
+        self._thread = threading.Thread(target=self._read, args=(lines,), name="StreamWaiter")
+        self._thread.daemon = True
+        self._thread.start()
+
+    @classmethod
+    def from_ssh(cls, hostname, username, password, command, pattern=None):
+        """
+        Wait on the output of a command run on a host with SSH.
+
+        Example:
+            StreamWaiter.from_ssh(duthost.mgmt_ip, user, password,
+                                  "redis-cli -n 0 psubscribe '__keyspace@0__:ROUTE_TABLE:*'", pattern="pmessage")
+        """
+        import paramiko
+
+        ssh = paramiko.SSHClient()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        ssh.connect(hostname, username=username, password=password, timeout=10)
+        _, stdout, _ = ssh.exec_command(command, get_pty=True)
+        return cls(iter(stdout.readline, ""), pattern, on_close=ssh.close)
+
+    def _read(self, lines):
+        try:
+            for line in lines:
+                if self._closed:
+                    break
+                if self.pattern is None or self.pattern.search(line):
+                    self.events += 1
+                    self._event.set()
+        except Exception as e:
+            if not self._closed:
+                logger.warning("Stream of StreamWaiter stopped: %s" % repr(e))
+
+    def wait(self, timeout):
+        """
+        Wait for up to timeout seconds.
+
+        Returns:
+            True if an event was received since the previous wait or before the timeout.
+        """
+        received = self._event.wait(timeout)
+        self._event.clear()
+        return received
+
+    def close(self):
+        self._closed = True
+        if self._on_close:
+            self._on_close()
+
+
+class ConvergenceHints(object):
+    """
+    Expected time until conditions become True, learned from previous runs and stored per condition name.
+
+    The file is shared by all test processes, it is re-read before every update.
+    """
+
+    def __init__(self, path=CONVERGENCE_HINTS_FILE):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def get(self, name):
+        """Return the expected time until the condition is True, None if unknown."""
+        return self._load().get(name)
+
+    def update(self, name, time_to_true):
+        """Learn a new time until the condition became True."""
+        with self._lock:
+            hints = self._load()
+            previous = hints.get(name)
+            if previous is None:
+                hints[name] = time_to_true
+            else:
+                hints[name] = CONVERGENCE_HINT_WEIGHT * time_to_true + (1 - CONVERGENCE_HINT_WEIGHT) * previous
+
+            try:
+                if not os.path.exists(os.path.dirname(self.path)):
+                    os.makedirs(os.path.dirname(self.path))
+                tmp_path = "%s.%d" % (self.path, os.getpid())
+                with open(tmp_path, "w") as f:
+                    json.dump(hints, f, indent=4, sort_keys=True)
+                os.rename(tmp_path, self.path)
+            except (IOError, OSError) as e:
+                logger.warning("Failed to store convergence time of %s: %s" % (name, repr(e)))
+
+
+PollStats = collections.namedtuple("PollStats", ["name", "result", "polls", "events", "errors", "elapsed",
+                                                 "time_to_true", "hint", "start_time"])
+
+# Statistics of the latest calls of Poller.until
+POLL_STATS = collections.deque(maxlen=POLL_STATS_LIMIT)
+
+
+def dump_poll_stats(path):
+    """Write the statistics of the latest polls to a JSON file."""
+    with open(path, "w") as f:
+        json.dump([stats._asdict() for stats in POLL_STATS], f, indent=4)
+
+
+class Poller(object):
+    """Call a condition until it returns True or a timeout expires."""
+
+    def __init__(self, timeout, backoff=None, waiter=None, name=None, learn=False, hints=None,
+                 ignore_errors=True):
+        """
+        Args:
+            timeout: Maximum time to wait.
+            backoff: Delays between polls, defaults to ExponentialBackoff().
+            waiter: How to wait between polls, defaults to SleepWaiter(). The poller doesn't close it.
+            name: Name of the condition in statistics and convergence hints, defaults to the function name.
+            learn: Poll less before the convergence time learned from previous runs of the condition, and
+                learn the time to True of this run.
+            hints: ConvergenceHints to learn from, defaults to the shared convergence hints file.
+            ignore_errors: Log exceptions raised by the condition and treat them as False, else raise them.
+        """
+        self.timeout = timeout
+        self.backoff = backoff if backoff is not None else ExponentialBackoff()
+        self.waiter = waiter if waiter is not None else SleepWaiter()
+        self.name = name
+        self.learn = learn
+        self.hints = hints if hints is not None else (ConvergenceHints() if learn else None)
+        self.ignore_errors = ignore_errors
+        self.stats = None
+
+    def _delay(self, delays, elapsed, hint):
+        """Return the delay until the next poll."""
+        if hint is not None and elapsed < hint:
+            # The condition is not expected to be True before the hint, wait for it with as few polls as possible
+            return min(max(hint - elapsed, self.backoff.floor), self.backoff.ceiling)
+        return next(delays)
+
+    def until(self, condition, *args, **kwargs):
+        """
+        Call condition(*args, **kwargs) until it returns True or the timeout expires.
+
+        Returns:
+            True if the condition returned True before the timeout, else False.
+        """
+        name = self.name or getattr(condition, "__name__", repr(condition))
+        hint = self.hints.get(name) if self.learn else None
+        logger.debug("Wait until %s is True, timeout is %s seconds, expected after %s seconds" %
+                     (name, self.timeout, hint))
+
+        delays = self.backoff.delays()
+        polls = events = errors = 0
+        start_time = time.time()
+        elapsed = 0
+        result = False
+        while True:
+            polls += 1
+            try:
+                result = bool(condition(*args, **kwargs))
+            except Exception as e:
+                if not self.ignore_errors:
+                    raise
+                errors += 1
+                logger.error("Exception caught while checking %s: %s" % (name, repr(e)))
+                result = False
+
+            elapsed = time.time() - start_time
+            if result or elapsed >= self.timeout:
+                break
+
+            delay = min(self._delay(delays, elapsed, hint), self.timeout - elapsed)
+            if self.waiter.wait(delay):
+                events += 1
+            elapsed = time.time() - start_time
+            if elapsed >= self.timeout:
+                break
+
+        self.stats = PollStats(name=name, result=result, polls=polls, events=events, errors=errors, elapsed=elapsed,
+                               time_to_true=elapsed if result else None, hint=hint, start_time=start_time)
+        POLL_STATS.append(self.stats)
+
+        if result:
+            logger.debug("%s is True after %.1f seconds and %d polls" % (name, elapsed, polls))
+            if self.learn:
+                self.hints.update(name, elapsed)
+        else:
+            logger.debug("%s is still False after %d seconds and %d polls, exit with False" %
+                         (name, self.timeout, polls))
+        return result
@@ -1,10 +1,44 @@
 import logging
 import json
+import time
+
+from six.moves import shlex_quote
 from tests.common.helpers.constants import DEFAULT_NAMESPACE
 from tests.common.devices.sonic_asic import SonicAsic
 
 logger = logging.getLogger(__name__)
 
+# Number of keys examined by every SCAN iteration
+SCAN_COUNT = 1000
+# Keys passed to every EVAL, to keep the redis-cli command line short
+EVAL_KEYS_CHUNK = 500
+
+# Lua scripts run with EVAL on the keys returned by 'redis-cli --scan'. The SCAN cursor is walked by redis-cli,
+# a script only reads a bounded chunk of keys, so redis is not blocked for the whole keyspace walk.
+
+# Returns key, number of field and value items, fields and values of every hash in KEYS
+HGETALL_KEYS_SCRIPT = (
+    "local out = {} "
+    "for _, k in ipairs(KEYS) do "
+    "if redis.call('TYPE', k).ok == 'hash' then "
+    "local h = redis.call('HGETALL', k) "
+    "out[#out + 1] = k out[#out + 1] = #h "
+    "for _, v in ipairs(h) do out[#out + 1] = v end "
+    "end "
+    "end "
+    "return out"
+)
+
+# Returns key and value of a field (ARGV[1]) of every key in KEYS that has the field
+HGET_KEYS_SCRIPT = (
+    "local out = {} "
+    "for _, k in ipairs(KEYS) do "
+    "local v = redis.call('HGET', k, ARGV[1]) "
+    "if v then out[#out + 1] = k out[#out + 1] = v end "
+    "end "
+    "return out"
+)
+
 
 class RedisCli(object):
     """Base class for interface to RedisDb using redis-cli command.
@@ -15,12 +49,21 @@ class RedisCli(object):
         pid: Port number of redis db.
     """
 
-    def __init__(self, host, database=1, pid=6379):
-        """Initializes base class with defaults"""
+    def __init__(self, host, database=1, pid=6379, cache_ttl=0):
+        """
+        Initializes base class with defaults
+
+        Args:
+            cache_ttl: seconds the tables read by scan_hash_table are cached, 0 disables the cache.
+        """
         self.host = host
         self.database = database
         self.pid = pid
         self.ip = None
+        self.cache_ttl = cache_ttl
+        # number of commands run on the host
+        self.round_trips = 0
+        self._table_cache = {}
 
     def _cli_prefix(self):
         """Builds opening of redis CLI command for other methods."""
@@ -40,7 +83,7 @@ class RedisCli(object):
             Empty dictionary on error.
 
         """
-        result = self.host.run_redis_cli_cmd(cmd)
+        result = self._run(cmd)
 
         if len(result["stdout_lines"]) == 0:
             logger.error("No command response: %s" % cmd)
@@ -48,6 +91,11 @@ class RedisCli(object):
 
         return result
 
+    def _run(self, cmd):
+        """Executes a redis CLI command and returns the Ansible CLI output dictionary."""
+        self.round_trips += 1
+        return self.host.run_redis_cli_cmd(cmd)
+
     def _run_and_raise(self, cmd):
         """
         Executes a redis CLI command and checks the output for empty string.
@@ -63,7 +111,7 @@ class RedisCli(object):
 
         """
         logger.debug("REDIS: %s", cmd)
-        result = self.host.run_redis_cli_cmd(cmd)
+        result = self._run(cmd)
 
         if len(result["stdout_lines"]) == 0:
             logger.warning("No command response: %s" % cmd)
@@ -156,12 +204,140 @@ class RedisCli(object):
                 RedisKeyNotFound: If the key or field has no value or is not present.
 
         """
-        cmd = self._cli_prefix() + " keys {}".format(table)
-        result = self._run_and_check(cmd)
-        if result == {}:
-            raise RedisKeyNotFound("No keys for %s found in rediscmd: %s" % (table, cmd))
+        keys = self.scan_keys(table)
+        if not keys:
+            raise RedisKeyNotFound("No keys for %s found in rediscmd: SCAN MATCH %s" % (table, table))
         else:
-            return result['stdout'].decode('unicode-escape')
+            return "\n".join(keys)
+
+    def _eval(self, script, keys=(), args=()):
+        """
+        Runs a Lua script with EVAL.
+
+        Returns:
+            The output lines of the script result.
+        """
+        cmd = self._cli_prefix() + "EVAL {} {} {}".format(
+            shlex_quote(script), len(keys), " ".join(shlex_quote(str(arg)) for arg in list(keys) + list(args)))
+        logger.debug("REDIS: EVAL %s", " ".join(list(keys) + [str(arg) for arg in args]))
+        return self._run(cmd)["stdout_lines"]
+
+    def _eval_keys(self, script, keys, args=()):
+        """
+        Runs a Lua script with EVAL on many keys, EVAL_KEYS_CHUNK keys per redis-cli command.
+
+        Returns:
+            The output lines of the script results, concatenated.
+        """
+        lines = []
+        for start in range(0, len(keys), EVAL_KEYS_CHUNK):
+            lines.extend(self._eval(script, keys=keys[start:start + EVAL_KEYS_CHUNK], args=args))
+        return lines
+
+    def scan_keys(self, pattern, count=SCAN_COUNT):
+        """
+        Gets the keys matching a pattern with SCAN, in one 'redis-cli --scan' command.
+
+        Args:
+            pattern: glob-style pattern of the keys.
+            count: number of keys examined by every SCAN iteration.
+
+        Returns:
+            list of keys, empty if no key matches.
+        """
+        keys = []
+        seen = set()
+        # SCAN may return a key more than once
+        cmd = self._cli_prefix() + "--scan --pattern {} --count {}".format(shlex_quote(pattern), count)
+        logger.debug("REDIS: %s", cmd)
+        for key in self._run(cmd)["stdout_lines"]:
+            if key not in seen:
+                seen.add(key)
+                keys.append(key)
+        return keys
+
+    def _scan_and_raise(self, pattern):
+        """
+        Gets the keys matching a pattern with SCAN.
+
+        Raises:
+            RedisNoCommandOutput: If no key matches the pattern.
+        """
+        keys = self.scan_keys(pattern)
+        if not keys:
+            logger.warning("No keys match: %s" % pattern)
+            raise RedisNoCommandOutput("SCAN MATCH %s returned no keys." % pattern)
+        return keys
+
+    def scan_hash_table(self, pattern, ttl=None, count=SCAN_COUNT):
+        """
+        Gets all fields and values of the hashes matching a pattern.
+
+        The keys are scanned with one redis-cli command, the hashes are read with one EVAL per EVAL_KEYS_CHUNK keys.
+
+        Values must not contain new lines.
+
+        Args:
+            pattern: glob-style pattern of the keys.
+            ttl: seconds the result can be served from cache, defaults to cache_ttl.
+            count: number of keys examined by every SCAN iteration.
+
+        Returns:
+            Dictionary of {key: {field: value}}.
+        """
+        if ttl is None:
+            ttl = self.cache_ttl
+        cached = self._table_cache.get(pattern)
+        if ttl and cached is not None and time.time() - cached[0] < ttl:
+            return cached[1]
+
+        lines = self._eval_keys(HGETALL_KEYS_SCRIPT, self.scan_keys(pattern, count))
+        table = {}
+        i = 0
+        while i + 1 < len(lines):
+            key, num = lines[i], int(lines[i + 1])
+            items = lines[i + 2:i + 2 + num]
+            table[key] = dict(zip(items[0::2], items[1::2]))
+            i += 2 + num
+
+        if ttl:
+            self._table_cache[pattern] = (time.time(), table)
+        return table
+
+    def hget_keys(self, keys, field):
+        """
+        Executes hget of a field for many keys, with one EVAL per EVAL_KEYS_CHUNK keys.
+
+        Args:
+            keys: full names of the keys.
+            field: Name of the hash field to get.
+
+        Returns:
+            Dictionary of {key: value} of the keys which have the field.
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        lines = self._eval_keys(HGET_KEYS_SCRIPT, keys, args=(field,))
+        return dict(zip(lines[0::2], lines[1::2]))
+
+    def dump_hash_table(self, table, ttl=None):
+        """
+        Dumps the hashes of a table, the result is in the format of dump for hash keys.
+
+        Args:
+            table: The table to dump.
+            ttl: seconds the result can be served from cache, defaults to cache_ttl.
+
+        Returns:
+            Dictionary of {key: {"type": "hash", "value": {field: value}}}
+        """
+        table = self.scan_hash_table("*{}*".format(table), ttl=ttl)
+        return dict((key, {"type": "hash", "value": value}) for key, value in table.items())
+
+    def clear_cache(self):
+        """Drops the tables cached by scan_hash_table."""
+        self._table_cache = {}
 
     def dump(self, table):
         """
@@ -182,6 +358,8 @@ class RedisCli(object):
 
         cmd_str += "-p {pid} -d {db} -y -k *{t}*".format(db=self.database, pid=self.pid, t=table)
 
+        self.round_trips += 1
+
         # We are on an asic, it could be single asic card, or multiasic and need a namespace.
         if isinstance(self.host, SonicAsic):
             if self.host.namespace != DEFAULT_NAMESPACE:
@@ -217,11 +395,14 @@ class AsicDbCli(RedisCli):
     ASIC_ROUTERINTF_TABLE = "ASIC_STATE:SAI_OBJECT_TYPE_ROUTER_INTERFACE"
     ASIC_NEIGH_ENTRY_TABLE = "ASIC_STATE:SAI_OBJECT_TYPE_NEIGHBOR_ENTRY"
 
+    # seconds the read-mostly tables are cached
+    TABLE_CACHE_TTL = 60
+
     def __init__(self, host):
         """
         Initializes a connection to the ASIC DB (database 1)
         """
-        super(AsicDbCli, self).__init__(host, 1)
+        super(AsicDbCli, self).__init__(host, 1, cache_ttl=AsicDbCli.TABLE_CACHE_TTL)
         # cache this to improve speed
         self.hostif_portidlist = []
         self.hostif_table = []
@@ -230,16 +411,14 @@ class AsicDbCli(RedisCli):
 
     def get_switch_key(self):
         """Returns a list of keys in the switch table"""
-        cmd = self._cli_prefix() + "KEYS %s*" % AsicDbCli.ASIC_SWITCH_TABLE
-        return self._run_and_raise(cmd)["stdout_lines"][0]
+        return self._scan_and_raise("%s*" % AsicDbCli.ASIC_SWITCH_TABLE)[0]
 
     def get_system_port_key_list(self, refresh=False):
         """Returns a list of keys in the system port table"""
         if self.system_port_key_list != [] and refresh is False:
             return self.system_port_key_list
 
-        cmd = self._cli_prefix() + "KEYS %s*" % AsicDbCli.ASIC_SYSPORT_TABLE
-        self.system_port_key_list = self._run_and_raise(cmd)["stdout_lines"]
+        self.system_port_key_list = self._scan_and_raise("%s*" % AsicDbCli.ASIC_SYSPORT_TABLE)
         return self.system_port_key_list
 
     def get_port_key_list(self, refresh=False):
@@ -248,34 +427,28 @@ class AsicDbCli(RedisCli):
         if self.port_key_list != [] and refresh is False:
             return self.port_key_list
 
-        cmd = self._cli_prefix() + "KEYS %s*" % AsicDbCli.ASIC_PORT_TABLE
-        self.port_key_list = self._run_and_raise(cmd)["stdout_lines"]
+        self.port_key_list = self._scan_and_raise("%s*" % AsicDbCli.ASIC_PORT_TABLE)
         return self.port_key_list
 
     def get_hostif_list(self):
         """Returns a list of keys in the host interface table"""
-        cmd = self._cli_prefix() + "KEYS %s:*" % AsicDbCli.ASIC_HOSTIF_TABLE
-        return self._run_and_raise(cmd)["stdout_lines"]
+        return self._scan_and_raise("%s:*" % AsicDbCli.ASIC_HOSTIF_TABLE)
 
     def get_asic_db_lag_list(self):
         """Returns a list of keys in the lag table"""
-        cmd = self._cli_prefix() + "KEYS %s:*" % AsicDbCli.ASIC_LAG_TABLE
-        return self._run_and_raise(cmd)["stdout_lines"]
+        return self._scan_and_raise("%s:*" % AsicDbCli.ASIC_LAG_TABLE)
 
     def get_asic_db_lag_member_list(self):
         """Returns a list of keys in the lag member table"""
-        cmd = self._cli_prefix() + "KEYS %s:*" % AsicDbCli.ASIC_LAG_MEMBER_TABLE
-        return self._run_and_raise(cmd)["stdout_lines"]
+        return self._scan_and_raise("%s:*" % AsicDbCli.ASIC_LAG_MEMBER_TABLE)
 
     def get_router_if_list(self):
         """Returns a list of keys in the router interface table"""
-        cmd = self._cli_prefix() + "KEYS %s:*" % AsicDbCli.ASIC_ROUTERINTF_TABLE
-        return self._run_and_raise(cmd)["stdout_lines"]
+        return self._scan_and_raise("%s:*" % AsicDbCli.ASIC_ROUTERINTF_TABLE)
 
     def get_neighbor_list(self):
         """Returns a list of keys in the neighbor table"""
-        cmd = self._cli_prefix() + "KEYS %s:*" % AsicDbCli.ASIC_NEIGH_ENTRY_TABLE
-        return self._run_and_raise(cmd)["stdout_lines"]
+        return self._scan_and_raise("%s:*" % AsicDbCli.ASIC_NEIGH_ENTRY_TABLE)
 
     def get_neighbor_key_by_ip(self, ipaddr):
         """Returns the key in the neighbor table that is for a specific IP neighbor
@@ -284,9 +457,9 @@ class AsicDbCli(RedisCli):
             ipaddr: The IP address to search for in the neighbor table.
 
         """
-        result = self._run_and_raise(self._cli_prefix() + "KEYS %s*%s*" % (AsicDbCli.ASIC_NEIGH_ENTRY_TABLE, ipaddr))
+        keys = self._scan_and_raise("%s*%s*" % (AsicDbCli.ASIC_NEIGH_ENTRY_TABLE, ipaddr))
         match_str = '"ip":"%s"' % ipaddr
-        for key in result["stdout_lines"]:
+        for key in keys:
             if match_str in key:
                 neighbor_key = key
                 break
@@ -330,7 +503,7 @@ class AsicDbCli(RedisCli):
         if self.hostif_table != [] and refresh is False:
             hostif_table = self.hostif_table
         else:
-            hostif_table = self.dump("%s:" % AsicDbCli.ASIC_HOSTIF_TABLE)
+            hostif_table = self.dump_hash_table("%s:" % AsicDbCli.ASIC_HOSTIF_TABLE, ttl=0 if refresh else None)
             self.hostif_table = hostif_table
 
         return hostif_table
@@ -440,9 +613,9 @@ class AppDbCli(RedisCli):
             ipaddr: The IP address to search for in the neighbor table.
 
         """
-        result = self._run_and_raise(self._cli_prefix() + "KEYS %s:*%s" % (AppDbCli.APP_NEIGH_TABLE, ipaddr))
+        keys = self._scan_and_raise("%s:*%s" % (AppDbCli.APP_NEIGH_TABLE, ipaddr))
         neighbor_key = None
-        for key in result["stdout_lines"]:
+        for key in keys:
             if key.endswith(ipaddr):
                 neighbor_key = key
                 break
@@ -453,15 +626,13 @@ class AppDbCli(RedisCli):
         """
         Retuns lag list in app db
         """
-        result = self._run_and_raise(self._cli_prefix() + "KEYS *%s*" % AppDbCli.APP_LAG_TABLE)
-        return result["stdout_lines"]
+        return self._scan_and_raise("*%s*" % AppDbCli.APP_LAG_TABLE)
 
     def get_app_db_lag_member_list(self):
         """
         return lag member list in app db
         """
-        result = self._run_and_raise(self._cli_prefix() + "KEYS *{}:*".format(AppDbCli.APP_LAG_MEMBER_TABLE))
-        return result["stdout_lines"]
+        return self._scan_and_raise("*{}:*".format(AppDbCli.APP_LAG_MEMBER_TABLE))
 
     def dump_neighbor_table(self):
         """
@@ -501,10 +672,9 @@ class VoqDbCli(RedisCli):
             ipaddr: The IP address to search for in the neighbor table.
 
         """
-        cmd = self._cli_prefix() + 'KEYS "%s|*%s"' % (VoqDbCli.SYSTEM_NEIGHBOR_TABLE, ipaddr)
-        result = self._run_and_raise(cmd)
+        keys = self._scan_and_raise("%s|*%s" % (VoqDbCli.SYSTEM_NEIGHBOR_TABLE, ipaddr))
         neighbor_key = None
-        for key in result["stdout_lines"]:
+        for key in keys:
             if key.endswith(ipaddr):
                 neighbor_key = key
                 break
@@ -538,13 +708,11 @@ class VoqDbCli(RedisCli):
 
     def get_lag_list(self):
         """Returns a list of keys in the system lag table"""
-        cmd = self._cli_prefix() + "KEYS *{}*".format(VoqDbCli.SYSTEM_LAG_TABLE)
-        return self._run_and_raise(cmd)["stdout_lines"]
+        return self._scan_and_raise("*{}*".format(VoqDbCli.SYSTEM_LAG_TABLE))
 
     def get_lag_member_list(self):
         """Returns a list of keys in the ststem lag member table"""
-        cmd = self._cli_prefix() + "KEYS *{}*".format(VoqDbCli.SYSTEM_LAG_MEMBER_TABLE)
-        return self._run_and_raise(cmd)["stdout_lines"]
+        return self._scan_and_raise("*{}*".format(VoqDbCli.SYSTEM_LAG_MEMBER_TABLE))
 
     def dump_neighbor_table(self):
         """
@@ -1,89 +1,239 @@
+"""
+Hardware resources monitor, uploaded to and run on the DUT by the dut_monitor plugin.
+
+Samples are read directly from /proc and statvfs, without running any command, and are stored as
+fixed-size binary records in a ring file (RING_FILE). The host side reads the file and decodes it
+with decode_ring. This module must run with both python 2 and python 3.
+"""
+from __future__ import print_function
+
 import argparse
-import time
+import array
 import os
-
-from  datetime import datetime
+import struct
+import sys
+import time
 
 
-FETCH_CPU_CMD = "ps -eo pcpu,args | sort -k 1 -r | tail -n +2"
-FETCH_HDD_CMD = "df -hm /"
 MEASURE_DELAY = 2
-
-
-def process_cpu(log_file):
+RING_FILE = "/tmp/dut_monitor.ring"
+# Number of records kept in the ring file, 1 hour of samples
+RING_CAPACITY = 1800
+TOP_CONSUMERS = 10
+PROCESS_NAME_SIZE = 48
+
+RING_MAGIC = b"DUTM"
+RING_VERSION = 1
+# magic, version, record size, capacity, number of records written
+RING_HEADER = struct.Struct("<4sHHII")
+# timestamp, total CPU %, used RAM %, used HDD %, CPU % of the monitor itself,
+# then TOP_CONSUMERS times: pid, CPU %, process name
+RING_RECORD = struct.Struct("<dffff" + "If{}s".format(PROCESS_NAME_SIZE) * TOP_CONSUMERS)
+
+
+class Sampler(object):
     """
-    @summary: Fetch CPU utilization. Write to the file total and top 10 process CPU utilization.
-    @param log_file: Opened file object to store fetched CPU utilization.
+    @summary: Sample CPU, RAM and HDD utilization. CPU utilization is computed from the difference between
+              the current and the previous sample, so the first sample is taken on creation.
     """
-    buff = []
-    general_template = """
-"{timestamp}":
-    total: {total}
-    top_consumer:
-"""
-    per_process_template = "        {cpu_utilization}: \"{process}\""
-    top_consumer_list = []
-    total = 0
-    top_consumer_counter = 10
-
-    for line in os.popen(FETCH_CPU_CMD).readlines():
-        process_consumed = float(line.split()[0])
-        total += process_consumed
-        if top_consumer_counter:
-            top_consumer_list.append(per_process_template.format(cpu_utilization=process_consumed,
-                                     process=" ".join(line.split()[1:])))
-            top_consumer_counter -= 1
-
-    result = general_template.format(timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"), total=total) \
-                + "\n".join(top_consumer_list)
-    log_file.write(result)
-
-
-def process_ram(log_file):
+    def __init__(self, path="/"):
+        self.path = path
+        self.clk_tck = float(os.sysconf("SC_CLK_TCK"))
+        self.proc_names = {}
+        self.prev_time = time.time()
+        self.prev_cpu = self.read_cpu()
+        self.prev_procs = self.read_procs()
+        self.prev_self = sum(os.times()[:2])
+
+    @staticmethod
+    def read_cpu():
+        """
+        @summary: Read total and idle jiffies of all CPUs from '/proc/stat'.
+        """
+        with open("/proc/stat") as stream:
+            # cpu user nice system idle iowait irq softirq steal guest guest_nice
+            values = [int(value) for value in stream.readline().split()[1:9]]
+        return sum(values), values[3] + values[4]
+
+    @staticmethod
+    def read_procs():
+        """
+        @summary: Read CPU time in jiffies of every process from '/proc/<pid>/stat'.
+        @return: Dictionary {pid: jiffies}
+        """
+        procs = {}
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit():
+                continue
+            try:
+                with open("/proc/{}/stat".format(pid)) as stream:
+                    stat = stream.read()
+            except (IOError, OSError):
+                # The process exited
+                continue
+            # Fields after "pid (comm)", utime and stime are the 14th and 15th fields
+            fields = stat[stat.rfind(")") + 2:].split()
+            procs[int(pid)] = int(fields[11]) + int(fields[12])
+        return procs
+
+    def proc_name(self, pid):
+        """
+        @summary: Return the command line of a process, read once per process.
+        """
+        if pid not in self.proc_names:
+            try:
+                with open("/proc/{}/cmdline".format(pid), "rb") as stream:
+                    name = stream.read().replace(b"\0", b" ").strip()
+                if not name:
+                    with open("/proc/{}/comm".format(pid), "rb") as stream:
+                        name = b"[" + stream.read().strip() + b"]"
+            except (IOError, OSError):
+                name = b""
+            self.proc_names[pid] = name[:PROCESS_NAME_SIZE]
+        return self.proc_names[pid]
+
+    @staticmethod
+    def read_ram():
+        """
+        @summary: Read used RAM in percent. Use 'MemTotal' and 'MemAvailable' from '/proc/meminfo'.
+        """
+        meminfo = {}
+        with open("/proc/meminfo") as stream:
+            for line in stream:
+                name, value = line.split(":", 1)
+                if name in ("MemTotal", "MemAvailable"):
+                    meminfo[name] = int(value.split()[0])
+                    if len(meminfo) == 2:
+                        break
+        return (meminfo["MemTotal"] - meminfo["MemAvailable"]) * 100.0 / meminfo["MemTotal"]
+
+    def read_hdd(self):
+        """
+        @summary: Read used disk space in percent, the way 'df' computes it.
+        """
+        st = os.statvfs(self.path)
+        used = st.f_blocks - st.f_bfree
+        return used * 100.0 / (used + st.f_bavail) if used + st.f_bavail else 0.0
+
+    def sample(self):
+        """
+        @summary: Take a sample.
+        @return: Tuple of the fields of a RING_RECORD.
+        """
+        now = time.time()
+        cpu = self.read_cpu()
+        procs = self.read_procs()
+        elapsed = now - self.prev_time
+
+        total_delta = cpu[0] - self.prev_cpu[0]
+        idle_delta = cpu[1] - self.prev_cpu[1]
+        cpu_total = (total_delta - idle_delta) * 100.0 / total_delta if total_delta else 0.0
+
+        # Per process CPU utilization, in percent of one CPU like 'ps'
+        prev_procs = self.prev_procs
+        # Processes started since the previous sample used all their CPU time since then
+        consumers = sorted(((jiffies - prev_procs.get(pid, 0), pid) for pid, jiffies in procs.items()
+                            if jiffies != prev_procs.get(pid)), reverse=True)[:TOP_CONSUMERS]
+        for pid in list(self.proc_names):
+            if pid not in procs:
+                del self.proc_names[pid]
+
+        fields = [now, cpu_total, self.read_ram(), self.read_hdd(), 0.0]
+        for jiffies, pid in consumers:
+            fields += [pid, jiffies / self.clk_tck / elapsed * 100.0, self.proc_name(pid)]
+        fields += [0, 0.0, b""] * (TOP_CONSUMERS - len(consumers))
+
+        # CPU utilization of the monitor itself since the previous sample
+        self_time = sum(os.times()[:2])
+        fields[4] = (self_time - self.prev_self) / elapsed * 100.0
+
+        self.prev_time, self.prev_cpu, self.prev_procs, self.prev_self = now, cpu, procs, self_time
+        return tuple(fields)
+
+
+class RingWriter(object):
     """
-    @summary: Fetch RAM utilization and write it to the file.
-              Use 'MemTotal' and 'MemAvailable' from '/proc/meminfo' to obtain used RAM amount.
-    @param log_file: Opened file object to store fetched RAM utilization.
+    @summary: Write fixed-size records to a ring file. The header is updated after every record, so the file
+              can be read at any time.
     """
-    with open('/proc/meminfo') as stream:
-        for line in stream:
-            if 'MemAvailable' in line:
-                available_mem_in_kb = int(line.split()[1])
-            if 'MemTotal' in line:
-                total_mem_in_kb = int(line.split()[1])
-
-    used = total_mem_in_kb - available_mem_in_kb
-    used_percent = used * 100 / total_mem_in_kb
-    log_file.write("\"{date}\": {used_ram}\n".format(date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                   used_ram=used_percent))
-
-
-def process_hdd(log_file):
+    def __init__(self, path, capacity=RING_CAPACITY):
+        self.capacity = capacity
+        self.count = 0
+        self.stream = open(path, "w+b")
+        self.stream.truncate(RING_HEADER.size + capacity * RING_RECORD.size)
+        self._write_header()
+
+    def _write_header(self):
+        self.stream.seek(0)
+        self.stream.write(RING_HEADER.pack(RING_MAGIC, RING_VERSION, RING_RECORD.size, self.capacity, self.count))
+
+    def append(self, fields):
+        self.stream.seek(RING_HEADER.size + (self.count % self.capacity) * RING_RECORD.size)
+        self.stream.write(RING_RECORD.pack(*fields))
+        self.count += 1
+        self._write_header()
+        self.stream.flush()
+
+
+class Measurements(object):
     """
-    @summary: Fetch used amount of HDD and write it to the file. Execute command defined in FETCH_HDD_CMD.
-    @param log_file: Opened file object to store fetched HDD utilization.
+    @summary: Decoded samples, one array per measured value, in chronological order.
+              top_consumers contains a list of (pid, CPU %, process name) per sample.
+              overwritten is the number of older samples overwritten in the full ring, they are lost.
     """
-    output_line_id = 1
-    use_value_id = 4
-    hdd_usage = os.popen(FETCH_HDD_CMD).read().split("\n")[output_line_id].split()[use_value_id].rstrip("%")
-    log_file.write("\"{date}\": {used_ram}\n".format(date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                   used_ram=hdd_usage))
+    def __init__(self):
+        self.overwritten = 0
+        self.timestamp = array.array("d")
+        self.cpu_total = array.array("d")
+        self.ram_used = array.array("d")
+        self.hdd_used = array.array("d")
+        self.monitor_cpu = array.array("d")
+        self.top_consumers = []
 
+    def __len__(self):
+        return len(self.timestamp)
 
-def main():
-    cpu_log = open("/tmp/cpu.log", "w")
-    ram_log = open("/tmp/ram.log", "w")
-    hdd_log = open("/tmp/hdd.log", "w")
 
-    print "Started resources monitoring ..."
+def decode_ring(data):
+    """
+    @summary: Decode the content of a ring file.
+    @param data: Content of the ring file.
+    @return: Measurements object.
+    """
+    magic, version, record_size, capacity, count = RING_HEADER.unpack_from(data, 0)
+    if magic != RING_MAGIC or version != RING_VERSION or record_size != RING_RECORD.size:
+        raise ValueError("Unsupported ring file: magic {!r}, version {}, record size {}".format(magic, version,
+                                                                                            record_size))
+
+    measurements = Measurements()
+    first = count - capacity if count > capacity else 0
+    measurements.overwritten = first
+    for index in range(first, count):
+        fields = RING_RECORD.unpack_from(data, RING_HEADER.size + (index % capacity) * RING_RECORD.size)
+        measurements.timestamp.append(fields[0])
+        measurements.cpu_total.append(fields[1])
+        measurements.ram_used.append(fields[2])
+        measurements.hdd_used.append(fields[3])
+        measurements.monitor_cpu.append(fields[4])
+        consumers = []
+        for offset in range(5, len(fields), 3):
+            pid, cpu, name = fields[offset:offset + 3]
+            if pid:
+                consumers.append((pid, cpu, name.rstrip(b"\0").decode("utf-8", "replace")))
+        measurements.top_consumers.append(consumers)
+    return measurements
+
+
+def main(ring_file=RING_FILE, delay=MEASURE_DELAY):
+    ring = RingWriter(ring_file)
+    sampler = Sampler()
+
+    print("Started resources monitoring ...")
+    sys.stdout.flush()
     while True:
-        process_cpu(cpu_log)
-        process_ram(ram_log)
-        process_hdd(hdd_log)
-        time.sleep(MEASURE_DELAY)
-        cpu_log.flush()
-        ram_log.flush()
-        hdd_log.flush()
+        time.sleep(delay)
+        ring.append(sampler.sample())
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -9,13 +9,11 @@ import yaml
 from collections import OrderedDict
 from  datetime import datetime
 from errors import HDDThresholdExceeded, RAMThresholdExceeded, CPUThresholdExceeded
+from dut_monitor import RING_FILE, decode_ring
 
 
 logger = logging.getLogger(__name__)
 DUT_MONITOR = "/tmp/dut_monitor.py"
-DUT_CPU_LOG = "/tmp/cpu.log"
-DUT_RAM_LOG = "/tmp/ram.log"
-DUT_HDD_LOG = "/tmp/hdd.log"
 
 
 class DUTMonitorPlugin(object):
@@ -306,7 +304,7 @@ class DUTMonitorClient(object):
     def start(self):
         """
         @summary: Start HW resources monitoring on the DUT.
-                  Write obtained values to the following files on the DUT: DUT_CPU_LOG, DUT_RAM_LOG, DUT_HDD_LOG
+                  Obtained values are written to the RING_FILE on the DUT.
         """
         self.running = True
         self._upload_to_dut()
@@ -331,32 +329,33 @@ class DUTMonitorClient(object):
         if not self.run_channel.closed:
             self.run_channel.close()
 
-    def read_yml(self, file_pointer):
-        """
-        @summary: Read yaml file content. Convert it to the ordered data.
-        @return: OrderedDict with sorted keys by timestamp, or empty dict for empty file.
-        """
-        with file_pointer as fp:
-            measurements = yaml.safe_load("".join(fp))
-        if measurements is None:
-            return {}
-        # Sort json data to process logs chronologically
-        keys = measurements.keys()
-        keys.sort()
-        key_value_pairs = [(item, measurements[item]) for item in keys]
-        return OrderedDict(key_value_pairs)
-
     def get_log_files(self):
         """
-        @summary: Fetch monitoring logs from device, parse, convert to dictionary with sorted order.
+        @summary: Fetch the monitoring ring file from device, decode, convert to dictionary with sorted order.
         @return: Dictionary with keys "cpu", "ram", "hdd", values contains appropriate measurements made on DUT.
         """
         logger.debug("Downloading file from the DUT...")
-        cpu_log_fp = self.ssh.open_sftp().file(DUT_CPU_LOG)
-        ram_log_fp = self.ssh.open_sftp().file(DUT_RAM_LOG)
-        hdd_log_fp = self.ssh.open_sftp().file(DUT_HDD_LOG)
-
-        cpu_meas = self.read_yml(cpu_log_fp)
-        ram_meas = self.read_yml(ram_log_fp)
-        hdd_meas = self.read_yml(hdd_log_fp)
+        with self.ssh.open_sftp() as sftp:
+            with sftp.file(RING_FILE) as fp:
+                measurements = decode_ring(fp.read())
+        if measurements.overwritten:
+            logger.warning("DUT monitor ring is full, the first {} samples were overwritten, the thresholds are "
+                           "only checked for the last {} samples".format(measurements.overwritten,
+                                                                          len(measurements)))
+
+        cpu_meas = OrderedDict()
+        ram_meas = OrderedDict()
+        hdd_meas = OrderedDict()
+        for index in range(len(measurements)):
+            timestamp = datetime.fromtimestamp(measurements.timestamp[index]).strftime("%Y-%m-%d %H:%M:%S")
+            cpu_meas[timestamp] = {
+                "total": measurements.cpu_total[index],
+                "top_consumer": dict((cpu, name) for _, cpu, name in measurements.top_consumers[index])
+            }
+            ram_meas[timestamp] = measurements.ram_used[index]
+            hdd_meas[timestamp] = measurements.hdd_used[index]
+
+        if len(measurements):
+            logger.info("DUT monitor CPU utilization: average {:.2f}%, peak {:.2f}% of one CPU".format(
+                        sum(measurements.monitor_cpu) / len(measurements), max(measurements.monitor_cpu)))
         return {"cpu": cpu_meas, "ram": ram_meas, "hdd": hdd_meas}
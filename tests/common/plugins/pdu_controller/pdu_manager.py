@@ -19,10 +19,26 @@
 
 import logging
 import copy
+from multiprocessing.pool import ThreadPool
 from snmp_pdu_controllers import get_pdu_controller
 
 logger = logging.getLogger(__name__)
 
+# PDU controllers queried at the same time
+MAX_CONCURRENT_PDUS = 16
+
+
+def _map_pdus(func, items):
+    """Call func for every item, concurrently for up to MAX_CONCURRENT_PDUS items. Return the results in order."""
+    if len(items) < 2 or MAX_CONCURRENT_PDUS < 2:
+        return [func(item) for item in items]
+    pool = ThreadPool(min(len(items), MAX_CONCURRENT_PDUS))
+    try:
+        return pool.map(func, items)
+    finally:
+        pool.close()
+        pool.join()
+
 
 class PduManager():
 
@@ -48,6 +64,8 @@ class PduManager():
             }
         """
         self.controllers = []
+        # (index in controllers, pdu_vars) of the controllers to create
+        self._new_controllers = []
 
     def _update_outlets(self, outlets, pdu_index):
         for outlet in outlets:
@@ -56,7 +74,8 @@ class PduManager():
 
     def add_controller(self, psu_name, psu_peer, pdu_vars):
         """
-            Add a controller to be managed.
+            Add a controller to be managed. The controller is created by
+            init_controllers.
             Sampel psu_peer:
             {
                 "peerdevice": "pdu-107",
@@ -97,14 +116,36 @@ class PduManager():
         next_index = len(self.controllers)
         self.controllers.append(pdu)
         if not shared_pdu:
-            controller = get_pdu_controller(pdu_ip, pdu_vars)
-            if not controller:
-                logger.warning('Failed creating pdu controller: {}'.format(psu_peer))
-                return
-            outlets = controller.get_outlet_status(hostname=self.dut_hostname)
-            self._update_outlets(outlets, next_index)
-            pdu['outlets'] = outlets
-            pdu['controller'] = controller
+            self._new_controllers.append((next_index, pdu_vars))
+
+    def _init_controller(self, new_controller):
+        pdu_index, pdu_vars = new_controller
+        pdu = self.controllers[pdu_index]
+        controller = get_pdu_controller(pdu['host'], pdu_vars)
+        if not controller:
+            logger.warning('Failed creating pdu controller: {}'.format(pdu['psu_peer']))
+            return
+        outlets = controller.get_outlet_status(hostname=self.dut_hostname)
+        self._update_outlets(outlets, pdu_index)
+        pdu['outlets'] = outlets
+        pdu['controller'] = controller
+
+    def init_controllers(self):
+        """
+            Create the controllers added by add_controller and get the
+            status of their outlets, concurrently across PDUs.
+        """
+        new_controllers, self._new_controllers = self._new_controllers, []
+        _map_pdus(self._init_controller, new_controllers)
+
+        # Outlets sharing a PDU share its controller
+        controllers = {}
+        for pdu in self.controllers:
+            if pdu['controller'] is not None:
+                controllers.setdefault(pdu['host'], pdu['controller'])
+        for pdu in self.controllers:
+            if pdu['controller'] is None:
+                pdu['controller'] = controllers.get(pdu['host'])
 
     def _get_pdu_controller(self, pdu_index):
         pdu = self.controllers[pdu_index]
@@ -162,12 +203,16 @@ class PduManager():
             self._update_outlets(outlets, pdu_index)
             status = status + outlets
         else:
-            # collect all status
-            for pdu_index, controller in enumerate(self.controllers):
-                if len(controller['outlets']) > 0:
-                    outlets = controller['controller'].get_outlet_status(hostname=self.dut_hostname)
-                    self._update_outlets(outlets, pdu_index)
-                    status = status + outlets
+            # collect all status, concurrently across PDUs
+            def get_pdu_status(pdu_index):
+                outlets = self.controllers[pdu_index]['controller'].get_outlet_status(hostname=self.dut_hostname)
+                self._update_outlets(outlets, pdu_index)
+                return outlets
+
+            pdu_indexes = [pdu_index for pdu_index, controller in enumerate(self.controllers)
+                           if len(controller['outlets']) > 0]
+            for outlets in _map_pdus(get_pdu_status, pdu_indexes):
+                status = status + outlets
 
         return status
 
@@ -203,6 +248,7 @@ def _build_pdu_manager_from_graph(pduman, dut_hostname, conn_graph_facts, pdu_va
 
     for psu_name, psu_peer in pdu_info[dut_hostname].items():
         pduman.add_controller(psu_name, psu_peer, pdu_vars)
+    pduman.init_controllers()
 
     return len(pduman.controllers) > 0
 
@@ -235,6 +281,7 @@ def _build_pdu_manager_from_inventory(pduman, dut_hostname, pdu_hosts, pdu_vars)
                         'peerport': 'probing',
         }
         pduman.add_controller(ph, psu_peer, pdu_vars)
+    pduman.init_controllers()
 
     return len(pduman.controllers) > 0
 
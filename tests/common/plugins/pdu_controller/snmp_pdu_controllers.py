@@ -4,14 +4,26 @@ This module contains classes for PDU controllers that supports the SNMP manageme
 The classes must implement the PduControllerBase interface defined in controller_base.py.
 """
 import logging
+import time
 
 from controller_base import PduControllerBase
 
-from pysnmp.proto import rfc1902
+from pysnmp.proto import rfc1902, rfc1905
 from pysnmp.entity.rfc3413.oneliner import cmdgen
 
+from tests.common.cache import FactsCache
+
 logger = logging.getLogger(__name__)
 
+cache = FactsCache()
+
+# Seconds the PDU type and outlet maps of a PDU are cached, can be overridden by 'pdu_cache_ttl' in the PDU variables.
+# 0 disables the cache.
+PDU_CACHE_TTL = 3600
+PDU_CACHE_KEY = 'pdu_outlets'
+# Variables per SNMP GET, to keep the responses of the PDU agents small
+MAX_OIDS_PER_GET = 20
+
 class snmpPduController(PduControllerBase):
     """
     PDU Controller class for SNMP conrolled PDUs - 'Sentry Switched CDU' and 'APC Web/SNMP Management Card'
@@ -152,18 +164,49 @@ class snmpPduController(PduControllerBase):
             self._probe_lane(lane_id, cmdGen, snmp_auth)
 
 
+    def _load_cached_outlets(self):
+        """
+        @summary: Load the PDU type and the outlet maps of the PDU from the cache, if they are not older than the TTL
+        @return: Returns True if they were loaded from the cache. Otherwise returns False.
+        """
+        if not self.cache_ttl:
+            return False
+        cached = cache.read(self.controller, PDU_CACHE_KEY)
+        if cached is FactsCache.NOTEXIST or time.time() - cached['timestamp'] > self.cache_ttl:
+            return False
+
+        self.pduType = cached['pdu_type']
+        self.pduCntrlOid()
+        self.port_oid_dict = cached['port_oid_dict']
+        self.port_label_dict = cached['port_label_dict']
+        logging.info('Loaded cached outlets of PDU {}: {}'.format(self.controller, self.port_label_dict.keys()))
+        return True
+
+
+    def _cache_outlets(self):
+        if not self.cache_ttl or not self.pduType:
+            return
+        cache.write(self.controller, PDU_CACHE_KEY, {'timestamp': time.time(),
+                                                     'pdu_type': self.pduType,
+                                                     'port_oid_dict': self.port_oid_dict,
+                                                     'port_label_dict': self.port_label_dict})
+
+
     def __init__(self, controller, pdu):
         logging.info("Initializing " + self.__class__.__name__)
         PduControllerBase.__init__(self)
         self.controller = controller
         self.snmp_rocommunity = pdu['snmp_rocommunity']
         self.snmp_rwcommunity = pdu['snmp_rwcommunity']
+        self.cache_ttl = pdu.get('pdu_cache_ttl', PDU_CACHE_TTL)
         self.pduType = None
         self.port_oid_dict = {}
         self.port_label_dict = {}
-        self.get_pdu_controller_type()
-        self.pduCntrlOid()
-        self._get_pdu_ports()
+        if not self._load_cached_outlets():
+            self.get_pdu_controller_type()
+            self.pduCntrlOid()
+            self._get_pdu_ports()
+            self._cache_outlets()
         logging.info("Initialized " + self.__class__.__name__)
 
 
@@ -226,48 +269,50 @@ class snmpPduController(PduControllerBase):
         return True
 
 
-    def _get_one_outlet_power(self, cmdGen, snmp_auth, port_id, status):
-        if not self.PORT_POWER_BASE_OID:
-            return
-
-        query_id = '.' + self.PORT_POWER_BASE_OID + port_id
-        errorIndication, errorStatus, errorIndex, varBinds = cmdGen.getCmd(
-            snmp_auth,
-            cmdgen.UdpTransportTarget((self.controller, 161)),
-            cmdgen.MibVariable(query_id)
-            )
-        if errorIndication:
-            logging.debug("Failed to get outlet power level of DUT outlet, exception: " + str(errorIndication))
-
-        for oid, val in varBinds:
-            current_oid = oid.prettyPrint()
-            current_val = val.prettyPrint()
-            port_oid = current_oid.replace(self.PORT_POWER_BASE_OID, '')
-            if port_oid == port_id:
-                status['output_watts'] = current_val
-                return
-
-
-    def _get_one_outlet_status(self, cmdGen, snmp_auth, port_id):
-        query_id = '.' + self.PORT_STATUS_BASE_OID + port_id
-        errorIndication, errorStatus, errorIndex, varBinds = cmdGen.getCmd(
-            snmp_auth,
-            cmdgen.UdpTransportTarget((self.controller, 161)),
-            cmdgen.MibVariable(query_id)
-            )
-        if errorIndication:
-            logging.debug("Failed to outlet status of PDU, exception: " + str(errorIndication))
+    def _get_outlets_status(self, ports):
+        """
+        @summary: Get the status of outlets, MAX_OIDS_PER_GET variables per SNMP GET
+        @param ports: List of port OIDs of the outlets
+        @return: Returns the status of the outlets in a list of dictionary, without the outlets which status could
+                 not be retrieved.
+        """
+        query_oids = []
+        for port_id in ports:
+            query_oids.append(self.PORT_STATUS_BASE_OID + port_id)
+            if self.PORT_POWER_BASE_OID:
+                query_oids.append(self.PORT_POWER_BASE_OID + port_id)
 
-        for oid, val in varBinds:
-            current_oid = oid.prettyPrint()
-            current_val = val.prettyPrint()
-            port_oid = current_oid.replace(self.PORT_STATUS_BASE_OID, '')
-            if port_oid == port_id:
-                status = {"outlet_id": port_oid, "outlet_on": True if current_val == self.STATUS_ON else False}
-                self._get_one_outlet_power(cmdGen, snmp_auth, port_id, status)
-                return status
+        cmdGen = cmdgen.CommandGenerator()
+        snmp_auth = cmdgen.CommunityData(self.snmp_rocommunity)
+        values = {}
+        for start in range(0, len(query_oids), MAX_OIDS_PER_GET):
+            errorIndication, errorStatus, errorIndex, varBinds = cmdGen.getCmd(
+                snmp_auth,
+                cmdgen.UdpTransportTarget((self.controller, 161)),
+                *[cmdgen.MibVariable('.' + oid) for oid in query_oids[start:start + MAX_OIDS_PER_GET]]
+                )
+            if errorIndication or errorStatus != 0:
+                logging.debug("Failed to get outlet status of PDU, exception: %s" %
+                              str(errorIndication or errorStatus.prettyPrint()))
+                continue
+            for oid, val in varBinds:
+                if not isinstance(val, (rfc1905.NoSuchObject, rfc1905.NoSuchInstance)):
+                    values[oid.prettyPrint()] = val.prettyPrint()
 
-        return None
+        results = []
+        for port_id in ports:
+            current_val = values.get(self.PORT_STATUS_BASE_OID + port_id)
+            if current_val is None:
+                continue
+            status = {"outlet_id": port_id, "outlet_on": True if current_val == self.STATUS_ON else False}
+            if self.PORT_POWER_BASE_OID and self.PORT_POWER_BASE_OID + port_id in values:
+                status['output_watts'] = values[self.PORT_POWER_BASE_OID + port_id]
+            results.append(status)
+
+        if len(results) < len(ports) and self.cache_ttl:
+            # Outlets may be gone, or the GET failed: probe the outlets of the PDU again next time
+            cache.cleanup(self.controller, PDU_CACHE_KEY)
+        return results
 
 
     def get_outlet_status(self, outlet=None, hostname=None):
@@ -304,13 +349,8 @@ class snmpPduController(PduControllerBase):
             if not ports:
                 logging.error("{} device is not attached to any outlet of PDU {}".format(hn, self.controller))
 
-        cmdGen = cmdgen.CommandGenerator()
-        snmp_auth = cmdgen.CommunityData(self.snmp_rocommunity)
-
-        for port in ports:
-            status = self._get_one_outlet_status(cmdGen, snmp_auth, port)
-            if status:
-                results.append(status)
+        if ports:
+            results = self._get_outlets_status(ports)
 
         logging.info("Got outlet status: %s" % str(results))
         return results
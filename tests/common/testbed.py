@@ -3,7 +3,9 @@ Testbed file related utilities.
 """
 from __future__ import print_function
 import argparse
+import copy
 import csv
+import hashlib
 import ipaddr as ipaddress
 import json
 import os
@@ -12,11 +14,44 @@ import string
 import yaml
 import logging
 
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
 from collections import defaultdict
 from collections import OrderedDict
 
 logger = logging.getLogger(__name__)
 
+TESTBED_CACHE_VERSION = 1
+TESTBED_CACHE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '../_cache/testbed')
+TOPO_DIR = os.path.join(os.path.dirname(__file__), "../../ansible/vars/")
+
+# Parsed topo_<name>.yml files, keyed by topo file path
+_topo_file_cache = {}
+
+
+def _file_stamp(path):
+    """Return (mtime, size) of a file, None if it doesn't exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime, st.st_size
+
+
+def _load_topo_file(topo_file):
+    """Load a topology file, every file is parsed only once while it is not changed."""
+    stamp = _file_stamp(topo_file)
+    cached = _topo_file_cache.get(topo_file)
+    if cached is None or cached[0] != stamp:
+        with open(topo_file, 'r') as fh:
+            cached = (stamp, yaml.safe_load(fh))
+        _topo_file_cache[topo_file] = cached
+    # every testbed gets its own copy, like when the file was loaded for each testbed
+    return copy.deepcopy(cached[1])
+
 
 class TestbedInfo(object):
     """Parse the testbed file used to describe whole testbed info."""
@@ -24,7 +59,17 @@ class TestbedInfo(object):
     TESTBED_FIELDS_DEPRECATED = ('conf-name', 'group-name', 'topo', 'ptf_image_name', 'ptf', 'ptf_ip', 'ptf_ipv6', 'server', 'vm_base', 'dut', 'comment')
     TESTBED_FIELDS_RECOMMENDED = ('conf-name', 'group-name', 'topo', 'ptf_image_name', 'ptf', 'ptf_ip', 'ptf_ipv6', 'server', 'vm_base', 'dut', 'inv_name', 'auto_recover', 'comment')
 
-    def __init__(self, testbed_file):
+    # TestbedInfo instances returned by TestbedInfo.load, keyed by testbed file path
+    _instances = {}
+
+    def __init__(self, testbed_file, testbed_name=None, use_cache=True):
+        """
+        Args:
+            testbed_file: testbed csv or yaml file.
+            testbed_name: when specified, only the topology data of this testbed is built.
+                The "topo" of the other testbeds is left as the topology name, see get_testbed.
+            use_cache: reuse the parsed testbed file saved by an earlier run if the file is not changed.
+        """
         if testbed_file.endswith(".csv"):
             self.testbed_filename = testbed_file
             self.testbed_yamlfile = testbed_file.replace(".csv", ".yaml")
@@ -50,13 +95,97 @@ class TestbedInfo(object):
         self.testbed_topo = OrderedDict()
         # use to convert from netmask to cidr
         self._address_cache = {}
-        if self.testbed_filename.endswith(".yaml"):
-            self._read_testbed_topo_from_yaml()
-        if self.testbed_filename.endswith(".csv"):
-            self._read_testbed_topo_from_csv()
-            # create yaml testbed file
-            self.dump_testbeds_to_yaml()
-        self.parse_topo()
+        self._yaml_stamp = None
+        self.testbed_stamp = _file_stamp(self.testbed_filename)
+        if use_cache and self._load_cache():
+            if self.testbed_filename.endswith(".csv") and \
+                    _file_stamp(self.testbed_yamlfile) != self._yaml_stamp:
+                # yaml testbed file was removed or modified since it was created
+                self.dump_testbeds_to_yaml()
+                self._save_cache()
+        else:
+            if self.testbed_filename.endswith(".yaml"):
+                self._read_testbed_topo_from_yaml()
+            if self.testbed_filename.endswith(".csv"):
+                self._read_testbed_topo_from_csv()
+                # create yaml testbed file
+                self.dump_testbeds_to_yaml()
+            if use_cache:
+                self._save_cache()
+        self.parse_topo(testbed_name)
+
+    @classmethod
+    def load(cls, testbed_file, testbed_name=None):
+        """
+        Return the TestbedInfo of a testbed file.
+
+        The instance is shared by all the callers in the process and only
+        rebuilt when the testbed file is changed.
+        """
+        key = os.path.abspath(testbed_file)
+        tbinfo = cls._instances.get(key)
+        if tbinfo is None or tbinfo.testbed_stamp != _file_stamp(tbinfo.testbed_filename):
+            tbinfo = cls(testbed_file, testbed_name)
+            cls._instances[key] = tbinfo
+        elif testbed_name is not None:
+            tbinfo.parse_topo(testbed_name)
+        return tbinfo
+
+    def get_testbed(self, testbed_name):
+        """Return info of a testbed with its topology data, None if the testbed doesn't exist."""
+        tb = self.testbed_topo.get(testbed_name)
+        if tb is not None:
+            self._parse_testbed_topo(tb)
+        return tb
+
+    def _cache_file(self):
+        path = os.path.abspath(self.testbed_filename)
+        return os.path.join(TESTBED_CACHE_DIR, "{}.pickle".format(hashlib.md5(path.encode("utf-8")).hexdigest()))
+
+    def _load_cache(self):
+        """Load the testbed file parsed by an earlier run, return False if the cache is missing or stale."""
+        if self.testbed_stamp is None:
+            return False
+        try:
+            with open(self._cache_file(), "rb") as f:
+                cached = pickle.load(f)
+        except Exception:
+            return False
+        if cached.get("version") != TESTBED_CACHE_VERSION or cached.get("stamp") != self.testbed_stamp:
+            return False
+
+        self.testbed_topo = cached["testbed_topo"]
+        self._address_cache = cached["address_cache"]
+        self._yaml_stamp = cached["yaml_stamp"]
+        if "testbed_fields" in cached:
+            self.testbed_fields = cached["testbed_fields"]
+        logger.debug("Loaded testbed file %s from cache", self.testbed_filename)
+        return True
+
+    def _save_cache(self):
+        """Save the parsed testbed file, before the topology data is added to it."""
+        cached = {
+            "version": TESTBED_CACHE_VERSION,
+            "stamp": self.testbed_stamp,
+            "testbed_topo": self.testbed_topo,
+            "address_cache": self._address_cache,
+            "yaml_stamp": self._yaml_stamp,
+        }
+        if hasattr(self, "testbed_fields"):
+            cached["testbed_fields"] = self.testbed_fields
+        cache_file = self._cache_file()
+        tmp_file = "{}.{}.tmp".format(cache_file, os.getpid())
+        try:
+            if not os.path.isdir(TESTBED_CACHE_DIR):
+                os.makedirs(TESTBED_CACHE_DIR)
+            with open(tmp_file, "wb") as f:
+                pickle.dump(cached, f, pickle.HIGHEST_PROTOCOL)
+            # other processes only ever see a complete cache file
+            os.rename(tmp_file, cache_file)
+        except (IOError, OSError) as e:
+            logger.debug("Failed to cache testbed file %s: %s", self.testbed_filename, repr(e))
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
 
     def _cidr_to_ip_mask(self, network):
         addr = ipaddress.IPNetwork(network)
@@ -199,9 +328,18 @@ class TestbedInfo(object):
         # dump testbed fields in the order same as csv
         IncIndentDumper.add_representer(OrderedDict, ordereddict_representer)
 
-        with open(self.testbed_yamlfile, "w") as yamlfile:
-            yaml.dump(testbed_data, yamlfile,
-                      explicit_start=True, Dumper=IncIndentDumper)
+        content = yaml.dump(testbed_data, explicit_start=True, Dumper=IncIndentDumper)
+        try:
+            with open(self.testbed_yamlfile) as yamlfile:
+                unchanged = yamlfile.read() == content
+        except IOError:
+            unchanged = False
+
+        # don't touch the yaml file if content is the same
+        if not unchanged:
+            with open(self.testbed_yamlfile, "w") as yamlfile:
+                yamlfile.write(content)
+        self._yaml_stamp = _file_stamp(self.testbed_yamlfile)
 
     def get_testbed_type(self, topo_name):
         pattern = re.compile(r'^(t0|t1|ptf|fullmesh|dualtor|t2|tgen)')
@@ -302,20 +440,31 @@ class TestbedInfo(object):
                 map[str(ptf_port_index)][dut_index] = int(dut_port_index)
         return map
 
-    def parse_topo(self):
-        for tb_name, tb in self.testbed_topo.items():
-            topo = tb.pop("topo")
-            tb["topo"] = defaultdict()
-            tb["topo"]["name"] = topo
-            tb["topo"]["type"] = self.get_testbed_type(topo)
-            topo_dir = os.path.join(os.path.dirname(__file__), "../../ansible/vars/")
-            topo_file = os.path.join(topo_dir, "topo_{}.yml".format(topo))
-            with open(topo_file, 'r') as fh:
-                tb['topo']['properties'] = yaml.safe_load(fh)
-            tb['topo']['ptf_map'] = self.calculate_ptf_index_map(tb)
-            tb['topo']['ptf_map_disabled'] = self.calculate_ptf_index_map_disabled(tb)
-            tb['topo']['ptf_dut_intf_map'] = self.calculate_ptf_dut_intf_map(tb)
-
+    def parse_topo(self, testbed_name=None):
+        """Build topology data of a testbed, or of all testbeds if testbed_name is None."""
+        if testbed_name is None:
+            testbeds = self.testbed_topo.values()
+        elif testbed_name in self.testbed_topo:
+            testbeds = [self.testbed_topo[testbed_name]]
+        else:
+            testbeds = []
+
+        for tb in testbeds:
+            self._parse_testbed_topo(tb)
+
+    def _parse_testbed_topo(self, tb):
+        if isinstance(tb["topo"], dict):
+            # already parsed
+            return
+        topo = tb.pop("topo")
+        tb["topo"] = defaultdict()
+        tb["topo"]["name"] = topo
+        tb["topo"]["type"] = self.get_testbed_type(topo)
+        topo_file = os.path.join(TOPO_DIR, "topo_{}.yml".format(topo))
+        tb['topo']['properties'] = _load_topo_file(topo_file)
+        tb['topo']['ptf_map'] = self.calculate_ptf_index_map(tb)
+        tb['topo']['ptf_map_disabled'] = self.calculate_ptf_index_map_disabled(tb)
+        tb['topo']['ptf_dut_intf_map'] = self.calculate_ptf_dut_intf_map(tb)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -18,6 +18,8 @@ from ansible.vars.manager import VariableManager
 
 from tests.common.cache import cached
 from tests.common.cache import FactsCache
+from tests.common.helpers.polling import FixedBackoff
+from tests.common.helpers.polling import Poller
 
 logger = logging.getLogger(__name__)
 cache = FactsCache()
@@ -43,31 +45,11 @@ def wait_until(timeout, interval, condition, *args, **kwargs):
     @param **kwargs: Extra args required by the 'condition' function.
     @return: If the condition function returns True before timeout, return True. If the condition function raises an
         exception, log the error and keep waiting and polling.
+        See tests.common.helpers.polling.Poller for backoff, learned convergence time and event driven waiting.
     """
-    logger.debug("Wait until %s is True, timeout is %s seconds, checking interval is %s" % \
-        (condition.__name__, timeout, interval))
-    start_time = time.time()
-    elapsed_time = 0
-    while elapsed_time < timeout:
-        logger.debug("Time elapsed: %f seconds" % elapsed_time)
-
-        try:
-            check_result = condition(*args, **kwargs)
-        except Exception as e:
-            logger.error("Exception caught while checking %s: %s" % (condition.__name__, repr(e)))
-            check_result = False
-
-        if check_result:
-            logger.debug("%s is True, exit early with True" % condition.__name__)
-            return True
-        else:
-            logger.debug("%s is False, wait %d seconds and check again" % (condition.__name__, interval))
-            time.sleep(interval)
-            elapsed_time = time.time() - start_time
-
-    if elapsed_time >= timeout:
-        logger.debug("%s is still False after %d seconds, exit with False" % (condition.__name__, timeout))
+    if timeout <= 0:
         return False
+    return Poller(timeout, backoff=FixedBackoff(interval)).until(condition, *args, **kwargs)
 
 
 def wait_tcp_connection(client, server_hostname, listening_port, timeout_s = 30):
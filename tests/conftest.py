@@ -23,6 +23,7 @@ from tests.common.devices.vmhost import VMHost
 
 from tests.common.helpers.constants import ASIC_PARAM_TYPE_ALL, ASIC_PARAM_TYPE_FRONTEND, DEFAULT_ASIC_ID
 from tests.common.helpers.dut_ports import encode_dut_port_name
+from tests.common.helpers.metadata import TestbedMetadata, load_priorities
 from tests.common.testbed import TestbedInfo
 from tests.common.utilities import get_inventory_files
 from tests.common.utilities import get_host_vars
@@ -171,12 +172,9 @@ def get_tbinfo(request):
     if tbname is None or tbfile is None:
         raise ValueError("testbed and testbed_file are required!")
 
-    testbedinfo = cache.read(tbname, 'tbinfo')
-    if testbedinfo is cache.NOTEXIST:
-        testbedinfo = TestbedInfo(tbfile)
-        cache.write(tbname, 'tbinfo', testbedinfo)
+    testbedinfo = TestbedInfo.load(tbfile, tbname)
 
-    return tbname, testbedinfo.testbed_topo.get(tbname, {})
+    return tbname, testbedinfo.get_testbed(tbname) or {}
 
 @pytest.fixture(scope="session")
 def tbinfo(request):
@@ -814,28 +812,11 @@ def generate_port_lists(request, port_scope):
     if not tbname:
         return empty
 
-    folder = 'metadata'
-    filepath = os.path.join(folder, tbname + '.json')
-
-    try:
-        with open(filepath, 'r') as yf:
-            ports = json.load(yf)
-    except IOError as e:
+    metadata = TestbedMetadata.load(tbname)
+    if metadata is None:
         return empty
 
-    if tbname not in ports:
-        return empty
-
-    dut_ports = ports[tbname]
-    ret = []
-    for dut, val in dut_ports.items():
-        if 'intf_status' not in val:
-            continue
-        for intf, status in val['intf_status'].items():
-            if scope in intf and (not state or status[state] == 'up'):
-                ret.append(encode_dut_port_name(dut, intf))
-
-    return ret if ret else empty
+    return metadata.get_ports(scope, state) or empty
 
 
 def generate_dut_feature_list(request):
@@ -845,27 +826,11 @@ def generate_dut_feature_list(request):
     if not tbname:
         return empty
 
-    folder = 'metadata'
-    filepath = os.path.join(folder, tbname + '.json')
-
-    try:
-        with open(filepath, 'r') as yf:
-            metadata = json.load(yf)
-    except IOError as e:
-        return empty
-
-    if tbname not in metadata:
+    metadata = TestbedMetadata.load(tbname)
+    if metadata is None:
         return empty
 
-    meta = metadata[tbname]
-    ret = []
-    for dut, val in meta.items():
-        if 'features' not in val:
-            continue
-        for feature, _ in val['features'].items():
-            ret.append(encode_dut_port_name(dut, feature))
-
-    return ret if ret else empty
+    return metadata.get_features() or empty
 
 def generate_priority_lists(request, prio_scope):
     empty = []
@@ -874,26 +839,7 @@ def generate_priority_lists(request, prio_scope):
     if not tbname:
         return empty
 
-    folder = 'priority'
-    filepath = os.path.join(folder, tbname + '-' + prio_scope + '.json')
-
-    try:
-        with open(filepath, 'r') as yf:
-            info = json.load(yf)
-    except IOError as e:
-        return empty
-
-    if tbname not in info:
-        return empty
-
-    dut_prio = info[tbname]
-    ret = []
-
-    for dut, priorities in dut_prio.items():
-        for p in priorities:
-            ret.append('{}|{}'.format(dut, p))
-
-    return ret if ret else empty
+    return load_priorities(tbname, prio_scope)
 
 _frontend_hosts_per_hwsku_per_module = {}
 _hosts_per_hwsku_per_module = {}
@@ -2,6 +2,7 @@
 SONiC Dataplane Qos tests
 """
 import time
+import json
 import logging
 import ptf.packet as scapy
 import socket
@@ -21,6 +22,7 @@ from switch import (switch_init,
                     sai_thrift_create_scheduler_profile,
                     sai_thrift_clear_all_counters,
                     sai_thrift_read_port_counters,
+                    sai_thrift_read_counter_snapshot,
                     sai_port_list,
                     port_list,
                     sai_thrift_read_port_watermarks,
@@ -61,6 +63,85 @@ RELEASE_PORT_MAX_RATE = 0
 ECN_INDEX_IN_HEADER = 53 # Fits the ptf hex_dump_buffer() parse function
 DSCP_INDEX_IN_HEADER = 52 # Fits the ptf hex_dump_buffer() parse function
 
+# Counter settle detection, replacing the fixed sleeps after sending packets:
+# the counters are read every counter_settle_interval seconds until they are unchanged
+# for counter_settle_reads reads in a row, or reach the expected values, or the fixed
+# sleep they replace expires. Both can be tuned per platform with the test parameters,
+# counter_settle=False restores the fixed sleeps. A step that only asserts that counters
+# did not change has no expected values, stable reads can't show that a counter won't
+# change later, so it still waits for the whole fixed sleep.
+DEFAULT_COUNTER_SETTLE_INTERVAL = 0.5
+DEFAULT_COUNTER_SETTLE_READS = 5
+# Port counters compared to detect that the port counters settled. The PFC counters
+# are not compared, they keep increasing as long as PFC is asserted
+SETTLE_PORT_COUNTERS = [EGRESS_DROP, INGRESS_DROP, TRANSMITTED_OCTETS, TRANSMITTED_PKTS,
+                        INGRESS_PORT_BUFFER_DROP, EGRESS_PORT_BUFFER_DROP]
+# Settle time of every step: [(test, step, seconds, reads, reason)]
+counter_settle_times = []
+
+def wait_counters_settle(test, step, read, expected=None, timeout=8, key=None, min_wait=0):
+    """
+    Call read() until its result settles, see DEFAULT_COUNTER_SETTLE_INTERVAL, and return the latest result.
+    expected(result) returns True when the result has the expected values.
+    key(result) returns the part of the result compared between reads, the whole result if None.
+    The result is not considered stable before min_wait seconds.
+    The time to settle is printed and appended to counter_settle_times, and to the JSON lines file
+    given by the test parameter counter_settle_log.
+    """
+    if not test.test_params.get('counter_settle', True):
+        time.sleep(timeout)
+        return read()
+
+    interval = float(test.test_params.get('counter_settle_interval', DEFAULT_COUNTER_SETTLE_INTERVAL))
+    stable_reads = int(test.test_params.get('counter_settle_reads', DEFAULT_COUNTER_SETTLE_READS))
+    start = time.time()
+    result = read()
+    reads = stable = 1
+    while True:
+        if expected is not None and expected(result):
+            reason = 'expected'
+            break
+        elapsed = time.time() - start
+        if stable >= stable_reads and elapsed >= min_wait:
+            reason = 'stable'
+            break
+        if elapsed >= timeout:
+            reason = 'timeout'
+            break
+        time.sleep(min(interval, timeout - elapsed))
+        previous, result = result, read()
+        reads += 1
+        if key is None:
+            stable = stable + 1 if result == previous else 1
+        else:
+            stable = stable + 1 if key(result) == key(previous) else 1
+
+    elapsed = time.time() - start
+    test_name = test.__class__.__name__
+    counter_settle_times.append((test_name, step, elapsed, reads, reason))
+    print >> sys.stderr, "%s: counters %s after %.1f seconds and %d reads (%s)" % (step, reason, elapsed, reads, test_name)
+    if 'counter_settle_log' in test.test_params:
+        with open(test.test_params['counter_settle_log'], 'a') as f:
+            f.write(json.dumps({'test': test_name, 'step': step, 'seconds': elapsed, 'reads': reads,
+                                'reason': reason, 'asic_type': test.test_params.get('sonic_asic_type')}) + '\n')
+    return result
+
+def wait_port_counters_settle(test, step, port_ids, expected=None, timeout=8):
+    """
+    Wait for the SETTLE_PORT_COUNTERS of the ptf ports port_ids to settle, see wait_counters_settle.
+    Return the list of the port counters of port_ids, expected is called with this list.
+    Without expected, the step asserts that counters did not change, the wait lasts timeout seconds.
+    """
+    def read():
+        snapshot = sai_thrift_read_counter_snapshot(test.client, [port_list[port_id] for port_id in port_ids],
+                                                    queue_ports=[])
+        return [snapshot.port[port_list[port_id]] for port_id in port_ids]
+
+    def key(counters):
+        return [[port_counters[index] for index in SETTLE_PORT_COUNTERS] for port_counters in counters]
+
+    return wait_counters_settle(test, step, read, expected, timeout, key, min_wait=timeout if expected is None else 0)
+
 def get_rx_port(dp, device_number, src_port_id, dst_mac, dst_ip, src_ip):
     ip_id = 0xBABE
     tos = (0 << 2) | 1
@@ -255,9 +336,14 @@ class DscpMappingPB(sai_base_test.ThriftInterfaceDataPlane):
                         print >> sys.stderr, "dscp: %d, total received: %d, attribute error!" % (tos >> 2, cnt)
                         continue
 
-            # Read Counters
-            time.sleep(10)
-            port_results, queue_results = sai_thrift_read_port_counters(self.client, port_list[dst_port_id])
+            # Read Counters, until every queue checked below has its packets
+            expected_queue_pkts = {QUEUE_0: 1, QUEUE_1: 58, QUEUE_2: 1, QUEUE_3: 1, QUEUE_4: 1, QUEUE_5: 1, QUEUE_6: 1}
+            queue_results = wait_counters_settle(
+                self, "dscp mapping",
+                lambda: sai_thrift_read_port_counters(self.client, port_list[dst_port_id])[1],
+                expected=lambda queue_results: all(queue_results[queue] >= pkts + queue_results_base[queue]
+                                                   for queue, pkts in expected_queue_pkts.items()),
+                timeout=10)
 
             print >> sys.stderr, map(operator.sub, queue_results, queue_results_base)
             # According to SONiC configuration all dscp are classified to queue 1 except:
@@ -356,8 +442,10 @@ class Dot1pToQueueMapping(sai_base_test.ThriftInterfaceDataPlane):
                     print >> sys.stderr, "dot1p: %d, calling send_packet" % (dot1p)
 
                 # validate queue counters increment by the correct pkt num
-                time.sleep(8)
-                port_results, queue_results = sai_thrift_read_port_counters(self.client, port_list[dst_port_id])
+                queue_results = wait_counters_settle(
+                    self, "queue %d" % queue,
+                    lambda: sai_thrift_read_port_counters(self.client, port_list[dst_port_id])[1],
+                    expected=lambda queue_results: queue_results[queue] >= queue_results_base[queue] + len(dot1ps))
                 print >> sys.stderr, queue_results_base
                 print >> sys.stderr, queue_results
                 print >> sys.stderr, map(operator.sub, queue_results, queue_results_base)
@@ -447,8 +535,10 @@ class DscpToPgMapping(sai_base_test.ThriftInterfaceDataPlane):
                     print >> sys.stderr, "dscp: %d, calling send_packet" % (tos >> 2)
 
                 # validate pg counters increment by the correct pkt num
-                time.sleep(8)
-                pg_cntrs = sai_thrift_read_pg_counters(self.client, port_list[src_port_id])
+                pg_cntrs = wait_counters_settle(
+                    self, "pg %d" % pg,
+                    lambda: sai_thrift_read_pg_counters(self.client, port_list[src_port_id]),
+                    expected=lambda pg_cntrs: pg_cntrs[pg] >= pg_cntrs_base[pg] + len(dscps))
                 print >> sys.stderr, pg_cntrs_base
                 print >> sys.stderr, pg_cntrs
                 print >> sys.stderr, map(operator.sub, pg_cntrs, pg_cntrs_base)
@@ -556,8 +646,10 @@ class Dot1pToPgMapping(sai_base_test.ThriftInterfaceDataPlane):
                     print >> sys.stderr, "dot1p: %d, calling send_packet" % (dot1p)
 
                 # validate pg counters increment by the correct pkt num
-                time.sleep(8)
-                pg_cntrs = sai_thrift_read_pg_counters(self.client, port_list[src_port_id])
+                pg_cntrs = wait_counters_settle(
+                    self, "pg %d" % pg,
+                    lambda: sai_thrift_read_pg_counters(self.client, port_list[src_port_id]),
+                    expected=lambda pg_cntrs: pg_cntrs[pg] >= pg_cntrs_base[pg] + len(dot1ps))
                 print >> sys.stderr, pg_cntrs_base
                 print >> sys.stderr, pg_cntrs
                 print >> sys.stderr, map(operator.sub, pg_cntrs, pg_cntrs_base)
@@ -658,12 +750,8 @@ class PFCtest(sai_base_test.ThriftInterfaceDataPlane):
         try:
             # send packets short of triggering pfc
             send_packet(self, src_port_id, pkt, pkts_num_leak_out + pkts_num_trig_pfc - 1 - margin)
-            # allow enough time for the dut to sync up the counter values in counters_db
-            time.sleep(8)
-            # get a snapshot of counter values at recv and transmit ports
-            # queue counters value is not of our interest here
-            recv_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[src_port_id])
-            xmit_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[dst_port_id])
+            # wait for the dut to sync up the counter values at recv and transmit ports
+            recv_counters, xmit_counters = wait_port_counters_settle(self, "short of pfc", [src_port_id, dst_port_id])
             # recv port no pfc
             assert(recv_counters[pg] == recv_counters_base[pg])
             # recv port no ingress drop
@@ -675,13 +763,11 @@ class PFCtest(sai_base_test.ThriftInterfaceDataPlane):
 
             # send 1 packet to trigger pfc
             send_packet(self, src_port_id, pkt, 1 + 2 * margin)
-            # allow enough time for the dut to sync up the counter values in counters_db
-            time.sleep(8)
-            # get a snapshot of counter values at recv and transmit ports
-            # queue counters value is not of our interest here
+            # wait for the dut to sync up the counter values at recv and transmit ports
             recv_counters_base = recv_counters
-            recv_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[src_port_id])
-            xmit_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[dst_port_id])
+            recv_counters, xmit_counters = wait_port_counters_settle(
+                self, "trigger pfc", [src_port_id, dst_port_id],
+                expected=lambda counters: counters[0][pg] > recv_counters_base[pg])
             # recv port pfc
             assert(recv_counters[pg] > recv_counters_base[pg])
             # recv port no ingress drop
@@ -693,13 +779,10 @@ class PFCtest(sai_base_test.ThriftInterfaceDataPlane):
 
             # send packets short of ingress drop
             send_packet(self, src_port_id, pkt, pkts_num_trig_ingr_drp - pkts_num_trig_pfc - 1 - 2 * margin)
-            # allow enough time for the dut to sync up the counter values in counters_db
-            time.sleep(8)
-            # get a snapshot of counter values at recv and transmit ports
-            # queue counters value is not of our interest here
+            # wait for the dut to sync up the counter values at recv and transmit ports
             recv_counters_base = recv_counters
-            recv_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[src_port_id])
-            xmit_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[dst_port_id])
+            recv_counters, xmit_counters = wait_port_counters_settle(
+                self, "short of ingress drop", [src_port_id, dst_port_id])
             # recv port pfc
             assert(recv_counters[pg] > recv_counters_base[pg])
             # recv port no ingress drop
@@ -711,13 +794,11 @@ class PFCtest(sai_base_test.ThriftInterfaceDataPlane):
 
             # send 1 packet to trigger ingress drop
             send_packet(self, src_port_id, pkt, 1 + 2 * margin)
-            # allow enough time for the dut to sync up the counter values in counters_db
-            time.sleep(8)
-            # get a snapshot of counter values at recv and transmit ports
-            # queue counters value is not of our interest here
+            # wait for the dut to sync up the counter values at recv and transmit ports
             recv_counters_base = recv_counters
-            recv_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[src_port_id])
-            xmit_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[dst_port_id])
+            recv_counters, xmit_counters = wait_port_counters_settle(
+                self, "trigger ingress drop", [src_port_id, dst_port_id],
+                expected=lambda counters: counters[0][INGRESS_DROP] > recv_counters_base[INGRESS_DROP])
             # recv port pfc
             assert(recv_counters[pg] > recv_counters_base[pg])
             # recv port ingress drop
@@ -867,14 +948,10 @@ class PFCXonTest(sai_base_test.ThriftInterfaceDataPlane):
             )
             send_packet(self, src_port_id, pkt3, pkts_num_leak_out + 1)
 
-            # allow enough time for the dut to sync up the counter values in counters_db
-            time.sleep(8)
-            # get a snapshot of counter values at recv and transmit ports
-            # queue counters value is not of our interest here
-            recv_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[src_port_id])
-            xmit_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[dst_port_id])
-            xmit_2_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[dst_port_2_id])
-            xmit_3_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[dst_port_3_id])
+            # wait for the dut to sync up the counter values at recv and transmit ports
+            recv_counters, xmit_counters, xmit_2_counters, xmit_3_counters = wait_port_counters_settle(
+                self, "trigger pfc", [src_port_id, dst_port_id, dst_port_2_id, dst_port_3_id],
+                expected=lambda counters: counters[0][pg] > recv_counters_base[pg])
             # recv port pfc
             assert(recv_counters[pg] > recv_counters_base[pg])
             # recv port no ingress drop
@@ -890,15 +967,10 @@ class PFCXonTest(sai_base_test.ThriftInterfaceDataPlane):
 
             sai_thrift_port_tx_enable(self.client, asic_type, [dst_port_2_id])
 
-            # allow enough time for the dut to sync up the counter values in counters_db
-            time.sleep(8)
-            # get a snapshot of counter values at recv and transmit ports
-            # queue counters value is not of our interest here
+            # wait for the dut to sync up the counter values at recv and transmit ports
             recv_counters_base = recv_counters
-            recv_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[src_port_id])
-            xmit_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[dst_port_id])
-            xmit_2_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[dst_port_2_id])
-            xmit_3_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[dst_port_3_id])
+            recv_counters, xmit_counters, xmit_2_counters, xmit_3_counters = wait_port_counters_settle(
+                self, "release dst port 2", [src_port_id, dst_port_id, dst_port_2_id, dst_port_3_id])
             # recv port pfc
             assert(recv_counters[pg] > recv_counters_base[pg])
             # recv port no ingress drop
@@ -914,11 +986,8 @@ class PFCXonTest(sai_base_test.ThriftInterfaceDataPlane):
 
             sai_thrift_port_tx_enable(self.client, asic_type, [dst_port_3_id])
 
-            # allow enough time for the dut to sync up the counter values in counters_db
-            time.sleep(8)
-            # get new base counter values at recv ports
-            # queue counters value is not of our interest here
-            recv_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[src_port_id])
+            # wait for the dut to sync up the counter values, and get new base counter values at recv ports
+            recv_counters, = wait_port_counters_settle(self, "release dst port 3", [src_port_id])
             assert(recv_counters[INGRESS_DROP] == recv_counters_base[INGRESS_DROP])
             assert(recv_counters[INGRESS_PORT_BUFFER_DROP] == recv_counters_base[INGRESS_PORT_BUFFER_DROP])
             recv_counters_base = recv_counters
@@ -1103,12 +1172,11 @@ class HdrmPoolSizeTest(sai_base_test.ThriftInterfaceDataPlane):
                 while (recv_counters[sidx_dscp_pg_tuples[i][2]] == recv_counters_bases[sidx_dscp_pg_tuples[i][0]][sidx_dscp_pg_tuples[i][2]]) and (pkt_cnt < 10):
                     send_packet(self, self.src_port_ids[sidx_dscp_pg_tuples[i][0]], pkt, 1)
                     pkt_cnt += 1
-                    # allow enough time for the dut to sync up the counter values in counters_db
-                    time.sleep(8)
-
-                    # get a snapshot of counter values at recv and transmit ports
-                    # queue_counters value is not of our interest here
-                    recv_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[self.src_port_ids[sidx_dscp_pg_tuples[i][0]]])
+                    # wait for the dut to sync up the counter values at recv port
+                    recv_counters, = wait_port_counters_settle(
+                        self, "pg %d packet %d" % (sidx_dscp_pg_tuples[i][2] - 2, pkt_cnt),
+                        [self.src_port_ids[sidx_dscp_pg_tuples[i][0]]],
+                        expected=lambda counters: counters[0][sidx_dscp_pg_tuples[i][2]] > recv_counters_bases[sidx_dscp_pg_tuples[i][0]][sidx_dscp_pg_tuples[i][2]])
 
                 if pkt_cnt == 10:
                     sys.exit("Too many pkts needed to trigger pfc: %d" % (pkt_cnt))
@@ -1144,10 +1212,9 @@ class HdrmPoolSizeTest(sai_base_test.ThriftInterfaceDataPlane):
                                         ip_ttl=ttl)
 
                 send_packet(self, self.src_port_ids[sidx_dscp_pg_tuples[i][0]], pkt, self.pkts_num_hdrm_full / self.pkt_size_factor if i != self.pgs_num - 1 else self.pkts_num_hdrm_partial / self.pkt_size_factor)
-                # allow enough time for the dut to sync up the counter values in counters_db
-                time.sleep(8)
-
-                recv_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[self.src_port_ids[sidx_dscp_pg_tuples[i][0]]])
+                # wait for the dut to sync up the counter values at recv port
+                recv_counters, = wait_port_counters_settle(self, "fill pg %d headroom" % (sidx_dscp_pg_tuples[i][2] - 2),
+                                                           [self.src_port_ids[sidx_dscp_pg_tuples[i][0]]])
                 # assert no ingress drop
                 assert(recv_counters[INGRESS_DROP] == recv_counters_bases[sidx_dscp_pg_tuples[i][0]][INGRESS_DROP])
                 assert(recv_counters[INGRESS_PORT_BUFFER_DROP] == recv_counters_bases[sidx_dscp_pg_tuples[i][0]][INGRESS_PORT_BUFFER_DROP])
@@ -1171,9 +1238,10 @@ class HdrmPoolSizeTest(sai_base_test.ThriftInterfaceDataPlane):
             i = self.pgs_num - 1
             # send 1 packet on last pg to trigger ingress drop
             send_packet(self, self.src_port_ids[sidx_dscp_pg_tuples[i][0]], pkt, 1 + 2 * margin)
-            # allow enough time for the dut to sync up the counter values in counters_db
-            time.sleep(8)
-            recv_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[self.src_port_ids[sidx_dscp_pg_tuples[i][0]]])
+            # wait for the dut to sync up the counter values at recv port
+            recv_counters, = wait_port_counters_settle(
+                self, "trigger ingress drop", [self.src_port_ids[sidx_dscp_pg_tuples[i][0]]],
+                expected=lambda counters: counters[0][INGRESS_DROP] > recv_counters_bases[sidx_dscp_pg_tuples[i][0]][INGRESS_DROP])
             # assert ingress drop
             assert(recv_counters[INGRESS_DROP] > recv_counters_bases[sidx_dscp_pg_tuples[i][0]][INGRESS_DROP])
             assert(recv_counters[INGRESS_PORT_BUFFER_DROP] > recv_counters_bases[sidx_dscp_pg_tuples[i][0]][INGRESS_PORT_BUFFER_DROP])
@@ -1612,12 +1680,9 @@ class LossyQueueTest(sai_base_test.ThriftInterfaceDataPlane):
         try:
             # send packets short of triggering egress drop
             send_packet(self, src_port_id, pkt, pkts_num_leak_out + pkts_num_trig_egr_drp - 1 - margin)
-            # allow enough time for the dut to sync up the counter values in counters_db
-            time.sleep(8)
-            # get a snapshot of counter values at recv and transmit ports
-            # queue counters value is not of our interest here
-            recv_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[src_port_id])
-            xmit_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[dst_port_id])
+            # wait for the dut to sync up the counter values at recv and transmit ports
+            recv_counters, xmit_counters = wait_port_counters_settle(
+                self, "short of egress drop", [src_port_id, dst_port_id])
             # recv port no pfc
             assert(recv_counters[pg] == recv_counters_base[pg])
             # recv port no ingress drop
@@ -1629,12 +1694,10 @@ class LossyQueueTest(sai_base_test.ThriftInterfaceDataPlane):
 
             # send 1 packet to trigger egress drop
             send_packet(self, src_port_id, pkt, 1 + 2 * margin)
-            # allow enough time for the dut to sync up the counter values in counters_db
-            time.sleep(8)
-            # get a snapshot of counter values at recv and transmit ports
-            # queue counters value is not of our interest here
-            recv_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[src_port_id])
-            xmit_counters, queue_counters = sai_thrift_read_port_counters(self.client, port_list[dst_port_id])
+            # wait for the dut to sync up the counter values at recv and transmit ports
+            recv_counters, xmit_counters = wait_port_counters_settle(
+                self, "trigger egress drop", [src_port_id, dst_port_id],
+                expected=lambda counters: counters[1][EGRESS_DROP] > xmit_counters_base[EGRESS_DROP])
             # recv port no pfc
             assert(recv_counters[pg] == recv_counters_base[pg])
             # recv port no ingress drop
@@ -55,6 +55,31 @@ is_bmv2 = ('BMV2_TEST' in os.environ) and (int(os.environ['BMV2_TEST']) == 1)
 STOP_PORT_MAX_RATE = 1
 RELEASE_PORT_MAX_RATE = 0
 
+# Port counters read by sai_thrift_read_port_counters and sai_thrift_read_counter_snapshot,
+# the index of a counter in the results is its index in this list
+PORT_COUNTER_IDS = [
+    SAI_PORT_STAT_IF_OUT_DISCARDS,
+    SAI_PORT_STAT_IF_IN_DISCARDS,
+    SAI_PORT_STAT_PFC_0_TX_PKTS,
+    SAI_PORT_STAT_PFC_1_TX_PKTS,
+    SAI_PORT_STAT_PFC_2_TX_PKTS,
+    SAI_PORT_STAT_PFC_3_TX_PKTS,
+    SAI_PORT_STAT_PFC_4_TX_PKTS,
+    SAI_PORT_STAT_PFC_5_TX_PKTS,
+    SAI_PORT_STAT_PFC_6_TX_PKTS,
+    SAI_PORT_STAT_PFC_7_TX_PKTS,
+    SAI_PORT_STAT_IF_OUT_OCTETS,
+    SAI_PORT_STAT_IF_OUT_UCAST_PKTS,
+    SAI_PORT_STAT_IN_DROPPED_PKTS,
+    SAI_PORT_STAT_OUT_DROPPED_PKTS
+]
+# Only the first 8 queues (unicast) are read - multicast queues are not used
+UNICAST_QUEUE_NUM = 8
+
+# Queue and PG lists of the ports: {port_id: (queue_list, pg_list)}
+# The lists don't change while the switch is up, they are read once per session
+port_qos_lists = {}
+
 def switch_init(client):
     global switch_inited
     if switch_inited:
@@ -607,14 +632,8 @@ def sai_thrift_create_pool_profile(client, pool_type, size, threshold_mode):
 
 def sai_thrift_clear_all_counters(client):
     for port in sai_port_list:
-        queue_list=[]
         client.sai_thrift_clear_port_all_stats(port)
-        port_attr_list = client.sai_thrift_get_port_attribute(port)
-        attr_list = port_attr_list.attr_list
-        for attribute in attr_list:
-            if attribute.id == SAI_PORT_ATTR_QOS_QUEUE_LIST:
-                for queue_id in attribute.value.objlist.object_id_list:
-                    queue_list.append(queue_id)
+        queue_list, _ = sai_thrift_get_port_qos_lists(client, port)
 
         cnt_ids=[]
         cnt_ids.append(SAI_QUEUE_STAT_PACKETS)
@@ -649,43 +668,36 @@ def sai_thrift_port_tx_enable(client, asic_type, port_ids):
     for port_id in port_ids:
         client.sai_thrift_set_port_attribute(port_list[port_id], attr)
 
-def sai_thrift_read_port_counters(client,port):
-    port_cnt_ids=[]
-    port_cnt_ids.append(SAI_PORT_STAT_IF_OUT_DISCARDS)
-    port_cnt_ids.append(SAI_PORT_STAT_IF_IN_DISCARDS)
-    port_cnt_ids.append(SAI_PORT_STAT_PFC_0_TX_PKTS)
-    port_cnt_ids.append(SAI_PORT_STAT_PFC_1_TX_PKTS)
-    port_cnt_ids.append(SAI_PORT_STAT_PFC_2_TX_PKTS)
-    port_cnt_ids.append(SAI_PORT_STAT_PFC_3_TX_PKTS)
-    port_cnt_ids.append(SAI_PORT_STAT_PFC_4_TX_PKTS)
-    port_cnt_ids.append(SAI_PORT_STAT_PFC_5_TX_PKTS)
-    port_cnt_ids.append(SAI_PORT_STAT_PFC_6_TX_PKTS)
-    port_cnt_ids.append(SAI_PORT_STAT_PFC_7_TX_PKTS)
-    port_cnt_ids.append(SAI_PORT_STAT_IF_OUT_OCTETS)
-    port_cnt_ids.append(SAI_PORT_STAT_IF_OUT_UCAST_PKTS)
-    port_cnt_ids.append(SAI_PORT_STAT_IN_DROPPED_PKTS)
-    port_cnt_ids.append(SAI_PORT_STAT_OUT_DROPPED_PKTS)
-
-    counters_results=[]
-    counters_results = client.sai_thrift_get_port_stats(port,port_cnt_ids,len(port_cnt_ids))
-
-    queue_list=[]
-    port_attr_list = client.sai_thrift_get_port_attribute(port)
-    attr_list = port_attr_list.attr_list
-    for attribute in attr_list:
-        if attribute.id == SAI_PORT_ATTR_QOS_QUEUE_LIST:
-            for queue_id in attribute.value.objlist.object_id_list:
-                queue_list.append(queue_id)
-    cnt_ids=[]
-    thrift_results=[]
+def sai_thrift_get_port_qos_lists(client, port):
+    """
+    Return (queue_list, pg_list) of a port, read from the switch on the first call only.
+    """
+    if port not in port_qos_lists:
+        queue_list=[]
+        pg_list=[]
+        port_attr_list = client.sai_thrift_get_port_attribute(port)
+        attr_list = port_attr_list.attr_list
+        for attribute in attr_list:
+            if attribute.id == SAI_PORT_ATTR_QOS_QUEUE_LIST:
+                for queue_id in attribute.value.objlist.object_id_list:
+                    queue_list.append(queue_id)
+            elif attribute.id == SAI_PORT_ATTR_INGRESS_PRIORITY_GROUP_LIST:
+                for pg_id in attribute.value.objlist.object_id_list:
+                    pg_list.append(pg_id)
+        port_qos_lists[port] = (queue_list, pg_list)
+    return port_qos_lists[port]
+
+def sai_thrift_read_queue_counters(client, port, cnt_ids):
+    queue_list, _ = sai_thrift_get_port_qos_lists(client, port)
     queue_counters_results=[]
-    cnt_ids.append(SAI_QUEUE_STAT_PACKETS)
-    queue1=0
-    for queue in queue_list:
-        if queue1 <= 7:
-            thrift_results=client.sai_thrift_get_queue_stats(queue,cnt_ids,len(cnt_ids))
-            queue_counters_results.append(thrift_results[0])
-            queue1+=1
+    for queue in queue_list[:UNICAST_QUEUE_NUM]:
+        thrift_results=client.sai_thrift_get_queue_stats(queue,cnt_ids,len(cnt_ids))
+        queue_counters_results.append(thrift_results[0])
+    return queue_counters_results
+
+def sai_thrift_read_port_counters(client,port):
+    counters_results = client.sai_thrift_get_port_stats(port,PORT_COUNTER_IDS,len(PORT_COUNTER_IDS))
+    queue_counters_results = sai_thrift_read_queue_counters(client, port, [SAI_QUEUE_STAT_PACKETS])
     return (counters_results, queue_counters_results)
 
 def sai_thrift_read_port_watermarks(client,port):
@@ -696,28 +708,13 @@ def sai_thrift_read_port_watermarks(client,port):
     pg_wm_ids.append(SAI_INGRESS_PRIORITY_GROUP_STAT_XOFF_ROOM_WATERMARK_BYTES)
     pg_wm_ids.append(SAI_INGRESS_PRIORITY_GROUP_STAT_SHARED_WATERMARK_BYTES)
 
-    queue_list=[]
-    pg_list=[]
-    port_attr_list = client.sai_thrift_get_port_attribute(port)
-    attr_list = port_attr_list.attr_list
-    for attribute in attr_list:
-        if attribute.id == SAI_PORT_ATTR_QOS_QUEUE_LIST:
-            for queue_id in attribute.value.objlist.object_id_list:
-                queue_list.append(queue_id)
-        elif attribute.id == SAI_PORT_ATTR_INGRESS_PRIORITY_GROUP_LIST:
-            for pg_id in attribute.value.objlist.object_id_list:
-                pg_list.append(pg_id)
+    _, pg_list = sai_thrift_get_port_qos_lists(client, port)
 
     thrift_results=[]
-    queue_res=[]
+    queue_res=sai_thrift_read_queue_counters(client, port, q_wm_ids)
     pg_shared_res=[]
     pg_headroom_res=[]
 
-    # Only use the first 8 queues (unicast) - multicast queues are not used
-    for queue in queue_list[:8]:
-        thrift_results=client.sai_thrift_get_queue_stats(queue,q_wm_ids,len(q_wm_ids))
-        queue_res.append(thrift_results[0])
-
     for pg in pg_list:
         thrift_results=client.sai_thrift_get_pg_stats(pg,pg_wm_ids,len(pg_wm_ids))
         pg_headroom_res.append(thrift_results[0])
@@ -725,21 +722,9 @@ def sai_thrift_read_port_watermarks(client,port):
 
     return (queue_res, pg_shared_res, pg_headroom_res)
 
-def sai_thrift_read_pg_counters(client, port_id):
-    pg_cntr_ids=[
-        SAI_INGRESS_PRIORITY_GROUP_STAT_PACKETS
-    ]
-
-    # fetch pg ids under port id
-    pg_ids = []
-    port_attrs = client.sai_thrift_get_port_attribute(port_id)
-    attrs = port_attrs.attr_list
-    for attr in attrs:
-        if attr.id == SAI_PORT_ATTR_INGRESS_PRIORITY_GROUP_LIST:
-            for pg_id in attr.value.objlist.object_id_list:
-                pg_ids.append(pg_id)
-
-    # get counter values of counter ids of interest under each pg
+def sai_thrift_read_pg_stats(client, port_id, pg_cntr_ids):
+    # get counter values of counter ids of interest under each pg of the port
+    _, pg_ids = sai_thrift_get_port_qos_lists(client, port_id)
     pg_cntrs=[]
     for pg_id in pg_ids:
         cntr_vals = client.sai_thrift_get_pg_stats(pg_id, pg_cntr_ids, len(pg_cntr_ids))
@@ -747,27 +732,78 @@ def sai_thrift_read_pg_counters(client, port_id):
 
     return pg_cntrs
 
-def sai_thrift_read_pg_shared_watermark(client, port_id):
-    pg_cntr_ids=[
-        SAI_INGRESS_PRIORITY_GROUP_STAT_SHARED_WATERMARK_BYTES
-    ]
-
-    # fetch pg ids under port id
-    pg_ids = []
-    port_attrs = client.sai_thrift_get_port_attribute(port_id)
-    attrs = port_attrs.attr_list
-    for attr in attrs:
-        if attr.id == SAI_PORT_ATTR_INGRESS_PRIORITY_GROUP_LIST:
-            for pg_id in attr.value.objlist.object_id_list:
-                pg_ids.append(pg_id)
-
-    # get counter values of counter ids of interest under each pg
-    pg_cntrs=[]
-    for pg_id in pg_ids:
-        cntr_vals = client.sai_thrift_get_pg_stats(pg_id, pg_cntr_ids, len(pg_cntr_ids))
-        pg_cntrs.append(cntr_vals[0])
+def sai_thrift_read_pg_counters(client, port_id):
+    return sai_thrift_read_pg_stats(client, port_id, [SAI_INGRESS_PRIORITY_GROUP_STAT_PACKETS])
 
-    return pg_cntrs
+def sai_thrift_read_pg_shared_watermark(client, port_id):
+    return sai_thrift_read_pg_stats(client, port_id, [SAI_INGRESS_PRIORITY_GROUP_STAT_SHARED_WATERMARK_BYTES])
+
+class CounterSnapshot(object):
+    """
+    Counters of several ports read in one pass by sai_thrift_read_counter_snapshot:
+        port[port_id]: port counters, in PORT_COUNTER_IDS order
+        queue[port_id]: packets of the unicast queues, for the ports given in queue_ports
+        pg[port_id]: packets of the PGs, for the ports given in pg_ports
+
+    Subtracting a snapshot from a later one gives the increments of the counters of the ports
+    present in both, and the time between them in timestamp.
+    """
+    def __init__(self, timestamp, port=None, queue=None, pg=None):
+        self.timestamp = timestamp
+        self.port = port if port is not None else {}
+        self.queue = queue if queue is not None else {}
+        self.pg = pg if pg is not None else {}
+
+    def port_counters(self, port_id):
+        """
+        Return the counters of a port like sai_thrift_read_port_counters: (port counters, queue counters)
+        The queue counters are None if they were not read.
+        """
+        return (self.port[port_id], self.queue.get(port_id))
+
+    @staticmethod
+    def _diff(counters, base):
+        return dict((port_id, [value - base_value for value, base_value in zip(values, base[port_id])])
+                    for port_id, values in counters.items() if port_id in base)
+
+    def __sub__(self, base):
+        return CounterSnapshot(self.timestamp - base.timestamp,
+                               self._diff(self.port, base.port),
+                               self._diff(self.queue, base.queue),
+                               self._diff(self.pg, base.pg))
+
+    def __eq__(self, other):
+        return (isinstance(other, CounterSnapshot) and
+                (self.port, self.queue, self.pg) == (other.port, other.queue, other.pg))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "CounterSnapshot(port=%r, queue=%r, pg=%r)" % (self.port, self.queue, self.pg)
+
+def sai_thrift_read_counter_snapshot(client, ports, queue_ports=None, pg_ports=()):
+    """
+    Read the port counters of ports, the queue counters of queue_ports (all ports if None) and the PG counters
+    of pg_ports, with the same client. Every port is read once, and its queue and PG lists are only read on
+    the first snapshot. The queue and PG counters take one RPC per queue and PG, only read the ones checked.
+    """
+    if queue_ports is None:
+        queue_ports = ports
+    port_cnts={}
+    queue_cnts={}
+    pg_cnts={}
+    timestamp = time.time()
+    for port in ports:
+        if port not in port_cnts:
+            port_cnts[port] = client.sai_thrift_get_port_stats(port,PORT_COUNTER_IDS,len(PORT_COUNTER_IDS))
+    for port in queue_ports:
+        if port not in queue_cnts:
+            queue_cnts[port] = sai_thrift_read_queue_counters(client, port, [SAI_QUEUE_STAT_PACKETS])
+    for port in pg_ports:
+        if port not in pg_cnts:
+            pg_cnts[port] = sai_thrift_read_pg_counters(client, port)
+    return CounterSnapshot(timestamp, port_cnts, queue_cnts, pg_cnts)
 
 def sai_thrift_read_buffer_pool_watermark(client, buffer_pool_id):
     buffer_pool_wm_ids = [
@@ -1,4 +1,5 @@
 import binascii
+import ctypes
 import socket
 import struct
 import select
@@ -8,14 +9,33 @@ import os.path
 from collections import defaultdict
 from fcntl import ioctl
 from pprint import pprint
-import logging
-logging.getLogger("scapy.runtime").setLevel(logging.ERROR)
-import ptf.packet as scapy
-import scapy.all as scapy2
-scapy2.conf.use_pcap=True
-import scapy.arch.pcapdnet
 
 NEIGH_SOLICIT_ICMP_MSG_TYPE = 135
+NEIGH_ADVERT_ICMP_MSG_TYPE = 136
+
+ETH_P_ARP = 0x806
+ETH_P_IPV6 = 0x86dd
+ETH_P_8021Q = 0x8100
+IPPROTO_ICMPV6 = 58
+
+# Accept ARP and ICMPv6 neighbor solicitation, untagged or with a 802.1Q tag.
+# Same as the pcap filter 'arp || ip6[40] = 135 || (vlan && (arp || ip6[40] = 135))'
+BPF_FILTER = [
+    (0x28, 0, 0, 12),                                   # ldh [12]
+    (0x15, 9, 0, ETH_P_ARP),                            # jeq ARP, accept
+    (0x15, 0, 2, ETH_P_IPV6),                           # jeq IPv6, else check vlan
+    (0x30, 0, 0, 54),                                   # ldb [54], ICMPv6 type
+    (0x15, 6, 7, NEIGH_SOLICIT_ICMP_MSG_TYPE),          # jeq NS, accept, else drop
+    (0x15, 0, 6, ETH_P_8021Q),                          # jeq 802.1Q, else drop
+    (0x28, 0, 0, 16),                                   # ldh [16]
+    (0x15, 3, 0, ETH_P_ARP),                            # jeq ARP, accept
+    (0x15, 0, 3, ETH_P_IPV6),                           # jeq IPv6, else drop
+    (0x30, 0, 0, 58),                                   # ldb [58], ICMPv6 type
+    (0x15, 0, 1, NEIGH_SOLICIT_ICMP_MSG_TYPE),          # jeq NS, accept, else drop
+    (0x06, 0, 0, 0x40000),                              # accept
+    (0x06, 0, 0, 0),                                    # drop
+]
+
 
 def hexdump(data):
     print " ".join("%02x" % ord(d) for d in data)
@@ -31,12 +51,24 @@ def get_mac(iff):
     SIOCGIFHWADDR = 0x8927          # Get hardware address
     return get_if(iff, SIOCGIFHWADDR)[18:24]
 
+def checksum_words(data):
+    """Sum of the 16 bits words of data, without folding."""
+    if len(data) % 2:
+        data += b'\x00'
+    return sum(struct.unpack('!%dH' % (len(data) // 2), data))
+
+def fold_checksum(total):
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
 
 class Interface(object):
     ETH_P_ALL = 0x03
-    ETH_P_ARP = 0x806
     RCV_TIMEOUT = 1000
     RCV_SIZE = 4096
+    SO_ATTACH_FILTER = 26
+    PACKET_OUTGOING = 4
 
     def __init__(self, iface):
         self.iface = iface
@@ -48,20 +80,25 @@ class Interface(object):
             self.socket.close()
 
     def bind(self):
-        self.socket = scapy2.conf.L2listen(iface=self.iface, filter='arp || ip6[40] = {}'.format(NEIGH_SOLICIT_ICMP_MSG_TYPE))
+        self.socket = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(self.ETH_P_ALL))
+        # Filter in the kernel, only requests to answer are copied to the socket
+        self.bpf_blob = ctypes.create_string_buffer(b''.join(struct.pack("HBBI", *e) for e in BPF_FILTER))
+        bpf = struct.pack('HL', len(BPF_FILTER), ctypes.addressof(self.bpf_blob))
+        self.socket.setsockopt(socket.SOL_SOCKET, self.SO_ATTACH_FILTER, bpf)
+        self.socket.bind((self.iface, 0))
 
     def handler(self):
         return self.socket
 
     def recv(self):
-        sniffed = self.socket.recv()
-        pkt = sniffed[0]
-        str_pkt = str(pkt).encode("HEX")
-        binpkt = binascii.unhexlify(str_pkt)
-        return binpkt
+        data, address = self.socket.recvfrom(self.RCV_SIZE)
+        # Packets sent from this host are copied to the socket too
+        if address[2] == self.PACKET_OUTGOING:
+            return None
+        return data
 
     def send(self, data):
-        scapy2.sendp(data, iface=self.iface)
+        self.socket.send(data)
 
     def mac(self):
         return self.mac_address
@@ -86,106 +123,114 @@ class Poller(object):
 
 
 class ARPResponder(object):
-    ARP_PKT_LEN = 64
-    NDP_PKT_LEN = 90
     ARP_OP_REQUEST = 1
-    def __init__(self, ip_sets):
-        self.arp_chunk = binascii.unhexlify('08060001080006040002') # defines a part of the packet for ARP Reply
-        self.arp_pad = binascii.unhexlify('00' * 18)
+    ARP_PAD = binascii.unhexlify('00' * 18)
+    # Part of the packet for ARP Reply: ethertype, htype, ptype, hlen, plen, op
+    ARP_CHUNK = binascii.unhexlify('08060001080006040002')
+    # Neighbor advertisement flags: solicited and override
+    NA_FLAGS = 0x60000000
+    NA_PAYLOAD_LEN = 32
 
+    def __init__(self, ip_sets):
         self.ip_sets = ip_sets
-
-        return
+        # Reply templates per interface and packed IP address
+        self.arp_replies = {}
+        self.ndp_replies = {}
+        for iface, ip_set in ip_sets.items():
+            vlan_list = ip_set['vlan'] if 'vlan' in ip_set else [None]
+            self.arp_replies[iface] = {}
+            self.ndp_replies[iface] = {}
+            for ip, local_mac in ip_set.items():
+                if ip == 'vlan':
+                    continue
+                try:
+                    if ':' in ip:
+                        target_ip = socket.inet_pton(socket.AF_INET6, ip)
+                        self.ndp_replies[iface][target_ip] = self.generate_neigh_adv_template(local_mac, target_ip)
+                    else:
+                        local_ip = socket.inet_aton(ip)
+                        self.arp_replies[iface][local_ip] = [
+                            self.generate_arp_reply_template(local_mac, local_ip, vlan_id) for vlan_id in vlan_list
+                        ]
+                except socket.error:
+                    print "Ignore invalid IP address %s of %s" % (ip, iface)
 
     def action(self, interface):
         data = interface.recv()
+        if not data or len(data) < 14:
+            return
+
+        ether_type, = struct.unpack_from('!H', data, 12)
+        offset = 14
+        if ether_type == ETH_P_8021Q and len(data) >= 18:
+            ether_type, = struct.unpack_from('!H', data, 16)
+            offset = 18
 
-        if len(data) <= self.ARP_PKT_LEN:
-            return self.reply_to_arp(data, interface)
-        elif len(data) <= self.NDP_PKT_LEN:
-            return self.reply_to_ndp(data, interface)
+        if ether_type == ETH_P_ARP:
+            return self.reply_to_arp(data, offset, interface)
+        elif ether_type == ETH_P_IPV6:
+            return self.reply_to_ndp(data, offset, interface)
 
-    def reply_to_arp(self, data, interface):
-        remote_mac, remote_ip, request_ip, op_type, vlan_id = self.extract_arp_info(data)
+    def reply_to_arp(self, data, offset, interface):
+        if len(data) < offset + 28:
+            return
 
         # Don't send ARP response if the ARP op code is not request
+        op_type, = struct.unpack_from('!H', data, offset + 6)
         if op_type != self.ARP_OP_REQUEST:
             return
 
-        request_ip_str = socket.inet_ntoa(request_ip)
-        if request_ip_str not in self.ip_sets[interface.name()]:
+        templates = self.arp_replies[interface.name()].get(data[offset + 24:offset + 28])
+        if templates is None:
             return
 
-        if 'vlan' in self.ip_sets[interface.name()]:
-            vlan_list = self.ip_sets[interface.name()]['vlan']
-        else:
-            vlan_list = [None]
-
-        for vlan_id in vlan_list:
-            arp_reply = self.generate_arp_reply(self.ip_sets[interface.name()][request_ip_str], remote_mac, request_ip, remote_ip, vlan_id)
-            interface.send(arp_reply)
-
-        return
-
-    def reply_to_ndp(self, data, interface):
-        remote_mac, remote_ip, target_ip = self.extract_ndp_info(data)
-
-        target_ip_str = socket.inet_ntop(socket.AF_INET6, target_ip)
-        if target_ip_str in self.ip_sets[interface.name()]:
-            remote_ip_str = socket.inet_ntop(socket.AF_INET6, remote_ip)
-            neigh_adv_pkt = self.generate_neigh_adv(self.ip_sets[interface.name()][target_ip_str], remote_mac, target_ip_str, remote_ip_str)
-            interface.send(neigh_adv_pkt)
+        remote_mac = data[6:12]
+        remote_ip = data[offset + 14:offset + 18]
+        for template in templates:
+            interface.send(remote_mac + template + remote_mac + remote_ip + self.ARP_PAD)
 
-        return
-        
-    def extract_ndp_info(self, data):
-        vlan_offset = 0
+    def reply_to_ndp(self, data, offset, interface):
+        if len(data) < offset + 56 or ord(data[offset + 6:offset + 7]) != IPPROTO_ICMPV6 or \
+                ord(data[offset + 40:offset + 41]) != NEIGH_SOLICIT_ICMP_MSG_TYPE:
+            return
 
-        if len(data) == 90:
-            vlan_offset = 4
+        template = self.ndp_replies[interface.name()].get(data[offset + 48:offset + 64])
+        if template is None:
+            return
 
         remote_mac = data[6:12]
-        remote_ip = data[22 + vlan_offset:38 + vlan_offset]
-        target_ip = data[62 + vlan_offset:78 + vlan_offset]
-
-        return remote_mac, remote_ip, target_ip
-
-    def extract_arp_info(self, data):
-        # remote_mac, remote_ip, request_ip, op_type
-        rem_ip_start = 28
-        req_ip_start = 38
-        op_type_start = 20
-        eth_offset = 0
-        vlan_id = None
-        ether_type = str(data[12:14]).encode("HEX")
-        if (ether_type == '8100'):
-            vlan = str(data[14:16]).encode("HEX")
-            if (vlan != '0000'):
-                eth_offset = 4
-                vlan_id = data[14:16]
-        rem_ip_start = rem_ip_start + eth_offset
-        req_ip_start = req_ip_start + eth_offset
-        op_type_start = op_type_start + eth_offset
-        rem_ip_end = rem_ip_start + 4
-        req_ip_end = req_ip_start + 4
-        op_type_end = op_type_start + 1
-
-        return data[6:12], data[rem_ip_start:rem_ip_end], data[req_ip_start:req_ip_end], (ord(data[op_type_start]) * 256 + ord(data[op_type_end])), vlan_id
-
-    def generate_arp_reply(self, local_mac, remote_mac, local_ip, remote_ip, vlan_id):
-        eth_hdr = remote_mac + local_mac
+        remote_ip = data[offset + 8:offset + 24]
+        head, icmp_start, icmp_end, partial_sum = template
+        cksum = fold_checksum(partial_sum + checksum_words(remote_ip))
+        interface.send(remote_mac + head + remote_ip + icmp_start + struct.pack('!H', cksum) + icmp_end)
+
+    def generate_arp_reply_template(self, local_mac, local_ip, vlan_id):
+        """
+        Return the ARP reply without the remote MAC and IP addresses: the reply to a request is
+        remote_mac + template + remote_mac + remote_ip + ARP_PAD
+        """
+        template = local_mac
         if vlan_id is not None:
-            eth_type = binascii.unhexlify('8100')
-            eth_hdr += eth_type + vlan_id
-
-        return eth_hdr + self.arp_chunk + local_mac + local_ip + remote_mac + remote_ip + self.arp_pad
-
-    def generate_neigh_adv(self, local_mac, remote_mac, target_ip, remote_ip):
-        neigh_adv_pkt = Ether(src=local_mac, dst=remote_mac)/IPv6(src=target_ip, dst=remote_ip)
-        neigh_adv_pkt /= ICMPv6ND_NA(tgt=target_ip, R=0, S=1, O=1)
-        neigh_adv_pkt /= ICMPv6NDOptDstLLAddr(lladdr=local_mac)
-
-        return neigh_adv_pkt
+            template += struct.pack('!H', ETH_P_8021Q) + vlan_id
+
+        return template + self.ARP_CHUNK + local_mac + local_ip
+
+    def generate_neigh_adv_template(self, local_mac, target_ip):
+        """
+        Return the neighbor advertisement split around the remote IP address and the checksum, and the
+        checksum of the constant fields: the reply to a solicitation is
+        remote_mac + head + remote_ip + icmp_start + checksum + icmp_end
+        """
+        # ICMPv6 type, code, then the checksum. Flags, target, target link-layer address option
+        icmp_start = struct.pack('!BB', NEIGH_ADVERT_ICMP_MSG_TYPE, 0)
+        icmp_end = struct.pack('!I', self.NA_FLAGS) + target_ip + struct.pack('!BB', 2, 1) + local_mac
+        pseudo_header = target_ip + struct.pack('!IxxxB', self.NA_PAYLOAD_LEN, IPPROTO_ICMPV6)
+        partial_sum = checksum_words(pseudo_header) + checksum_words(icmp_start) + checksum_words(icmp_end)
+
+        # IPv6 header: version, traffic class, flow label, payload length, next header, hop limit, source
+        head = local_mac + struct.pack('!H', ETH_P_IPV6) + \
+            struct.pack('!IHBB', 6 << 28, self.NA_PAYLOAD_LEN, IPPROTO_ICMPV6, 255) + target_ip
+        return head, icmp_start, icmp_end, partial_sum
 
 def parse_args():
     parser = argparse.ArgumentParser(description='ARP autoresponder')